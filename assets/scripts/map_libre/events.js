@@ -2,7 +2,7 @@ import { formatData } from './utils.js'
 
 export default class Events
 {
-  constructor(_options, _layer, _source)
+  constructor(_options, _layer, _source, _sourceLayer)
   {
     this.mapLibre = window.mapLibre
     this.map = this.mapLibre.map
@@ -11,6 +11,7 @@ export default class Events
     this.events = _options
     this.layer = _layer
     this.source = _source
+    this.sourceLayer = _sourceLayer
 
     this.hoveredPolygonId = null
 
@@ -50,7 +51,7 @@ export default class Events
       if (this.hoveredPolygonId !== null)
       {
         this.map.setFeatureState(
-          { source: this.source, id: this.hoveredPolygonId },
+          { source: this.source, sourceLayer: this.sourceLayer, id: this.hoveredPolygonId },
           { hover: false },
         )
       }
@@ -58,7 +59,7 @@ export default class Events
       this.hoveredPolygonId = _event.features[0].id
 
       this.map.setFeatureState(
-        { source: this.source, id: this.hoveredPolygonId },
+        { source: this.source, sourceLayer: this.sourceLayer, id: this.hoveredPolygonId },
         { hover: true },
       )
     }
@@ -69,7 +70,7 @@ export default class Events
     if (this.hoveredPolygonId !== null)
     {
       this.map.setFeatureState(
-        { source: this.source, id: this.hoveredPolygonId },
+        { source: this.source, sourceLayer: this.sourceLayer, id: this.hoveredPolygonId },
         { hover: false },
       )
     }
@@ -201,7 +201,8 @@ export default class Filter
     {
       _obj.value = _obj.key === _property ? _value : _obj.value
     })
-    source.update()
+    if (source.params.type === 'vector') source.updateTiles()
+    else source.update()
   }
 
   toggleLegend(_item, _property)
@@ -11,6 +11,7 @@ export default class Layer
     this.params = _options
     this.id = _options.id
     this.source = _options.source
+    this.sourceLayer = _options['source-layer']
     this.events = _options.events
     this.legend = _options.legend
 
@@ -29,7 +30,7 @@ export default class Layer
 
   setEvents()
   {
-    new Events(this.events, this.id, this.source)
+    new Events(this.events, this.id, this.source, this.sourceLayer)
   }
 
   setLegend()
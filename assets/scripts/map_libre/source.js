@@ -10,7 +10,7 @@ export default class Source
 
     this.key = _options.key
     this.params = _options.params
-    this.baseUrl = _options.params.data
+    this.baseUrl = _options.params.type === 'vector' ? _options.params.tiles?.[0] : _options.params.data
     this.queryStrings = _options.query_strings
     this.triggers = _options.triggers
     this.minZoom = _options.min_zoom || 0
@@ -32,6 +32,12 @@ export default class Source
       this.params.data = this.isZoomAvailable() ? this.getUrl() : null
     }
 
+    // Add query params to tiles url for vector layers served by the app
+    if (this.params.type === 'vector' && this.baseUrl)
+    {
+      this.params.tiles = [this.getUrl()]
+    }
+
     // Create source
     this.map.addSource(this.key, this.params)
 
@@ -59,6 +65,13 @@ export default class Source
     }
   }
 
+  updateTiles()
+  {
+    // Reload vector tiles with the current query params
+    const source = this.map.getSource(this.key)
+    source.setTiles([this.getUrl()])
+  }
+
   getUrl()
   {
     let url = this.baseUrl
@@ -8,5 +8,5 @@ class VectorView(LoginRequiredMixin, TemplateView):
     template_name = "carto/vector.html"
 
     def get_context_data(self, **kwargs):
-        kwargs["couv_sol_list"] = CouvertureSol.objects.all()
+        kwargs["couv_sol_list"] = CouvertureSol.get_cached()
         return super().get_context_data(**kwargs)
@@ -235,6 +235,35 @@ STATIC_ROOT = str(BASE_DIR / "staticroot")
 PUBLIC_MEDIA_LOCATION = "media"
 MEDIA_URL = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.fr-par.scw.cloud/{PUBLIC_MEDIA_LOCATION}/"
 
+# Vector tiles cache, see public_data/tile_cache.py
+# Should be one of : "" (disabled), local, s3
+TILE_CACHE_STORAGE = env.str("TILE_CACHE_STORAGE", default="")
+TILE_CACHE_ROOT = env.str("TILE_CACHE_ROOT", default=BASE_DIR / "tiles")
+
+# FlatGeobuf files too big for redis, see public_data/geo_formats.py
+# Should be one of : "" (disabled), local, s3
+# files are kept until the data version changes, disabled by default as each distinct
+# query is stored
+FLATGEOBUF_STORAGE = env.str("FLATGEOBUF_STORAGE", default="")
+FLATGEOBUF_ROOT = env.str("FLATGEOBUF_ROOT", default=BASE_DIR / "fgb")
+
+# Consommation cube built from Cerema, see public_data/consommation_cube.py
+# Should be one of : "" (disabled), local, s3
+CONSOMMATION_CUBE_STORAGE = env.str("CONSOMMATION_CUBE_STORAGE", default="")
+CONSOMMATION_CUBE_ROOT = env.str("CONSOMMATION_CUBE_ROOT", default=BASE_DIR / "conso_cube")
+
+# Lifetime (seconds) of the results cached by public_data services, they are also
+# invalidated when the data version changes
+CLASS_CACHER_TIMEOUT = env.int("CLASS_CACHER_TIMEOUT", default=60 * 60 * 24)
+
+# Process-local copy of nomenclatures and departement millésimes, see
+# public_data/referentials.py. Disabled in local like the redis cache.
+REFERENTIAL_LOCAL_CACHE = env.bool("REFERENTIAL_LOCAL_CACHE", default=ENVIRONMENT != "local")
+
+# Emprise of a project is the union of its cities, stored as one geometry or split
+# in parts of at most this number of vertices (0: not split), see Emprise.build_from_cities
+EMPRISE_SUBDIVIDE_MAX_VERTICES = env.int("EMPRISE_SUBDIVIDE_MAX_VERTICES", default=0)
+
 
 # CORSHEADERS
 # https://github.com/adamchainz/django-cors-headers
@@ -574,6 +603,16 @@ ORTHOPHOTO_URL = (
 )
 OPENSTREETMAP_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
 
+# Tiles of the basemap of generated images, see project/basemap.py. With
+# BASEMAP_OFFLINE, tiles are only read from the store (seed_basemap_tiles command)
+BASEMAP_TILE_STORE = env.str("BASEMAP_TILE_STORE", default=str(BASE_DIR / "basemap_tiles.mbtiles"))
+BASEMAP_TILE_STORE_MAX_SIZE = env.int("BASEMAP_TILE_STORE_MAX_SIZE", default=2048)  # MB
+BASEMAP_OFFLINE = env.bool("BASEMAP_OFFLINE", default=False)
+BASEMAP_USER_AGENT = env.str("BASEMAP_USER_AGENT", default="sparte")
+# tile server of seed_basemap_tiles, it must allow bulk downloads (not tile.openstreetmap.org)
+# and serve the same style as OPENSTREETMAP_URL since both fill the same store
+BASEMAP_SEED_URL = env.str("BASEMAP_SEED_URL", default="")
+
 # MATTERMOST SETTINGS
 
 # the webhook needs to be generated in mattermost and is linked to a active account
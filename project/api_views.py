@@ -6,21 +6,28 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ParseError
 
-from public_data.models import Cerema, Commune
+from public_data.geo_formats import BinaryGeoFormatMixin, queryset_parts
+from public_data.models import Cerema, Commune, SimplifiedGeometry
 from public_data.models.gpu import ZoneUrba
 from public_data.serializers import ZoneUrbaSerializer
+from utils.views_mixins import DataVersionETagMixin
 
 from .models import Emprise, Project
 from .serializers import EmpriseSerializer, ProjectCommuneSerializer
 from .views.mixins import UserQuerysetOrPublicMixin
 
 
-class EmpriseViewSet(viewsets.ReadOnlyModelViewSet):
+class EmpriseViewSet(DataVersionETagMixin, BinaryGeoFormatMixin, viewsets.ReadOnlyModelViewSet):
     """Endpoint that provide geojson data for a specific project"""
 
     queryset = Emprise.objects.all()
     serializer_class = EmpriseSerializer
     filter_field = "project_id"
+    etag_public = False
+
+    def get_etag_extra(self) -> str:
+        project_id = self.request.GET.get("id", "")
+        return Project.get_version_token(int(project_id)) if project_id.isdigit() else ""
 
     def get_queryset(self):
         """Check if an id is provided and return linked Emprises"""
@@ -33,8 +40,13 @@ class EmpriseViewSet(viewsets.ReadOnlyModelViewSet):
 
         return self.queryset.filter(**{self.filter_field: id})
 
+    def list(self, request, *args, **kwargs):
+        if self.get_binary_format():
+            return self.binary_response(*queryset_parts(self.get_queryset(), ["id", "project"]))
+        return super().list(request, *args, **kwargs)
+
 
-class ProjectViewSet(UserQuerysetOrPublicMixin, viewsets.ReadOnlyModelViewSet):
+class ProjectViewSet(UserQuerysetOrPublicMixin, BinaryGeoFormatMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectCommuneSerializer
 
@@ -57,6 +69,11 @@ class ProjectViewSet(UserQuerysetOrPublicMixin, viewsets.ReadOnlyModelViewSet):
         if bbox is not None and len(bbox) > 0:
             polygon_box = Polygon.from_bbox(bbox.split(","))
             queryset = queryset.filter(mpoly__bboverlaps=polygon_box)
+        try:
+            zoom = int(self.request.GET.get("zoom"))
+        except (TypeError, ValueError):
+            zoom = None
+        queryset = SimplifiedGeometry.annotate_simplified_mpoly(queryset, zoom)
         serializer = ProjectCommuneSerializer(queryset, many=True)
         return JsonResponse(serializer.data, status=200)
 
@@ -64,5 +81,7 @@ class ProjectViewSet(UserQuerysetOrPublicMixin, viewsets.ReadOnlyModelViewSet):
     def zones(self, request, pk):
         project = self.get_object()
         queryset = ZoneUrba.objects.intersect(project.combined_emprise)
+        if self.get_binary_format():
+            return self.binary_response(*queryset_parts(queryset, ZoneUrbaSerializer.Meta.fields))
         serializer = ZoneUrbaSerializer(queryset, many=True)
         return JsonResponse(serializer.data, status=200)
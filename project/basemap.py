@@ -0,0 +1,272 @@
+"""Basemap of the images generated by project tasks (cover image, theme maps).
+
+Raster tiles of OPENSTREETMAP_URL are kept in an MBTiles file (SQLite) shared by
+all the workers of a server, so a tile is downloaded once and not for each
+diagnostic. The store is bounded to BASEMAP_TILE_STORE_MAX_SIZE megabytes, least
+recently used tiles are removed first. Its size is kept up to date by triggers,
+so it is checked after each map without summing the tiles. Tiles of a departement
+can be downloaded in advance with seed_basemap_tiles command, from BASEMAP_SEED_URL
+since tile.openstreetmap.org forbids bulk downloads.
+
+With BASEMAP_OFFLINE, tiles are only read from the store: missing tiles are left
+blank instead of being downloaded. A tile server that is slow or rate-limiting
+gives blank tiles as well, maps are still generated.
+
+add_basemap replaces contextily.add_basemap for axes in EPSG:3857.
+"""
+import io
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import requests
+from django.conf import settings
+from PIL import Image
+
+from public_data.tile_cache import BBox, iter_tiles, tile_range
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS = 6378137.0
+ORIGIN_SHIFT = math.pi * EARTH_RADIUS
+MAX_ZOOM = 19
+TILE_TIMEOUT = 10
+# last_access is updated once per interval, to avoid a write for each read
+ACCESS_UPDATE_INTERVAL = 60 * 60 * 24
+# after an eviction, the store is reduced to this ratio of its max size
+EVICTION_RATIO = 0.9
+# tiles read at once to find the least recently used ones
+EVICTION_BATCH = 1000
+
+
+class TileStore:
+    """Raster tiles in an MBTiles file, rows use the TMS scheme (y from south)."""
+
+    def __init__(self, path: Path, max_size: int):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tiles ("
+                "zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB, "
+                "last_access INTEGER, PRIMARY KEY (zoom_level, tile_column, tile_row))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS tiles_last_access ON tiles (last_access)")
+            # size of the tiles, initialized from the tiles of a store created without it
+            connection.execute("CREATE TABLE IF NOT EXISTS store_size (size INTEGER NOT NULL)")
+            connection.execute(
+                "INSERT INTO store_size SELECT COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles "
+                "WHERE NOT EXISTS (SELECT 1 FROM store_size)"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS tiles_insert AFTER INSERT ON tiles "
+                "BEGIN UPDATE store_size SET size = size + LENGTH(NEW.tile_data); END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS tiles_update AFTER UPDATE OF tile_data ON tiles "
+                "BEGIN UPDATE store_size SET size = size - LENGTH(OLD.tile_data) + LENGTH(NEW.tile_data); END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS tiles_delete AFTER DELETE ON tiles "
+                "BEGIN UPDATE store_size SET size = size - LENGTH(OLD.tile_data); END"
+            )
+            connection.execute("INSERT OR IGNORE INTO metadata VALUES ('name', 'basemap'), ('format', 'png')")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def get_row(z: int, y: int) -> int:
+        return 2**z - 1 - y
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT tile_data, last_access FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, self.get_row(z, y)),
+        ).fetchone()
+        if row is None:
+            return None
+        now = int(time.time())
+        if row[1] < now - ACCESS_UPDATE_INTERVAL:
+            self.connection.execute(
+                "UPDATE tiles SET last_access = ? WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (now, z, x, self.get_row(z, y)),
+            )
+        return row[0]
+
+    def exists(self, z: int, x: int, y: int) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, self.get_row(z, y)),
+        ).fetchone()
+        return row is not None
+
+    def set(self, z: int, x: int, y: int, data: bytes) -> None:
+        # an upsert, as REPLACE would delete the previous tile without firing the delete trigger
+        self.connection.execute(
+            "INSERT INTO tiles VALUES (?, ?, ?, ?, ?) ON CONFLICT (zoom_level, tile_column, tile_row) "
+            "DO UPDATE SET tile_data = excluded.tile_data, last_access = excluded.last_access",
+            (z, x, self.get_row(z, y), data, int(time.time())),
+        )
+
+    def get_size(self) -> int:
+        return self.connection.execute("SELECT size FROM store_size").fetchone()[0]
+
+    def evict(self) -> int:
+        """Remove least recently used tiles when the store is too big, return the number of tiles removed."""
+        size = self.get_size()
+        if size <= self.max_size:
+            return 0
+        to_free = size - self.max_size * EVICTION_RATIO
+        removed = 0
+        while to_free > 0:
+            rows = self.connection.execute(
+                "SELECT rowid, LENGTH(tile_data) FROM tiles ORDER BY last_access, rowid LIMIT ?",
+                (EVICTION_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+            rowids = []
+            for rowid, length in rows:
+                if to_free <= 0:
+                    break
+                rowids.append((rowid,))
+                to_free -= length
+            self.connection.executemany("DELETE FROM tiles WHERE rowid = ?", rowids)
+            removed += len(rowids)
+        logger.info("%d basemap tiles removed from the store", removed)
+        return removed
+
+
+_store: Optional[TileStore] = None
+
+
+def get_tile_store() -> TileStore:
+    global _store
+    if _store is None or _store.path != Path(settings.BASEMAP_TILE_STORE):
+        _store = TileStore(
+            settings.BASEMAP_TILE_STORE,
+            max_size=settings.BASEMAP_TILE_STORE_MAX_SIZE * 1024 * 1024,
+        )
+    return _store
+
+
+def download_tile(z: int, x: int, y: int, source: str) -> Optional[bytes]:
+    """Return the tile from the tile server, None if it can't be downloaded."""
+    url = source.format(z=z, x=x, y=y)
+    try:
+        response = requests.get(url, headers={"User-Agent": settings.BASEMAP_USER_AGENT}, timeout=TILE_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        logger.warning("Basemap tile %s not downloaded: %s", url, exc)
+        return None
+    return response.content
+
+
+def get_tile(store: TileStore, z: int, x: int, y: int, source: str, offline: bool = False) -> Optional[bytes]:
+    data = store.get(z, x, y)
+    if data is None and not offline:
+        data = download_tile(z, x, y, source)
+        if data is not None:
+            store.set(z, x, y, data)
+    return data
+
+
+def mercator_to_lonlat(x: float, y: float) -> Tuple[float, float]:
+    lon = x / ORIGIN_SHIFT * 180.0
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS)) - math.pi / 2)
+    return lon, lat
+
+
+def get_tile_extent(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return (left, right, bottom, top) of a tile in EPSG:3857."""
+    size = 2 * ORIGIN_SHIFT / 2**z
+    left = -ORIGIN_SHIFT + x * size
+    top = ORIGIN_SHIFT - y * size
+    return left, left + size, top - size, top
+
+
+def calculate_zoom(bbox: BBox) -> int:
+    """Same zoom as contextily "auto" zoom."""
+    lon_min, lat_min, lon_max, lat_max = bbox
+    zoom_lon = math.ceil(math.log2(360 * 2.0 / max(lon_max - lon_min, 1e-9)))
+    zoom_lat = math.ceil(math.log2(360 * 2.0 / max(lat_max - lat_min, 1e-9)))
+    return int(min(zoom_lon, zoom_lat))
+
+
+def decode_tile(data: Optional[bytes]) -> Optional[np.ndarray]:
+    if data is None:
+        return None
+    try:
+        return np.asarray(Image.open(io.BytesIO(data)).convert("RGBA"))
+    except OSError as exc:
+        logger.warning("Basemap tile can't be decoded: %s", exc)
+        return None
+
+
+def get_basemap_image(bbox: BBox, zoom: int, source: str, offline: bool = False):
+    """Return (image, extent in EPSG:3857) of the tiles covering a bbox (EPSG:4326), missing
+    tiles are transparent."""
+    store = get_tile_store()
+    x_min, y_min, x_max, y_max = tile_range(bbox, zoom)
+    tiles: Dict[Tuple[int, int], Optional[np.ndarray]] = {
+        (x, y): decode_tile(get_tile(store, zoom, x, y, source, offline=offline))
+        for x in range(x_min, x_max + 1)
+        for y in range(y_min, y_max + 1)
+    }
+    store.evict()
+    tile_size = next((tile.shape[0] for tile in tiles.values() if tile is not None), 256)
+    image = np.zeros(((y_max - y_min + 1) * tile_size, (x_max - x_min + 1) * tile_size, 4), dtype=np.uint8)
+    for (x, y), tile in tiles.items():
+        if tile is not None and tile.shape[:2] == (tile_size, tile_size):
+            top, left = (y - y_min) * tile_size, (x - x_min) * tile_size
+            bottom, right = top + tile_size, left + tile_size
+            image[top:bottom, left:right] = tile
+    left, _, _, top = get_tile_extent(zoom, x_min, y_min)
+    _, right, bottom, _ = get_tile_extent(zoom, x_max, y_max)
+    return image, (left, right, bottom, top)
+
+
+def add_basemap(ax, zoom_adjust: int = 0, alpha: Optional[float] = None, source: Optional[str] = None) -> None:
+    """Draw the basemap under the content of axes in EPSG:3857."""
+    xmin, xmax, ymin, ymax = ax.axis()
+    lon_min, lat_min = mercator_to_lonlat(xmin, ymin)
+    lon_max, lat_max = mercator_to_lonlat(xmax, ymax)
+    bbox = (lon_min, lat_min, lon_max, lat_max)
+    zoom = min(MAX_ZOOM, max(0, calculate_zoom(bbox) + zoom_adjust))
+    image, extent = get_basemap_image(
+        bbox,
+        zoom,
+        source or settings.OPENSTREETMAP_URL,
+        offline=settings.BASEMAP_OFFLINE,
+    )
+    ax.imshow(image, extent=extent, interpolation="bilinear", alpha=alpha, zorder=0)
+    ax.axis((xmin, xmax, ymin, ymax))
+
+
+def seed_tiles(bbox: BBox, min_zoom: int, max_zoom: int, source: str, delay: float = 0.1) -> Iterable[int]:
+    """Download the missing tiles of a bbox (EPSG:4326), yield the zoom of each tile downloaded.
+    delay (seconds) between two downloads spares the tile server."""
+    store = get_tile_store()
+    for z, x, y in iter_tiles(bbox, min_zoom, max_zoom):
+        if store.exists(z, x, y):
+            continue
+        data = download_tile(z, x, y, source)
+        if data is not None:
+            store.set(z, x, y, data)
+            yield z
+        time.sleep(delay)
+    store.evict()
@@ -23,7 +23,7 @@ class ArtifByUsagePieChart(ArtifByCouverturePieChart):
                 if code not in data:
                     data[code] = 0
                 data[code] += row["surface"]
-            usage_list = {u.code_prefix: u for u in UsageSol.objects.all() if u.code_prefix in data}
+            usage_list = {u.code_prefix: u for u in UsageSol.get_cached() if u.code_prefix in data}
             self.series = [
                 {
                     "code_prefix": code,
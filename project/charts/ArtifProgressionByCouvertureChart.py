@@ -65,7 +65,7 @@ class ArtifProgressionByCouvertureChart(ProjectChart):
         series = []
 
         for item in self.get_data():
-            couverture = CouvertureSol.objects.get(code_prefix=item["code_prefix"])
+            couverture = CouvertureSol.get_by_code_prefix(item["code_prefix"])
             series.append(
                 {
                     "code_prefix": item["code_prefix"],
@@ -29,7 +29,7 @@ class ArtifProgressionByUsageChart(ArtifProgressionByCouvertureChart):
     def get_data(self):
         aggregate = defaultdict(lambda: {"artif": 0, "renat": 0})
 
-        for usage in UsageSol.objects.all():
+        for usage in UsageSol.get_cached():
             if usage.level == 1:
                 aggregate[usage.code_prefix] = {"artif": 0, "renat": 0}
 
@@ -45,7 +45,7 @@ class ArtifProgressionByUsageChart(ArtifProgressionByCouvertureChart):
         series = []
 
         for code, value in aggregate.items():
-            usage = UsageSol.objects.get(code_prefix=code)
+            usage = UsageSol.get_by_code_prefix(code)
             if value["artif"] == 0 and value["renat"] == 0:
                 continue
             series.append(
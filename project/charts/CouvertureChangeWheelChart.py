@@ -10,7 +10,7 @@ class CouvertureChangeWheelChart(ProjectChart):
     name = "Matrice de passage de la couverture"
     prefix = "cs"
     name_sol = "couverture"
-    items = CouvertureSol.objects.all()
+    sol_class = CouvertureSol
 
     @property
     def param(self):
@@ -53,13 +53,13 @@ class CouvertureChangeWheelChart(ProjectChart):
                         "id": f"{_.code_prefix} {_.label_short}",
                         "color": _.map_color,
                     }
-                    for _ in self.items
+                    for _ in self.sol_class.get_cached()
                 ],
             }
         )
 
     def get_serie_label(self, code_prefix) -> str:
-        return f"{code_prefix} {CouvertureSol.objects.get(code_prefix=code_prefix).label_short}"
+        return f"{code_prefix} {self.sol_class.get_by_code_prefix(code_prefix).label_short}"
 
     def get_data(self):
         self.data = (
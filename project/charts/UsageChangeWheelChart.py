@@ -7,7 +7,7 @@ class UsageChangeWheelChart(CouvertureChangeWheelChart):
     name = "Matrice de passage de l'usage"
     prefix = "us"
     name_sol = "usage"
-    items = UsageSol.objects.all()
+    sol_class = UsageSol
 
     @property
     def param(self):
@@ -19,6 +19,3 @@ class UsageChangeWheelChart(CouvertureChangeWheelChart):
                 )
             },
         }
-
-    def get_serie_label(self, code_prefix) -> str:
-        return f"{code_prefix} {UsageSol.objects.get(code_prefix=code_prefix).label_short}"
@@ -0,0 +1,105 @@
+"""Geometries of the images generated by project tasks (theme maps, cover image).
+
+Geometries are transformed to EPSG:3857 and simplified to the size of a pixel of
+the image by PostGIS, then fetched as WKB and decoded at once with shapely
+vectorized functions. Neither EWKT nor reprojection is done in Python, and the
+number of vertices depends on the image resolution rather than on the territory.
+
+to_merged_geodataframe also clips the geometries to the emprise and merges them
+in one geometry per colour class, for layers with many small polygons (OCS GE):
+polygons are snapped to a grid of the size of a pixel so that neighbours share
+their borders and are dissolved by the union. A polygon smaller than a pixel,
+which would collapse, is drawn as the pixel containing it.
+"""
+from typing import Optional, Sequence, Tuple
+
+import geopandas
+import numpy as np
+import shapely
+from django.contrib.gis.db.models import GeometryField, Union
+from django.contrib.gis.db.models.functions import (
+    AsWKB,
+    Intersection,
+    MakeValid,
+    PointOnSurface,
+    SnapToGrid,
+    Transform,
+)
+from django.contrib.gis.geos import GEOSGeometry
+from django.db.models import Case, FloatField, Func, QuerySet, Value, When
+
+from utils.db import Simplify
+
+MAP_SRID = 3857
+
+
+def get_pixel_size(geom: GEOSGeometry, figsize: Tuple[float, float], dpi: int) -> float:
+    """Size in meters (EPSG:3857) of a pixel of a map of geom extent drawn in a figure."""
+    xmin, ymin, xmax, ymax = geom.transform(MAP_SRID, clone=True).extent
+    width, height = figsize
+    return max((xmax - xmin) / (width * dpi), (ymax - ymin) / (height * dpi))
+
+
+def to_geodataframe(
+    queryset: QuerySet,
+    fields: Sequence[str] = (),
+    geometry_field: str = "mpoly",
+    tolerance: float = 0,
+) -> geopandas.GeoDataFrame:
+    """Return a GeoDataFrame in EPSG:3857 of the queryset, with the fields as columns.
+    Geometries are simplified with the tolerance (meters), rows without geometry are removed."""
+    geometry = Transform(geometry_field, MAP_SRID)
+    if tolerance:
+        geometry = Simplify(geometry, tolerance)
+    rows = queryset.annotate(map_wkb=AsWKB(geometry)).values_list(*fields, "map_wkb")
+    columns = list(zip(*rows)) or [()] * (len(fields) + 1)
+    wkbs = np.array([bytes(wkb) if wkb is not None else None for wkb in columns[-1]], dtype=object)
+    gdf = geopandas.GeoDataFrame(geometry=shapely.from_wkb(wkbs), crs=f"EPSG:{MAP_SRID}")
+    for name, values in zip(fields, columns):
+        gdf[name] = list(values)
+    return gdf[gdf.geometry.notna()]
+
+
+def geometry_to_geodataframe(geom: GEOSGeometry) -> geopandas.GeoDataFrame:
+    """Return a GeoDataFrame in EPSG:3857 with the geometry as only row."""
+    geometry = shapely.from_wkb(bytes(geom.transform(MAP_SRID, clone=True).wkb))
+    return geopandas.GeoDataFrame(geometry=[geometry], crs=f"EPSG:{MAP_SRID}")
+
+
+def to_merged_geodataframe(
+    queryset: QuerySet,
+    emprise: GEOSGeometry,
+    tolerance: float,
+    class_field: Optional[str] = None,
+    geometry_field: str = "mpoly",
+) -> geopandas.GeoDataFrame:
+    """Return a GeoDataFrame in EPSG:3857 with a row per value of class_field (one row
+    if None). Geometries are simplified and snapped with the tolerance (meters), those
+    smaller than tolerance² are replaced by a square of the tolerance, then they are
+    clipped to the emprise and merged by PostGIS, empty classes are removed."""
+    clip = emprise.transform(MAP_SRID, clone=True).simplify(tolerance, preserve_topology=True)
+    geometry = Transform(geometry_field, MAP_SRID)
+    queryset = queryset.alias(map_area=Func(geometry, function="ST_Area", output_field=FloatField()))
+    pixel = Func(
+        PointOnSurface(geometry),
+        Value(tolerance / 2),
+        function="ST_Expand",
+        output_field=GeometryField(srid=MAP_SRID),
+    )
+    geometry = Case(
+        When(map_area__lt=tolerance**2, then=pixel),
+        default=Simplify(geometry, tolerance),
+        output_field=GeometryField(srid=MAP_SRID),
+    )
+    geometry = Intersection(MakeValid(SnapToGrid(geometry, tolerance)), clip)
+    map_wkb = AsWKB(Union(geometry))
+    if class_field is None:
+        rows = [(None, queryset.aggregate(map_wkb=map_wkb)["map_wkb"])]
+    else:
+        rows = list(
+            queryset.order_by().values(class_field).annotate(map_wkb=map_wkb).values_list(class_field, "map_wkb")
+        )
+    wkbs = np.array([bytes(wkb) if wkb is not None else None for _, wkb in rows], dtype=object)
+    gdf = geopandas.GeoDataFrame(geometry=shapely.from_wkb(wkbs), crs=f"EPSG:{MAP_SRID}")
+    gdf["class"] = [value for value, _ in rows]
+    return gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
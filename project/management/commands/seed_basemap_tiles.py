@@ -0,0 +1,45 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from project.basemap import seed_tiles
+from public_data.models import Departement
+
+logger = logging.getLogger("management.commands")
+
+
+class Command(BaseCommand):
+    help = "Download the basemap tiles of a departement in the tile store, to generate images offline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--departement", type=str, required=True, help="Departement source_id or name")
+        parser.add_argument("--min-zoom", type=int, default=6)
+        parser.add_argument("--max-zoom", type=int, default=14)
+        parser.add_argument("--delay", type=float, default=0.1, help="Seconds between two downloads")
+
+    def handle(self, *args, **options):
+        if settings.BASEMAP_OFFLINE:
+            raise ValueError("Basemap is offline, unset BASEMAP_OFFLINE to download tiles")
+        if not settings.BASEMAP_SEED_URL or "tile.openstreetmap.org" in settings.BASEMAP_SEED_URL:
+            raise ValueError("Set BASEMAP_SEED_URL to a tile server allowing bulk downloads")
+
+        departement_param = options["departement"]
+        departement = Departement.objects.filter(
+            Q(source_id=departement_param) | Q(name__icontains=departement_param)
+        ).first()
+        if not departement:
+            raise ValueError(f"{departement_param} is not a valid departement")
+
+        min_zoom, max_zoom = options["min_zoom"], options["max_zoom"]
+        logger.info("Seed basemap tiles of %s from zoom %d to %d", departement.name, min_zoom, max_zoom)
+
+        count = 0
+        for _ in seed_tiles(
+            departement.mpoly.extent, min_zoom, max_zoom, settings.BASEMAP_SEED_URL, delay=options["delay"]
+        ):
+            count += 1
+            if count % 1000 == 0:
+                logger.info("%d tiles downloaded", count)
+        logger.info("Done, %d tiles downloaded", count)
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.13 on 2024-07-22 09:41
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("project", "0089_rnupackagerequest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CombinedEmprise",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("mpoly", django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+                (
+                    "srid_source",
+                    models.IntegerField(
+                        choices=[
+                            (2154, "France Métropolitaine et Corse"),
+                            (32620, "Guadeloupe et Martinique"),
+                            (2972, "Guyane Française"),
+                            (2975, "La réunion"),
+                            (4326, "Monde (GPS)"),
+                            (3857, "Monde (Google Maps, OpenStreetMap etc.)"),
+                        ],
+                        default=2154,
+                        verbose_name="SRID",
+                    ),
+                ),
+                ("bbox", django.contrib.gis.db.models.fields.PolygonField(srid=4326)),
+                ("centroid", django.contrib.gis.db.models.fields.PointField(srid=4326)),
+                ("area", models.FloatField(help_text="Calculée dans le SRID source", verbose_name="Surface (ha)")),
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="combined",
+                        to="project.project",
+                        verbose_name="Projet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO project_combinedemprise (project_id, mpoly, srid_source, bbox, centroid, area)
+            SELECT
+                u.project_id,
+                u.mpoly,
+                u.srid_source,
+                ST_Envelope(u.mpoly),
+                ST_Centroid(u.mpoly),
+                ST_Area(ST_Transform(u.mpoly, u.srid_source)) / 10000
+            FROM (
+                SELECT
+                    project_id,
+                    ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_Union(mpoly)), 3)) AS mpoly,
+                    min(srid_source) AS srid_source
+                FROM project_emprise
+                GROUP BY project_id
+            ) AS u
+            WHERE u.mpoly IS NOT NULL AND NOT ST_IsEmpty(u.mpoly)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2024-07-24 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("project", "0090_combinedemprise"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectAnalyticsSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.CharField(max_length=50, verbose_name="Version")),
+                ("data", models.BinaryField(verbose_name="Données")),
+                ("updated_date", models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")),
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analytics_snapshot",
+                        to="project.project",
+                        verbose_name="Projet",
+                    ),
+                ),
+            ],
+        ),
+    ]
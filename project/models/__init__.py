@@ -1,8 +1,10 @@
 __all__ = [
+    "CombinedEmprise",
     "create_from_public_key",
     "Emprise",
     "ErrorTracking",
     "Project",
+    "ProjectAnalyticsSnapshot",
     "ProjectCommune",
     "Request",
     "trigger_async_tasks",
@@ -13,7 +15,13 @@ __all__ = [
 ]
 
 
-from .project_base import Emprise, Project, ProjectCommune
+from .project_base import (
+    CombinedEmprise,
+    Emprise,
+    Project,
+    ProjectAnalyticsSnapshot,
+    ProjectCommune,
+)
 from .request import ErrorTracking, Request, RequestedDocumentChoices
 from .RNUPackage import RNUPackage
 from .RNUPackageRequest import RNUPackageRequest
@@ -1,6 +1,7 @@
-from typing import List
+from typing import Dict, List
 
 import celery
+from django.core.cache import cache
 
 from project import tasks
 from project.models import Project
@@ -44,41 +45,128 @@ def map_tasks(project_id: str) -> List[celery.Task]:  # noqa: C901
         if not project.async_theme_map_fill_gpu_done:
             map_tasks.append(tasks.generate_theme_map_fill_gpu.si(project.id))
 
-    celery.group(*map_tasks, immutable=True).apply_async(queue="long")
+    # pages are cached once the maps are saved, as saving the project changes its cache namespace
+    warm_up = tasks.warm_report_cache.si(project.id).set(queue="long")
+    if map_tasks:
+        celery.chord(celery.group(*map_tasks, immutable=True), warm_up).apply_async(queue="long")
+    else:
+        warm_up.apply_async()
 
 
-def trigger_async_tasks(project: Project, public_key: str | None = None) -> None:
-    from brevo.tasks import send_diagnostic_to_brevo
-    from metabase.tasks import async_create_stat_for_project
-    from project import tasks as t
+# steps of the creation of a diagnostic: label and flag of the project set when done
+DIAGNOSTIC_STEPS = {
+    "add_city": ("Ajout des communes", "async_add_city_done"),
+    "set_combined_emprise": ("Calcul de l'emprise du territoire", "async_set_combined_emprise_done"),
+    "find_first_and_last_ocsge": ("Recherche des millésimes OCS GE", "async_find_first_and_last_ocsge_done"),
+    "calculate_project_ocsge_status": ("Couverture OCS GE", "async_ocsge_coverage_status_done"),
+    "add_comparison_lands": ("Ajout des territoires de comparaison", "async_add_comparison_lands_done"),
+    "map_tasks": ("Lancement de la génération des cartes", None),
+    "build_analytics_snapshot": ("Calcul des indicateurs", None),
+}
+STEP_PENDING = "pending"
+STEP_DONE = "done"
+STEP_FAILED = "failed"
+STEP_STATE_TIMEOUT = 60 * 60 * 24
+
+
+def get_step_state_key(project_id: int, step: str) -> str:
+    return f"project/{project_id}/step/{step}"
+
+
+def set_step_state(project_id: int, step: str, state: str) -> None:
+    cache.set(get_step_state_key(project_id, step), state, timeout=STEP_STATE_TIMEOUT)
+
+
+@celery.shared_task
+def record_step_state(project_id: int, step: str, state: str) -> None:
+    set_step_state(project_id, step, state)
+
+
+def get_steps_state(project: Project) -> Dict[str, str]:
+    """Return {label: state} of the creation steps, state of the last run recorded or
+    deduced from the flags of the project."""
+    keys = {get_step_state_key(project.id, step): step for step in DIAGNOSTIC_STEPS}
+    recorded = {keys[key]: state for key, state in cache.get_many(list(keys)).items()}
+    steps = {}
+    for step, (label, flag) in DIAGNOSTIC_STEPS.items():
+        if step in recorded:
+            steps[label] = recorded[step]
+        elif flag and getattr(project, flag):
+            steps[label] = STEP_DONE
+        else:
+            steps[label] = STEP_PENDING
+    return steps
+
+
+def get_step(project: Project, step: str, *args) -> celery.Signature:
+    """Signature of a creation step, recording its state when it ends."""
+    task = map_tasks if step == "map_tasks" else getattr(tasks, step)
+    set_step_state(project.id, step, STEP_PENDING)
+    return task.si(project.id, *args).set(
+        link=record_step_state.si(project.id, step, STEP_DONE),
+        link_error=record_step_state.si(project.id, step, STEP_FAILED),
+    )
+
+
+def get_pending_step(project: Project, step: str, *args) -> celery.Signature | None:
+    """Signature of a creation step, None when the project flag says it is already done."""
+    _, flag = DIAGNOSTIC_STEPS[step]
+    if getattr(project, flag):
+        return None
+    return get_step(project, step, *args)
 
-    if not public_key:
-        public_key = project.get_public_key()
 
-    tasks_list = []
+def serial(*signatures: celery.Signature | None) -> celery.Signature | None:
+    signatures = [s for s in signatures if s is not None]
+    if len(signatures) <= 1:
+        return signatures[0] if signatures else None
+    return celery.chain(*signatures)
 
-    if not project.async_add_city_done:
-        tasks_list.append(t.add_city.si(project.id, public_key))
 
-    if not project.async_set_combined_emprise_done:
-        tasks_list.append(t.set_combined_emprise.si(project.id))
+def parallel(*signatures: celery.Signature | None) -> celery.Signature | None:
+    signatures = [s for s in signatures if s is not None]
+    if len(signatures) <= 1:
+        return signatures[0] if signatures else None
+    return celery.group(*signatures)
 
-    if not project.async_find_first_and_last_ocsge_done:
-        tasks_list.append(t.find_first_and_last_ocsge.si(project.id))
 
-    if not project.async_ocsge_coverage_status_done:
-        tasks_list.append(t.calculate_project_ocsge_status.si(project.id))
+def get_diagnostic_steps(project: Project, public_key: str) -> celery.Signature | None:
+    """Creation steps as a graph: steps depending only on the cities run in parallel,
+    so the project is ready to be displayed after the longest branch.
 
-    if not project.async_add_comparison_lands_done:
-        tasks_list.append(t.add_comparison_lands.si(project.id))
+    add_city ─┬─ set_combined_emprise ── add_comparison_lands ─┬─ map_tasks ── build_analytics_snapshot
+              ├─ find_first_and_last_ocsge ─────────────────────┤
+              └─ calculate_project_ocsge_status ────────────────┘
+    """
+    return serial(
+        get_pending_step(project, "add_city", public_key),
+        parallel(
+            serial(
+                get_pending_step(project, "set_combined_emprise"),
+                get_pending_step(project, "add_comparison_lands"),
+            ),
+            get_pending_step(project, "find_first_and_last_ocsge"),
+            get_pending_step(project, "calculate_project_ocsge_status"),
+        ),
+        get_step(project, "map_tasks"),
+        get_step(project, "build_analytics_snapshot"),
+    )
+
+
+def trigger_async_tasks(project: Project, public_key: str | None = None) -> None:
+    from brevo.tasks import send_diagnostic_to_brevo
+    from metabase.tasks import async_create_stat_for_project
+
+    if not public_key:
+        public_key = project.get_public_key()
 
     return celery.chain(
-        *[
-            *tasks_list,
-            map_tasks.si(project.id),
+        get_diagnostic_steps(project, public_key),
+        # stats and brevo don't depend on each other
+        celery.group(
             async_create_stat_for_project.si(project.id, do_location=True),
             send_diagnostic_to_brevo.si(project.id),
-        ]
+        ),
     ).apply_async()
 
 
@@ -182,28 +270,8 @@ def trigger_async_tasks_rnu_pakage_one_off(project: Project, public_key: str | N
     if not public_key:
         public_key = project.get_public_key()
 
-    tasks_list = []
-
-    if not project.async_add_city_done:
-        tasks_list.append(t.add_city.si(project.id, public_key))
-
-    if not project.async_set_combined_emprise_done:
-        tasks_list.append(t.set_combined_emprise.si(project.id))
-
-    if not project.async_find_first_and_last_ocsge_done:
-        tasks_list.append(t.find_first_and_last_ocsge.si(project.id))
-
-    if not project.async_ocsge_coverage_status_done:
-        tasks_list.append(t.calculate_project_ocsge_status.si(project.id))
-
-    if not project.async_add_comparison_lands_done:
-        tasks_list.append(t.add_comparison_lands.si(project.id))
-
     return celery.chain(
-        *[
-            *tasks_list,
-            map_tasks.si(project.id),
-        ],
+        get_diagnostic_steps(project, public_key),
         async_create_stat_for_project.si(project.id, do_location=True),
         create_request_rnu_package_one_off.si(project.id),
         t.generate_word_diagnostic_rnu_package_one_off.si(project.id),
@@ -1,6 +1,12 @@
 import collections
+import functools
+import hashlib
+import inspect
 import logging
+import pickle
+import time
 import traceback
+import zlib
 from decimal import Decimal
 from typing import Dict, List, Literal
 
@@ -11,8 +17,9 @@ from django.contrib.gis.db.models import Extent, Union
 from django.contrib.gis.db.models.functions import Area, Centroid
 from django.contrib.gis.geos import MultiPolygon, Polygon
 from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models import Case, Count, DecimalField, F, Q, QuerySet, Sum, Value, When
 from django.db.models.functions import Cast, Coalesce, Concat
 from django.urls import reverse
@@ -23,7 +30,8 @@ from simple_history.models import HistoricalRecords
 from config.storages import PublicMediaStorage
 from project.models.enums import ProjectChangeReason
 from project.models.exceptions import TooOldException
-from public_data.exceptions import LandException
+from public_data.consommation_cube import ConsommationCube, get_consommation_cube
+from public_data.data_version import get_data_version
 from public_data.models import (
     AdminRef,
     Cerema,
@@ -127,6 +135,24 @@ class ProjectCommune(models.Model):
     commune = models.ForeignKey("public_data.Commune", on_delete=models.PROTECT)
     group_name = models.CharField("Nom du groupe", max_length=100, blank=True, null=True)
 
+    @classmethod
+    def add_communes(cls, project_id: int, communes: QuerySet) -> int:
+        """Link the communes of a queryset to a project with one INSERT ... SELECT, communes
+        already linked are skipped. Return the number of communes added."""
+        table = cls._meta.db_table
+        communes_sql, communes_params = communes.values("id").query.sql_with_params()
+        query = f"""
+            INSERT INTO {table} (project_id, commune_id)
+            SELECT DISTINCT %s, c.id
+            FROM ({communes_sql}) AS c
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table} pc WHERE pc.project_id = %s AND pc.commune_id = c.id
+            )
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(query, [project_id, *communes_params, project_id])
+            return cursor.rowcount
+
 
 class CityGroup:
     def __init__(self, name: str):
@@ -140,6 +166,39 @@ class CityGroup:
         return self.name
 
 
+def get_analytics_key(signature: inspect.Signature, name: str, args, kwargs) -> str | None:
+    """Return the key of a method call in the analytics snapshot, None if an argument
+    can't be part of a key (geometry...)."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = list(bound.arguments.items())[1:]
+    if any(not isinstance(value, (str, int, float, bool, type(None))) for _, value in params):
+        return None
+    return f"{name}({', '.join(f'{key}={value!r}' for key, value in params)})"
+
+
+def analytics_snapshot(method):
+    """Serve the result of a Project method from its ProjectAnalyticsSnapshot when the
+    call, with the same arguments, has been computed by the snapshot build."""
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = get_analytics_key(signature, method.__name__, (self, *args), kwargs)
+        if key is not None:
+            values = self.get_analytics_snapshot_values()
+            if key in values:
+                try:
+                    return pickle.loads(values[key])
+                except Exception as exc:
+                    # pickled by another version of the code (renamed class or field...)
+                    logger.warning("Analytics %s of project %d can't be read: %s", key, self.id, exc)
+        return method(self, *args, **kwargs)
+
+    wrapper.signature = signature
+    return wrapper
+
+
 class Project(BaseProject):
     class OcsgeCoverageStatus(models.TextChoices):
         COMPLETE_UNIFORM = "COMPLETE_UNIFORM", "Complet et uniforme"
@@ -480,7 +539,75 @@ class Project(BaseProject):
     def save(self, *args, **kwargs):
         logger.info("Saving project %d: update_fields=%s", self.id, str(kwargs.get("update_fields", [])))
         super().save(*args, **kwargs)
-        cache.delete_pattern(f"*project/{self.id}/*")
+        self.bump_cache_generation(self.id)
+
+    @classmethod
+    def get_cache_generation(cls, project_id) -> int:
+        """Generation of the cached data of a project, changed by each save.
+
+        A new generation is a timestamp, so a counter evicted from the cache can't
+        come back to a value used by older entries.
+        """
+        key = f"project_generation/{project_id}"
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            generation = cache.get(key)
+        return generation
+
+    @classmethod
+    def bump_cache_generation(cls, project_id) -> None:
+        cache.set(f"project_generation/{project_id}", time.time_ns(), timeout=None)
+
+    @classmethod
+    def get_cache_namespace(cls, project_id) -> str:
+        """Prefix of the cache keys of a project: outdated by a save of the project or
+        a new data version, without deleting any key."""
+        return f"project/{project_id}/v{get_data_version()}.g{cls.get_cache_generation(project_id)}"
+
+    _analytics_snapshot_values = None
+
+    def get_analytics_version(self) -> str:
+        """Version of the analytics snapshot: it changes with the data, the period or
+        the parameters of the project the reports depend on, and with the application
+        version since results are pickled instances of its classes."""
+        params = [
+            settings.OFFICIAL_VERSION,
+            ProjectAnalyticsSnapshot.SCHEMA_VERSION,
+            self.analyse_start_date,
+            self.analyse_end_date,
+            self.level,
+            self.first_year_ocsge,
+            self.last_year_ocsge,
+            self.look_a_like,
+        ]
+        digest = hashlib.md5(repr(params).encode()).hexdigest()[:12]
+        return f"{get_data_version()}.{digest}"
+
+    def get_analytics_snapshot_values(self) -> dict:
+        """Return {call key: pickled result} of the snapshot, loaded once per instance."""
+        if self._analytics_snapshot_values is None:
+            self._analytics_snapshot_values = ProjectAnalyticsSnapshot.load(self)
+        return self._analytics_snapshot_values
+
+    @classmethod
+    def get_version_token(cls, project_id) -> str:
+        """Token changing each time the project territory may have changed, used in ETags of map layers.
+        The cache generation is bumped by every save, even when update_fields leaves updated_date out.
+
+        Return an empty string if the project does not exist.
+        """
+        state = (
+            cls.objects.filter(id=project_id)
+            .values_list("updated_date", "async_add_city_done", "async_set_combined_emprise_done")
+            .first()
+        )
+        if state is None:
+            return ""
+        updated_date, add_city_done, combined_emprise_done = state
+        generation = cls.get_cache_generation(project_id)
+        flags = f"{int(add_city_done)}{int(combined_emprise_done)}"
+        return f"{project_id}.{int(updated_date.timestamp())}.{generation}.{flags}"
 
     def get_territory_name(self):
         if self.territory_name:
@@ -500,6 +627,26 @@ class Project(BaseProject):
             self.save(update_fields=["folder_name"])
         return self.folder_name
 
+    @cached_property
+    def persisted_emprise(self):
+        """Return the union of emprises stored by set_combined_emprise task, None if not built yet."""
+        try:
+            return self.combined
+        except ObjectDoesNotExist:
+            return None
+
+    @cached_property
+    def combined_emprise(self) -> MultiPolygon:
+        if self.persisted_emprise is not None:
+            return self.persisted_emprise.mpoly
+        return super().combined_emprise
+
+    def update_combined_emprise(self) -> None:
+        """Store the union of the emprises, should be called each time emprises change."""
+        CombinedEmprise.build(self)
+        self.__dict__.pop("persisted_emprise", None)
+        self.__dict__.pop("combined_emprise", None)
+
     @property
     def area(self) -> float:
         """
@@ -507,10 +654,14 @@ class Project(BaseProject):
         As this value should not change after the creation of a project,
         we cache it for an arbitrary long time.
         """
-        cache_key = f"project/{self.id}/area"
+        if self.persisted_emprise is not None:
+            return self.persisted_emprise.area
+
+        cache_key = f"{self.get_cache_namespace(self.id)}/area"
 
-        if cache.has_key(cache_key):
-            return cache.get(cache_key)
+        total_area = cache.get(cache_key)
+        if total_area is not None:
+            return total_area
 
         total_area = 0
 
@@ -575,9 +726,10 @@ class Project(BaseProject):
         """Return all OCS GE millésimes available within project cities and between
         project analyse start and end date"""
         ids = self.cities.filter(departement__is_artif_ready=True).values_list("departement_id", flat=True).distinct()
+        cached_millesimes = Departement.get_cached_ocsge_millesimes()
         years = set()
-        for dept in Departement.objects.filter(id__in=ids):
-            years.update(dept.ocsge_millesimes)
+        for dept_id in ids:
+            years.update(cached_millesimes.get(dept_id) or [])
         return [x for x in years if self.analyse_start_date <= x <= self.analyse_end_date]
 
     def add_look_a_like(self, public_key, many=False):
@@ -616,18 +768,12 @@ class Project(BaseProject):
 
     def get_look_a_like(self):
         """If a public_key is corrupted it removes it and hide the error"""
-        lands = list()
-        to_remove = list()
         try:
             # TODO: use ArrayField in models
             public_keys = {_ for _ in self.look_a_like.split(";") if _}
         except AttributeError:
             public_keys = set()
-        for public_key in public_keys:
-            try:
-                lands.append(Land(public_key))
-            except LandException:
-                to_remove.append(public_key)
+        lands, to_remove = Land.resolve(public_keys)
         if to_remove:
             self.remove_look_a_like(to_remove, many=True)
             self.save(update_fields=["look_a_like"])
@@ -647,16 +793,23 @@ class Project(BaseProject):
     # }
     couverture_usage = models.JSONField(blank=True, null=True)
 
-    def get_cerema_cities(self, group_name=None):
+    def get_cities_insee(self, group_name=None):
         if not group_name:
-            code_insee = self.cities.all().values_list("insee", flat=True)
-        else:
-            code_insee = self.projectcommune_set.filter(group_name=group_name)
-            code_insee = code_insee.values_list("commune__insee", flat=True)
+            return self.cities.all().values_list("insee", flat=True)
+        code_insee = self.projectcommune_set.filter(group_name=group_name)
+        return code_insee.values_list("commune__insee", flat=True)
+
+    def get_cerema_cities(self, group_name=None):
+        code_insee = self.get_cities_insee(group_name=group_name)
         qs = Cerema.objects.pre_annotated()
         qs = qs.filter(city_insee__in=code_insee)
         return qs
 
+    def get_cube_rows(self, cube: ConsommationCube, group_name=None):
+        """Return the rows of the project's cities in the consommation cube."""
+        return cube.get_rows(self.get_cities_insee(group_name=group_name))
+
+    @analytics_snapshot
     def get_determinants(self, group_name=None):
         """Return determinant for project's periode
         {
@@ -680,6 +833,15 @@ class Project(BaseProject):
             "inc": "Inconnu",
         }
         results = {f: dict() for f in determinants.values()}
+        cube = get_consommation_cube()
+        if cube is not None:
+            rows = self.get_cube_rows(cube, group_name=group_name)
+            if not len(rows):
+                return results
+            conso = cube.sum_per_year_and_determinant(rows, self.analyse_start_date, self.analyse_end_date)
+            for det, name in determinants.items():
+                results[name] = {year: max(val / 10000, 0) for year, val in conso[det].items()}
+            return results
         args = []
         for year in self.years:
             start = year[-2:]
@@ -695,18 +857,26 @@ class Project(BaseProject):
                 results[det][year] = surface_in_sqm if surface_in_sqm >= 0 else 0
         return results
 
+    @analytics_snapshot
     def get_bilan_conso(self):
         """Return the space consummed between 2011 and 2020 in hectare"""
         qs = self.get_cerema_cities().aggregate(bilan=Coalesce(Sum("naf11art21"), float(0)))
         return qs["bilan"] / 10000
 
+    @analytics_snapshot
     def get_bilan_conso_per_year(self):
         """Return the space consummed per year between 2011 and 2020"""
+        cube = get_consommation_cube()
+        if cube is not None:
+            rows = self.get_cube_rows(cube)
+            conso = cube.sum_per_year(rows, "2011", "2021")
+            return {year: val / 10000 if len(rows) else None for year, val in conso.items()}
         qs = self.get_cerema_cities().aggregate(
             **{f"20{f[3:5]}": Sum(f) / 10000 for f in Cerema.get_art_field("2011", "2021")}
         )
         return qs
 
+    @analytics_snapshot
     def get_bilan_conso_time_scoped(self):
         """Return land consummed during the project time scope (between
         analyze_start_data and analyze_end_date)
@@ -725,14 +895,20 @@ class Project(BaseProject):
 
     _conso_per_year = None
 
+    @analytics_snapshot
     def get_conso_per_year(self, coef=1):
         """Return Cerema data for the project, transposed and named after year"""
+        cube = get_consommation_cube()
+        if cube is not None:
+            conso = cube.sum_per_year(self.get_cube_rows(cube), self.analyse_start_date, self.analyse_end_date)
+            return {year: val / 10000 * float(coef) for year, val in conso.items()}
         qs = self.get_cerema_cities()
         fields = Cerema.get_art_field(self.analyse_start_date, self.analyse_end_date)
         args = (Sum(field) for field in fields)
         qs = qs.aggregate(*args)
         return {f"20{key[3:5]}": float(val / 10000) * float(coef) for key, val in qs.items()}
 
+    @analytics_snapshot
     def get_pop_change_per_year(self, criteria: Literal["pop", "household"] = "pop") -> Dict:
         cities = (
             CommunePop.objects.filter(city__in=self.cities.all())
@@ -749,6 +925,7 @@ class Project(BaseProject):
             data = {str(city["year"]): city["household_progression"] for city in cities}
         return {year: data.get(year, None) for year in self.years}
 
+    @analytics_snapshot
     def get_land_conso_per_year(self, level, group_name=None):
         """Return conso data aggregated by a specific level
         {
@@ -766,12 +943,22 @@ class Project(BaseProject):
         * region_name
         * scot [experimental]
         """
+        cube = get_consommation_cube()
+        if cube is not None and level in cube.labels:
+            conso = cube.sum_per_year_by(
+                self.get_cube_rows(cube, group_name=group_name),
+                level,
+                self.analyse_start_date,
+                self.analyse_end_date,
+            )
+            return {label: {year: val / 10000 for year, val in years.items()} for label, years in conso.items()}
         fields = Cerema.get_art_field(self.analyse_start_date, self.analyse_end_date)
         qs = self.get_cerema_cities(group_name=group_name)
         qs = qs.values(level)
         qs = qs.annotate(**{f"20{field[3:5]}": Sum(field) / 10000 for field in fields})
         return {row[level]: {year: row[year] for year in self.years} for row in qs}
 
+    @analytics_snapshot
     def get_city_conso_per_year(self, group_name=None):
         """Return year artificialisation of each city in the project, on project
         time scope
@@ -786,31 +973,32 @@ class Project(BaseProject):
         """
         return self.get_land_conso_per_year("city_name", group_name=group_name)
 
+    @analytics_snapshot
     def get_look_a_like_conso_per_year(self):
         """Return same data as get_conso_per_year but for land listed in
         look_a_like property"""
+        lands = self.get_look_a_like()
+        conso = Land.get_conso_by_lands(lands, self.analyse_start_date, self.analyse_end_date)
         return {
-            land.name: land.get_conso_per_year(
-                self.analyse_start_date,
-                self.analyse_end_date,
-            )
-            for land in self.get_look_a_like()
+            land.name: {str(year): values["total"] / 10000 for year, values in conso[land.public_key].items()}
+            for land in lands
         }
 
+    @analytics_snapshot
     def get_look_a_like_pop_change_per_year(
         self,
         criteria: Literal["pop", "household"] = "pop",
     ):
         """Return same data as get_pop_per_year but for land listed in
         look_a_like property"""
-        return {
-            land.name: land.get_pop_change_per_year(
-                self.analyse_start_date,
-                self.analyse_end_date,
-                criteria=criteria,
-            )
-            for land in self.get_look_a_like()
-        }
+        lands = self.get_look_a_like()
+        pop_change = Land.get_pop_change_by_lands(
+            lands,
+            self.analyse_start_date,
+            self.analyse_end_date,
+            criteria=criteria,
+        )
+        return {land.name: pop_change[land.public_key] for land in lands}
 
     def get_absolute_url(self):
         return reverse("project:detail", kwargs={"pk": self.pk})
@@ -819,6 +1007,8 @@ class Project(BaseProject):
         """Remove everything from project dependencies
         ..TODO:: overload delete to remove files"""
         self.emprise_set.all().delete()
+        CombinedEmprise.objects.filter(project=self).delete()
+        self.__dict__.pop("persisted_emprise", None)
         self.import_status = BaseProject.Status.MISSING
         self.import_date = None
         self.import_error = None
@@ -826,11 +1016,13 @@ class Project(BaseProject):
         if save:
             self.save()
 
+    @analytics_snapshot
     def get_artif_area(self):
         """Return artificial surface total for all city inside diagnostic"""
         result = self.cities.all().aggregate(total=Sum("surface_artif"))
         return result["total"] or 0
 
+    @analytics_snapshot
     def get_artif_per_maille_and_period(self):
         """Return example: {"new_artif": 12, "new_natural": 2: "net_artif": 10}"""
         mapping = {
@@ -872,6 +1064,7 @@ class Project(BaseProject):
                 "area": [0],
             }
 
+    @analytics_snapshot
     def get_artif_progession_time_scoped(self):
         """Return example: {"new_artif": 12, "new_natural": 2: "net_artif": 10}"""
         return (
@@ -888,6 +1081,7 @@ class Project(BaseProject):
             )
         )
 
+    @analytics_snapshot
     def get_artif_evolution(self):
         """Return example:
         [
@@ -917,18 +1111,20 @@ class Project(BaseProject):
         Return example:
         ((2013, 2016), (2016, 2019))
         """
-        departement: Departement = self.cities.first().departement
+        departement_id = self.cities.values_list("departement_id", flat=True).first()
+        ocsge_millesimes = Departement.get_cached_ocsge_millesimes().get(departement_id)
 
-        if not departement.ocsge_millesimes:
+        if not ocsge_millesimes:
             return ()
 
         periods = ()
 
-        for i in range(len(departement.ocsge_millesimes) - 1):
-            periods += ((departement.ocsge_millesimes[i], departement.ocsge_millesimes[i + 1]),)
+        for i in range(len(ocsge_millesimes) - 1):
+            periods += ((ocsge_millesimes[i], ocsge_millesimes[i + 1]),)
 
         return periods
 
+    @analytics_snapshot
     def get_land_artif_per_year(self, analysis_level):
         """Return artif evolution for all cities of the diagnostic
 
@@ -966,6 +1162,7 @@ class Project(BaseProject):
             results[row["name"]][row["period"]] = row["net_artif"]
         return results
 
+    @analytics_snapshot
     def get_city_artif_per_year(self):
         """Return artif evolution for all cities of the diagnostic
 
@@ -985,22 +1182,26 @@ class Project(BaseProject):
         return results
 
     def get_bounding_box(self):
+        if self.persisted_emprise is not None:
+            return list(self.persisted_emprise.bbox.extent)
         result = self.emprise_set.aggregate(bbox=Extent("mpoly"))
         return list(result["bbox"])
 
     def get_centroid(self):
-        # result = self.emprise_set.aggregate(bbox=Extent('mpoly'))
+        if self.persisted_emprise is not None:
+            return self.persisted_emprise.centroid
         result = self.emprise_set.aggregate(center=Centroid(Union("mpoly")))
         return result["center"]
 
     def get_available_millesimes(self, commit=False):
         millesimes = set()
 
-        departements = self.cities.values_list("departement", flat=True)
+        departements = self.cities.values_list("departement", flat=True).distinct()
+        cached_millesimes = Departement.get_cached_ocsge_millesimes()
 
-        for departement in Departement.objects.filter(id__in=departements):
-            if departement.ocsge_millesimes:
-                millesimes.update(departement.ocsge_millesimes)
+        for departement_id in departements:
+            if cached_millesimes.get(departement_id):
+                millesimes.update(cached_millesimes[departement_id])
 
         return [y for y in millesimes if int(self.analyse_start_date) <= y <= int(self.analyse_end_date)]
 
@@ -1013,6 +1214,7 @@ class Project(BaseProject):
         else:
             return {"first": None, "last": None}
 
+    @analytics_snapshot
     def get_base_sol(self, millesime, sol="couverture"):
         if sol == "couverture":
             code_field = F("matrix__couverture__code_prefix")
@@ -1030,6 +1232,7 @@ class Project(BaseProject):
             item.surface = sum([_["surface"] for _ in data if _["code_prefix"].startswith(item.code_prefix)])
         return item_list
 
+    @analytics_snapshot
     def get_base_sol_progression(self, first_millesime, last_millesime, sol="couverture"):
         if sol == "couverture":
             code_field = F("matrix__couverture__code_prefix")
@@ -1059,6 +1262,7 @@ class Project(BaseProject):
             item.surface_diff = item.surface_last - item.surface_first
         return item_list
 
+    @analytics_snapshot
     def get_detail_artif(self, sol: Literal["couverture", "usage"], geom: MultiPolygon | None = None):
         """
         [
@@ -1099,6 +1303,7 @@ class Project(BaseProject):
             )
         )
 
+    @analytics_snapshot
     def get_base_sol_artif(self, sol: Literal["couverture", "usage"] = "couverture"):
         """
         [
@@ -1184,17 +1389,15 @@ class Project(BaseProject):
         return (self.get_arbitrary_comparison_lands() or self.get_neighbors()).order_by("name")[:limit]
 
     def comparison_lands_and_self_land(self) -> list[Land]:
-        return [self.land_proxy] + [
-            Land(public_key=f"{land.land_type}_{land.id}") for land in self.get_comparison_lands()
-        ]
+        return [self.land_proxy] + [Land.from_instance(land) for land in self.get_comparison_lands()]
 
     def get_matrix(self, sol: Literal["couverture", "usage"] = "couverture"):
         if sol == "usage":
             prefix = "us"
-            headers = {_.code: _ for _ in UsageSol.objects.all()}
+            headers = {_.code: _ for _ in UsageSol.get_cached()}
         else:
             prefix = "cs"
-            headers = {_.code: _ for _ in CouvertureSol.objects.all()}
+            headers = {_.code: _ for _ in CouvertureSol.get_cached()}
         headers.update({"": CouvertureSol(id=0, code="N/A", label="Inconnu", label_short="Inconnu")})
         index = f"{prefix}_old"
         column = f"{prefix}_new"
@@ -1219,6 +1422,7 @@ class Project(BaseProject):
         else:
             return dict()
 
+    @analytics_snapshot
     def get_artif_per_zone_urba_type(
         self,
     ) -> Dict[
@@ -1309,3 +1513,223 @@ class Emprise(DataColorationMixin, gis_models.Model):
     def set_parent(self, project: Project):
         """Identical to Project"""
         self.project = project
+
+    @classmethod
+    def build_from_cities(cls, project: Project) -> None:
+        """Replace the emprises of a project by the union of its cities, in one query.
+
+        The union is stored as one geometry, or split in parts of at most
+        EMPRISE_SUBDIVIDE_MAX_VERTICES vertices when the setting is set. srid_source
+        is the most common one of the cities.
+        """
+        table = cls._meta.db_table
+        project_commune_table = ProjectCommune._meta.db_table
+        commune_table = Commune._meta.db_table
+        max_vertices = settings.EMPRISE_SUBDIVIDE_MAX_VERTICES
+        if max_vertices:
+            parts = f"SELECT (ST_Dump(ST_Subdivide(u.mpoly, {int(max_vertices)}))).geom AS mpoly FROM u"
+        else:
+            parts = "SELECT u.mpoly FROM u"
+        query = f"""
+            WITH cities AS (
+                SELECT c.mpoly, c.srid_source
+                FROM {project_commune_table} pc
+                INNER JOIN {commune_table} c ON c.id = pc.commune_id
+                WHERE pc.project_id = %(project_id)s
+            ),
+            u AS (
+                SELECT ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_Union(ST_MakeValid(mpoly))), 3)) AS mpoly
+                FROM cities
+            ),
+            s AS (
+                SELECT srid_source FROM cities GROUP BY srid_source ORDER BY count(*) DESC LIMIT 1
+            )
+            INSERT INTO {table} (project_id, mpoly, srid_source)
+            SELECT %(project_id)s, ST_Multi(p.mpoly), s.srid_source
+            FROM ({parts}) AS p, s
+            WHERE p.mpoly IS NOT NULL AND NOT ST_IsEmpty(p.mpoly)
+        """
+        with transaction.atomic():
+            cls.objects.filter(project_id=project.id).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(query, {"project_id": project.id})
+
+
+class CombinedEmprise(gis_models.Model):
+    """Union of all emprises of a project, with its bbox, centroid and area.
+
+    Built once by set_combined_emprise task, to avoid an union of the emprises
+    for each map request.
+    """
+
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        verbose_name="Projet",
+        related_name="combined",
+    )
+    mpoly = gis_models.MultiPolygonField(srid=4326)
+    srid_source = models.IntegerField(
+        "SRID",
+        choices=SRID.choices,
+        default=SRID.LAMBERT_93,
+    )
+    bbox = gis_models.PolygonField(srid=4326)
+    centroid = gis_models.PointField(srid=4326)
+    area = models.FloatField("Surface (ha)", help_text="Calculée dans le SRID source")
+
+    @classmethod
+    def build(cls, project: Project) -> None:
+        """(Re)build the union from the emprises of a project. Area is computed in the main source SRID.
+        The row is deleted when the project has no emprise left."""
+        table = cls._meta.db_table
+        emprise_table = Emprise._meta.db_table
+        query = f"""
+            INSERT INTO {table} (project_id, mpoly, srid_source, bbox, centroid, area)
+            SELECT
+                %(project_id)s,
+                u.mpoly,
+                s.srid_source,
+                ST_Envelope(u.mpoly),
+                ST_Centroid(u.mpoly),
+                ST_Area(ST_Transform(u.mpoly, s.srid_source)) / 10000
+            FROM (
+                SELECT ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_Union(mpoly)), 3)) AS mpoly
+                FROM {emprise_table}
+                WHERE project_id = %(project_id)s
+            ) AS u,
+            (
+                SELECT srid_source
+                FROM {emprise_table}
+                WHERE project_id = %(project_id)s
+                GROUP BY srid_source
+                ORDER BY count(*) DESC
+                LIMIT 1
+            ) AS s
+            WHERE u.mpoly IS NOT NULL AND NOT ST_IsEmpty(u.mpoly)
+            ON CONFLICT (project_id) DO UPDATE SET
+                mpoly = EXCLUDED.mpoly,
+                srid_source = EXCLUDED.srid_source,
+                bbox = EXCLUDED.bbox,
+                centroid = EXCLUDED.centroid,
+                area = EXCLUDED.area
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(query, {"project_id": project.id})
+            if cursor.rowcount == 0:
+                cls.objects.filter(project=project).delete()
+
+
+class ProjectAnalyticsSnapshot(models.Model):
+    """Results of the aggregates displayed by the reports, charts and Word exports of
+    a project, computed once by build_analytics_snapshot task.
+
+    data is a compressed pickle of {call key: pickled result}, a Project method
+    decorated with analytics_snapshot reads its result from there when the snapshot
+    version matches the project (see Project.get_analytics_version), and computes
+    it otherwise.
+    """
+
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        verbose_name="Projet",
+        related_name="analytics_snapshot",
+    )
+    version = models.CharField("Version", max_length=50)
+    data = models.BinaryField("Données")
+    updated_date = models.DateTimeField("Date de mise à jour", auto_now=True)
+
+    # prevent a rebuild to be triggered by each request reading an outdated snapshot
+    REBUILD_LOCK_TIMEOUT = 60 * 10
+    # to be increased when the results stored change (new type, model field...)
+    SCHEMA_VERSION = 1
+
+    @classmethod
+    def get_calls(cls, project: Project) -> list[tuple[str, dict]]:
+        """Return the method calls (name, kwargs) stored in the snapshot of a project."""
+        calls = [
+            ("get_determinants", {}),
+            ("get_bilan_conso", {}),
+            ("get_bilan_conso_per_year", {}),
+            ("get_bilan_conso_time_scoped", {}),
+            ("get_conso_per_year", {}),
+            ("get_pop_change_per_year", {"criteria": "pop"}),
+            ("get_pop_change_per_year", {"criteria": "household"}),
+            ("get_city_conso_per_year", {}),
+            ("get_look_a_like_conso_per_year", {}),
+            ("get_look_a_like_pop_change_per_year", {"criteria": "pop"}),
+            ("get_look_a_like_pop_change_per_year", {"criteria": "household"}),
+            ("get_artif_area", {}),
+            ("get_artif_per_maille_and_period", {}),
+            ("get_artif_progession_time_scoped", {}),
+            ("get_artif_evolution", {}),
+            ("get_land_artif_per_year", {"analysis_level": project.level}),
+            ("get_city_artif_per_year", {}),
+        ]
+        calls += [("get_land_conso_per_year", {"level": level}) for level in ("epci_name", "dept_name", "region_name")]
+        calls += [("get_land_conso_per_year", {"level": "scot"})]
+        if project.first_year_ocsge and project.last_year_ocsge:
+            for sol in ("couverture", "usage"):
+                calls += [
+                    ("get_base_sol", {"millesime": project.last_year_ocsge, "sol": sol}),
+                    (
+                        "get_base_sol_progression",
+                        {
+                            "first_millesime": project.first_year_ocsge,
+                            "last_millesime": project.last_year_ocsge,
+                            "sol": sol,
+                        },
+                    ),
+                    ("get_detail_artif", {"sol": sol}),
+                    ("get_base_sol_artif", {"sol": sol}),
+                ]
+            calls.append(("get_artif_per_zone_urba_type", {}))
+        return calls
+
+    @classmethod
+    def build(cls, project: Project) -> int:
+        """Compute the calls of a project and store them, return the number of results stored."""
+        version = project.get_analytics_version()
+        # computed values must not be read from an outdated snapshot
+        project._analytics_snapshot_values = {}
+        values = {}
+        for name, kwargs in cls.get_calls(project):
+            method = getattr(Project, name)
+            key = get_analytics_key(method.signature, name, (project,), kwargs)
+            try:
+                result = method.__wrapped__(project, **kwargs)
+                if isinstance(result, QuerySet):
+                    result = result.all()
+                    len(result)
+                values[key] = pickle.dumps(result)
+            except Exception as exc:
+                logger.warning("Analytics %s of project %d not computed: %s", key, project.id, exc)
+        cls.objects.update_or_create(
+            project=project,
+            defaults={"version": version, "data": zlib.compress(pickle.dumps(values))},
+        )
+        project._analytics_snapshot_values = None
+        return len(values)
+
+    @classmethod
+    def load(cls, project: Project) -> dict:
+        """Return the values of the snapshot of a project, empty if it is missing or
+        outdated. An outdated snapshot is rebuilt in background."""
+        if not project.id:
+            return {}
+        snapshot = cls.objects.filter(project_id=project.id).values_list("version", "data").first()
+        if snapshot is None:
+            return {}
+        version, data = snapshot
+        if version != project.get_analytics_version():
+            if cache.add(f"project/analytics_rebuild/{project.id}", True, timeout=cls.REBUILD_LOCK_TIMEOUT):
+                from project.tasks import build_analytics_snapshot
+
+                build_analytics_snapshot.delay(project.id)
+            return {}
+        try:
+            return pickle.loads(zlib.decompress(data))
+        except Exception as exc:
+            logger.error("Analytics snapshot of project %d can't be read: %s", project.id, exc)
+            return {}
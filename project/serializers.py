@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework_gis import serializers as gis_serializers
 
 from public_data.models import Commune, CommuneDiff
+from public_data.serializers import SimplifiedGeometryMixin
 
 from .models import Emprise
 
@@ -28,7 +29,8 @@ class ArtifEvolutionSubSerializer(serializers.ModelSerializer):
         model = CommuneDiff
 
 
-class ProjectCommuneSerializer(gis_serializers.GeoFeatureModelSerializer):
+class ProjectCommuneSerializer(SimplifiedGeometryMixin, gis_serializers.GeoFeatureModelSerializer):
+    mpoly = gis_serializers.GeometrySerializerMethodField()
     artif_area = serializers.FloatField()
     conso_1121_art = serializers.FloatField()
     conso_1121_hab = serializers.FloatField()
@@ -54,7 +56,8 @@ class ProjectCommuneSerializer(gis_serializers.GeoFeatureModelSerializer):
         model = Commune
 
 
-class CitySpaceConsoMapSerializer(gis_serializers.GeoFeatureModelSerializer):
+class CitySpaceConsoMapSerializer(SimplifiedGeometryMixin, gis_serializers.GeoFeatureModelSerializer):
+    mpoly = gis_serializers.GeometrySerializerMethodField()
     artif_area = serializers.FloatField()
 
     class Meta:
@@ -69,7 +72,8 @@ class CitySpaceConsoMapSerializer(gis_serializers.GeoFeatureModelSerializer):
         model = Commune
 
 
-class CityArtifMapSerializer(gis_serializers.GeoFeatureModelSerializer):
+class CityArtifMapSerializer(SimplifiedGeometryMixin, gis_serializers.GeoFeatureModelSerializer):
+    mpoly = gis_serializers.GeometrySerializerMethodField()
     artif_evo = ArtifEvolutionSubSerializer(source="communediff_set", many=True, read_only=True)
 
     class Meta:
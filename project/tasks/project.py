@@ -3,12 +3,12 @@ import logging
 import os
 import zipfile
 from datetime import timedelta
-from typing import Any, Dict, Literal
+from typing import Any, Dict
 
 import contextily as cx
 import geopandas
 import matplotlib.pyplot as plt
-import shapely
+import pandas as pd
 from celery import shared_task
 from django.conf import settings
 from django.db import transaction
@@ -19,24 +19,35 @@ from django_app_parameter import app_parameter
 from matplotlib.lines import Line2D
 from matplotlib_scalebar.scalebar import ScaleBar
 
+from project.basemap import add_basemap
+from project.geodata import (
+    geometry_to_geodataframe,
+    get_pixel_size,
+    to_geodataframe,
+    to_merged_geodataframe,
+)
 from project.models import (
     Emprise,
     Project,
+    ProjectAnalyticsSnapshot,
+    ProjectCommune,
     Request,
     RequestedDocumentChoices,
     RNUPackage,
 )
 from public_data.domain.containers import PublicDataContainer
-from public_data.models import AdminRef, ArtificialArea, Departement, Land, OcsgeDiff
+from public_data.models import ArtificialArea, Departement, Land, OcsgeDiff
 from public_data.models.gpu import ArtifAreaZoneUrba, ZoneUrba
 from public_data.storages import DataStorage
-from utils.db import fix_poly
 from utils.emails import SibTemplateEmail
 from utils.functions import get_url_with_domain
 from utils.mattermost import BlockedDiagnostic
 
 logger = logging.getLogger(__name__)
 
+THEME_MAP_FIGSIZE = (15, 10)
+THEME_MAP_DPI = 100
+
 
 def race_protection_save(project_id: int, fields: Dict[str, Any]) -> None:
     with transaction.atomic():
@@ -72,7 +83,8 @@ def add_city(self, project_id: int, public_keys: str) -> list[str]:
         project = Project.objects.get(pk=project_id)
         lands = Land.get_lands(public_keys.split("-"))
         for land in lands:
-            project.cities.add(*land.get_cities())
+            nb_added = ProjectCommune.add_communes(project_id, land.get_cities())
+            logger.info("%d cities added from %s", nb_added, land.public_key)
         race_protection_save(project_id, {"async_add_city_done": True})
     except Project.DoesNotExist:
         logger.error(f"project_id={project_id} does not exist")
@@ -95,15 +107,9 @@ def set_combined_emprise(self, project_id: int) -> list[int]:
 
     try:
         project = Project.objects.get(pk=project_id)
-
-        for city in project.cities.all():
-            emprises.append(
-                Emprise.objects.create(
-                    mpoly=fix_poly(city.mpoly),
-                    srid_source=city.srid_source,
-                    project=project,
-                )
-            )
+        Emprise.build_from_cities(project)
+        emprises = list(project.emprise_set.values_list("id", flat=True))
+        project.update_combined_emprise()
 
         race_protection_save(project_id, {"async_set_combined_emprise_done": True})
     except Project.DoesNotExist:
@@ -115,7 +121,7 @@ def set_combined_emprise(self, project_id: int) -> list[int]:
     finally:
         logger.info("End set_combined_emprise project_id=%d", project_id)
 
-    return [emprise.id for emprise in emprises]
+    return emprises
 
 
 @shared_task(bind=True, max_retries=5)
@@ -229,25 +235,61 @@ def add_comparison_lands(self, project_id) -> list[str]:
     return [_land.official_id for _land in qs]
 
 
+@shared_task(bind=True, max_retries=5)
+def build_analytics_snapshot(self, project_id: int) -> None:
+    """Compute the aggregates displayed by the reports once, see ProjectAnalyticsSnapshot."""
+    logger.info("Start build_analytics_snapshot, project_id=%d", project_id)
+    try:
+        project = Project.objects.get(pk=project_id)
+        nb_values = ProjectAnalyticsSnapshot.build(project)
+        logger.info("%d values stored in analytics snapshot", nb_values)
+    except Project.DoesNotExist:
+        logger.error(f"project_id={project_id} does not exist")
+    except Exception as exc:
+        logger.error(exc)
+        logger.exception(exc)
+        self.retry(exc=exc, countdown=300)
+    finally:
+        logger.info("End build_analytics_snapshot, project_id=%d", project_id)
+
+
+@shared_task(bind=True, max_retries=5)
+def warm_report_cache(self, project_id: int) -> None:
+    """Render and cache the report pages of a project, so the first visit is a cache hit.
+    Public projects are rendered anonymously, for all anonymous visitors. The others are
+    rendered as their owner, in the cache entries of the owner only (pages of logged-in
+    users are cached per user). The analytics snapshot read by the pages is built first
+    when it is missing or outdated."""
+    from project.views.report import get_warm_up_urls
+    from utils.page_cache import get_site_host_and_scheme, refresh_page
+
+    logger.info("Start warm_report_cache, project_id=%d", project_id)
+    try:
+        project = Project.objects.get(pk=project_id)
+        snapshot = ProjectAnalyticsSnapshot.objects.filter(project=project).values_list("version", flat=True)
+        if snapshot.first() != project.get_analytics_version():
+            ProjectAnalyticsSnapshot.build(project)
+        user = None if project.is_public else project.user
+        host, scheme = get_site_host_and_scheme()
+        for url in get_warm_up_urls(project):
+            status_code = refresh_page(url, host, scheme, user=user)
+            logger.info("%s rendered with status %d", url, status_code)
+    except Project.DoesNotExist:
+        logger.error(f"project_id={project_id} does not exist")
+    except Exception as exc:
+        logger.error(exc)
+        logger.exception(exc)
+        self.retry(exc=exc, countdown=300)
+    finally:
+        logger.info("End warm_report_cache, project_id=%d", project_id)
+
+
 @shared_task(bind=True, max_retries=5)
 def generate_cover_image(self, project_id) -> None:
     logger.info("Start generate_cover_image, project_id=%d", project_id)
     try:
         diagnostic = Project.objects.get(id=int(project_id))
-        geom = diagnostic.combined_emprise
-        polygons = shapely.wkt.loads(geom.wkt)
-
-        gdf_emprise = geopandas.GeoDataFrame(
-            {
-                "col1": [
-                    "emprise diagnostic",
-                ],
-                "geometry": [
-                    polygons,
-                ],
-            },
-            crs=f"EPSG:{geom.srid}",
-        ).to_crs(epsg=3857)
+        gdf_emprise = geometry_to_geodataframe(diagnostic.combined_emprise)
 
         fig, ax = plt.subplots(figsize=(60, 10))
         plt.axis("off")
@@ -255,7 +297,7 @@ def generate_cover_image(self, project_id) -> None:
 
         gdf_emprise.buffer(250000).plot(ax=ax, facecolor="none", edgecolor="none")
         gdf_emprise.plot(ax=ax, facecolor="none", edgecolor="black")
-        cx.add_basemap(ax, source=settings.OPENSTREETMAP_URL)
+        add_basemap(ax)
 
         img_data = io.BytesIO()
         plt.savefig(
@@ -452,22 +494,13 @@ def send_word_diagnostic(self, request_id) -> None:
         logger.info(f"End send word for request={request_id}")
 
 
-def to_shapely_polygons(mpoly):
-    srid, wkt = mpoly.ewkt.split(";")
-    return shapely.wkt.loads(wkt)
-
+def get_img(gdf: geopandas.GeoDataFrame, color: str, title: str) -> io.BytesIO:
+    """Map of the level column of a GeoDataFrame in EPSG:3857, see project.geodata."""
+    gdf["level"] = [float(level) if level else 0 for level in gdf["level"]]
 
-def get_img(queryset, color: str, title: str) -> io.BytesIO:
-    data: Dict[Literal["level", "geometry"], Any] = {"level": [], "geometry": []}
-    for row in queryset:
-        data["geometry"].append(to_shapely_polygons(row["mpoly"]))
-        data["level"].append(float(row["level"]) if row["level"] else 0)
-
-    gdf = geopandas.GeoDataFrame(data, crs="EPSG:4326").to_crs(epsg=3857)
-
-    fig, ax = plt.subplots(figsize=(15, 10))
+    fig, ax = plt.subplots(figsize=THEME_MAP_FIGSIZE)
     plt.axis("off")
-    fig.set_dpi(100)
+    fig.set_dpi(THEME_MAP_DPI)
 
     gdf.plot(
         "level",
@@ -482,7 +515,7 @@ def get_img(queryset, color: str, title: str) -> io.BytesIO:
     )
     ax.add_artist(ScaleBar(1))
     ax.set_title(title)
-    cx.add_basemap(ax, source=settings.OPENSTREETMAP_URL, zoom_adjust=1, alpha=0.95)
+    add_basemap(ax, zoom_adjust=1, alpha=0.95)
 
     img_data = io.BytesIO()
     plt.savefig(img_data, bbox_inches="tight", format="jpg")
@@ -498,7 +531,7 @@ def generate_theme_map_conso(self, project_id) -> None:
     try:
         diagnostic = Project.objects.get(id=int(project_id))
         diagnostic_communes_as_lands = [
-            Land(public_key=f"{AdminRef.COMMUNE}_{commune.id}") for commune in diagnostic.cities.all()
+            Land.from_instance(commune) for commune in diagnostic.cities.all().defer("mpoly")
         ]
 
         land_progressions = PublicDataContainer.consommation_progression_service().get_by_lands(
@@ -507,13 +540,15 @@ def generate_theme_map_conso(self, project_id) -> None:
             end_date=int(diagnostic.analyse_end_date),
         )
 
-        data = [
-            {
-                "mpoly": land_progression.land.mpoly,
-                "level": sum(annual_conso.per_mille_of_area for annual_conso in land_progression.consommation),
-            }
+        levels = {
+            int(land_progression.land.id): sum(
+                annual_conso.per_mille_of_area for annual_conso in land_progression.consommation
+            )
             for land_progression in land_progressions
-        ]
+        }
+        tolerance = get_pixel_size(diagnostic.combined_emprise, THEME_MAP_FIGSIZE, THEME_MAP_DPI)
+        gdf = to_geodataframe(diagnostic.cities.all(), ["id"], tolerance=tolerance)
+        gdf["level"] = gdf["id"].map(levels)
 
         image_title = (
             f"Taux de consommation d'espaces des communes du territoire «{diagnostic.land.name}» "
@@ -521,7 +556,7 @@ def generate_theme_map_conso(self, project_id) -> None:
         )
 
         img_data = get_img(
-            queryset=data,
+            gdf=gdf,
             color="Blues",
             title=image_title,
         )
@@ -553,14 +588,8 @@ def generate_theme_map_artif(self, project_id) -> None:
     try:
         diagnostic = Project.objects.get(id=int(project_id))
         qs = diagnostic.cities.all().annotate(level=F("surface_artif") * 100 / F("area"))
-
-        data = [
-            {
-                "mpoly": row.mpoly,
-                "level": row.level,
-            }
-            for row in qs
-        ]
+        tolerance = get_pixel_size(diagnostic.combined_emprise, THEME_MAP_FIGSIZE, THEME_MAP_DPI)
+        gdf = to_geodataframe(qs, ["level"], tolerance=tolerance)
 
         title = (
             f"Taux d'artificialisation des communes du territoire "
@@ -568,7 +597,7 @@ def generate_theme_map_artif(self, project_id) -> None:
         )
 
         img_data = get_img(
-            queryset=data,
+            gdf=gdf,
             color="OrRd",
             title=title,
         )
@@ -600,41 +629,43 @@ def generate_theme_map_understand_artif(self, project_id) -> None:
     try:
         diagnostic = Project.objects.get(id=int(project_id))
 
-        geom = diagnostic.combined_emprise.transform("3857", clone=True)
-        srid, wkt = geom.ewkt.split(";")
-        polygons = shapely.wkt.loads(wkt)
-        gdf_emprise = geopandas.GeoDataFrame({"geometry": [polygons]}, crs="EPSG:3857")
-
-        data = {"color": [], "geometry": []}
-        # add artificial area to data
-        city_ids = diagnostic.cities.all().values_list("insee", flat=True)
-        queryset = ArtificialArea.objects.filter(city__in=city_ids)
+        gdf_emprise = geometry_to_geodataframe(diagnostic.combined_emprise)
+        tolerance = get_pixel_size(diagnostic.combined_emprise, THEME_MAP_FIGSIZE, THEME_MAP_DPI)
 
         artif_color = (0.97, 0.56, 0.33)
         new_artif_color = (1, 0, 0)
         new_natural_color = (0, 1, 0)
 
-        for row in queryset.only("mpoly"):
-            srid, wkt = row.mpoly.ewkt.split(";")
-            polygons = shapely.wkt.loads(wkt)
-            data["geometry"].append(polygons)
-            data["color"].append(artif_color)
+        # artificial area, clipped and merged in one geometry
+        city_ids = diagnostic.cities.all().values_list("insee", flat=True)
+        artif_gdf = to_merged_geodataframe(
+            ArtificialArea.objects.filter(city__in=city_ids),
+            diagnostic.combined_emprise,
+            tolerance,
+        )
+        artif_gdf["color"] = [artif_color] * len(artif_gdf)
 
-        # add new artificial area and new natural area to data
-        qs_artif = OcsgeDiff.objects.intersect(diagnostic.combined_emprise).filter(
+        # new artificial area and new natural area, clipped and merged by colour
+        qs_artif = OcsgeDiff.objects.filter(mpoly__intersects=diagnostic.combined_emprise).filter(
             Q(is_new_artif=True) | Q(is_new_natural=True)
         )
-        for row in qs_artif.only("mpoly", "is_new_artif"):
-            data["geometry"].append(to_shapely_polygons(row.mpoly))
-            data["color"].append((1, 0, 0) if row.is_new_artif else (0, 1, 0))
+        diff_gdf = to_merged_geodataframe(
+            qs_artif,
+            diagnostic.combined_emprise,
+            tolerance,
+            class_field="is_new_artif",
+        )
+        diff_gdf["color"] = [
+            new_artif_color if is_new_artif else new_natural_color for is_new_artif in diff_gdf["class"]
+        ]
 
-        artif_area_gdf = geopandas.GeoDataFrame(data, crs="EPSG:4326").to_crs(epsg=3857)
+        artif_area_gdf = pd.concat([artif_gdf, diff_gdf[["geometry", "color"]]], ignore_index=True)
 
-        fig, ax = plt.subplots(figsize=(15, 10))
+        fig, ax = plt.subplots(figsize=THEME_MAP_FIGSIZE)
         plt.axis("off")
-        fig.set_dpi(100)
+        fig.set_dpi(THEME_MAP_DPI)
 
-        artif_area_gdf.plot(ax=ax, color=artif_area_gdf["color"], label="Artificialisation")
+        artif_area_gdf.plot(ax=ax, color=list(artif_area_gdf["color"]), label="Artificialisation")
         gdf_emprise.plot(ax=ax, facecolor="none", edgecolor="black")
         emprise_legend_label = Line2D([], [], color="black", linewidth=3, label=diagnostic.territory_name)
         artif_legend_label = Line2D(
@@ -677,7 +708,7 @@ def generate_theme_map_understand_artif(self, project_id) -> None:
             ),
             loc="left",
         )
-        cx.add_basemap(ax, source=settings.OPENSTREETMAP_URL, zoom_adjust=1, alpha=0.95)
+        add_basemap(ax, zoom_adjust=1, alpha=0.95)
         cx.add_attribution(ax, text="Données: OCS GE (IGN)")
 
         img_data = io.BytesIO()
@@ -710,32 +741,30 @@ def generate_theme_map_gpu(self, project_id) -> None:
     try:
         diagnostic = Project.objects.get(id=int(project_id))
 
-        geom = diagnostic.combined_emprise.transform("3857", clone=True)
-        srid, wkt = geom.ewkt.split(";")
-        polygons = shapely.wkt.loads(wkt)
-        gdf_emprise = geopandas.GeoDataFrame({"geometry": [polygons]}, crs="EPSG:3857")
-
-        data = {"color": [], "geometry": []}
-
-        for zone_urba in ZoneUrba.objects.intersect(diagnostic.combined_emprise):
-            srid, wkt = zone_urba.intersection.ewkt.split(";")
-            polygons = shapely.wkt.loads(wkt)
-            data["geometry"].append(polygons)
-            data["color"].append((*[_ / 255 for _ in zone_urba.get_color()], 0.9))
+        gdf_emprise = geometry_to_geodataframe(diagnostic.combined_emprise)
+        tolerance = get_pixel_size(diagnostic.combined_emprise, THEME_MAP_FIGSIZE, 150)
 
-        zone_urba_gdf = geopandas.GeoDataFrame(data, crs="EPSG:4326").to_crs(epsg=3857)
+        zone_urba_gdf = to_geodataframe(
+            ZoneUrba.objects.intersect(diagnostic.combined_emprise),
+            ["typezone"],
+            geometry_field="intersection",
+            tolerance=tolerance,
+        )
+        zone_urba_gdf["color"] = [
+            (*[_ / 255 for _ in ZoneUrba.get_typezone_color(typezone)], 0.9) for typezone in zone_urba_gdf["typezone"]
+        ]
 
-        fig, ax = plt.subplots(figsize=(15, 10))
+        fig, ax = plt.subplots(figsize=THEME_MAP_FIGSIZE)
         plt.axis("off")
         fig.set_dpi(150)
 
-        zone_urba_gdf.plot(ax=ax, color=zone_urba_gdf["color"])
+        zone_urba_gdf.plot(ax=ax, color=list(zone_urba_gdf["color"]))
         gdf_emprise.plot(ax=ax, facecolor="none", edgecolor="black")
         ax.add_artist(ScaleBar(1))
         ax.set_title(
             f"Les zones d'urbanisme du territoire «{diagnostic.territory_name}» en {diagnostic.analyse_end_date}"
         )
-        cx.add_basemap(ax, source=settings.OPENSTREETMAP_URL)
+        add_basemap(ax)
 
         img_data = io.BytesIO()
         plt.savefig(img_data, bbox_inches="tight", format="jpg")
@@ -773,42 +802,30 @@ def generate_theme_map_fill_gpu(self, project_id) -> None:
             year__in=[diagnostic.first_year_ocsge, diagnostic.last_year_ocsge],
             zone_urba__typezone__in=["U", "AUc", "AUs"],
             zone_urba__area__gt=0,
-        ).annotate(
-            level=100 * F("area") / F("zone_urba__area"),
-            mpoly=F("zone_urba__mpoly"),
-        )
-
-        data = [
-            {
-                "mpoly": item.mpoly,
-                "level": item.level,
-            }
-            for item in qs
-        ]
+        ).annotate(level=100 * F("area") / F("zone_urba__area"))
+        tolerance = get_pixel_size(diagnostic.combined_emprise, THEME_MAP_FIGSIZE, THEME_MAP_DPI)
+        gdf = to_geodataframe(qs, ["level"], geometry_field="zone_urba__mpoly", tolerance=tolerance)
 
         title = (
             f"Taux d'artificialisation des zones urbaines (U) et à urbaniser (AU) du territoire "
             f"«{diagnostic.land.name}» en {diagnostic.last_year_ocsge} (en % - pour cent)"
         )
 
-        if qs.count() > 0:
+        if len(gdf) > 0:
             img_data = get_img(
-                queryset=data,
+                gdf=gdf,
                 color="OrRd",
                 title=title,
             )
         else:
-            geom = diagnostic.combined_emprise.transform("3857", clone=True)
-            srid, wkt = geom.ewkt.split(";")
-            polygons = shapely.wkt.loads(wkt)
-            gdf_emprise = geopandas.GeoDataFrame({"geometry": [polygons]}, crs="EPSG:3857")
-            fig, ax = plt.subplots(figsize=(15, 10))
+            gdf_emprise = geometry_to_geodataframe(diagnostic.combined_emprise)
+            fig, ax = plt.subplots(figsize=THEME_MAP_FIGSIZE)
             plt.axis("off")
             fig.set_dpi(150)
             gdf_emprise.plot(ax=ax, facecolor="none", edgecolor="black")
             ax.add_artist(ScaleBar(1))
             ax.set_title("Il n'y a pas de zone U ou AU")
-            cx.add_basemap(ax, source=settings.OPENSTREETMAP_URL)
+            add_basemap(ax)
 
             img_data = io.BytesIO()
             plt.savefig(img_data, bbox_inches="tight", format="jpg")
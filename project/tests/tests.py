@@ -2,11 +2,37 @@ import os
 import re
 
 import pytest
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.test import override_settings
+from django.urls import resolve, reverse
+from django_app_parameter.models import Parameter
 
-from project.models import Emprise, Project, user_directory_path
+from project.basemap import TileStore, get_basemap_image, get_tile_extent
+from project.geodata import (
+    geometry_to_geodataframe,
+    get_pixel_size,
+    to_merged_geodataframe,
+)
+from project.models import (
+    CombinedEmprise,
+    Emprise,
+    Project,
+    ProjectAnalyticsSnapshot,
+    ProjectCommune,
+    user_directory_path,
+)
+from project.models.create import get_diagnostic_steps
+from project.views.report import (
+    ArtifZoneUrbaView,
+    ProjectReportConsoView,
+    get_warm_up_urls,
+)
+from public_data.models import Commune, Departement, Region
 from users.tests import users  # noqa: F401
 
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 BIG_SQUARE = MultiPolygon(
     [Polygon.from_bbox((43, -1, 44, 0))],
     srid=4326,
@@ -63,6 +89,129 @@ class TestProject:
         expected_area = BIG_SQUARE.area / 100**2
         assert project.area == expected_area
 
+    def test_update_combined_emprise(self, projects):
+        project = Project.objects.get(name="COBAS")
+        project.update_combined_emprise()
+        project = Project.objects.get(name="COBAS")
+        assert project.persisted_emprise is not None
+        assert project.area == pytest.approx(BIG_SQUARE.area / 100**2)
+        assert project.get_bounding_box() == pytest.approx(list(BIG_SQUARE.extent))
+
+    def test_get_version_token(self, projects):
+        project = Project.objects.get(name="COBAS")
+        token = Project.get_version_token(project.id)
+        assert token.startswith(f"{project.id}.")
+        project.async_add_city_done = not project.async_add_city_done
+        project.save(update_fields=["async_add_city_done"])
+        assert Project.get_version_token(project.id) != token
+        assert Project.get_version_token(0) == ""
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_version_token_follows_saves(self, projects):
+        project = Project.objects.get(name="COBAS")
+        token = Project.get_version_token(project.id)
+        assert Project.get_version_token(project.id) == token
+        # look_a_like is saved without updated_date
+        project.look_a_like = "COMM_33063"
+        project.save(update_fields=["look_a_like"])
+        assert Project.get_version_token(project.id) != token
+
+    def test_etag_checks_access_first(self, client, projects):
+        # read by the maintenance middleware
+        Parameter.objects.create(name="Mise en maintenance", slug="MAINTENANCE_MODE", value_type="BOO", value="0")
+        project = Project.objects.get(name="COBAS")
+        url = reverse("project:theme-city-conso", kwargs={"pk": project.id}) + "?data=1"
+        response = client.get(url, HTTP_IF_NONE_MATCH="*")
+        assert response.status_code == 404
+
+    def test_analytics_snapshot(self, projects):
+        project = Project.objects.get(name="COBAS")
+        ProjectAnalyticsSnapshot.build(project)
+        project = Project.objects.get(name="COBAS")
+        values = project.get_analytics_snapshot_values()
+        assert "get_bilan_conso()" in values
+        assert "get_pop_change_per_year(criteria='household')" in values
+        assert project.get_bilan_conso() == 0
+
+    def test_analytics_snapshot_unreadable_value(self, projects):
+        project = Project.objects.get(name="COBAS")
+        ProjectAnalyticsSnapshot.build(project)
+        project = Project.objects.get(name="COBAS")
+        # pickled by another version of the code
+        project.get_analytics_snapshot_values()["get_bilan_conso()"] = b"not a pickle"
+        assert project.get_bilan_conso() == 0
+
+    def test_cache_namespace_of_zone_urba_pane(self, rf, projects):
+        project = Project.objects.get(name="COBAS")
+        url = reverse("project:map-pane-artif-zone-urba", kwargs={"project_id": project.id, "pk": 1})
+        request = rf.get(url)
+        request.resolver_match = resolve(url)
+        assert ArtifZoneUrbaView.get_cache_namespace(request) == Project.get_cache_namespace(project.id)
+
+    def test_cached_page_access(self, rf, projects, users):  # noqa: F811
+        project = Project.objects.get(name="COBAS")
+        url = reverse("project:report_conso", kwargs={"pk": project.id})
+        request = rf.get(url)
+        request.resolver_match = resolve(url)
+        request.user = AnonymousUser()
+        assert not ProjectReportConsoView.has_cache_access(request)
+        request.user = users["staff"]
+        assert not ProjectReportConsoView.has_cache_access(request)
+        request.user = users["normal"]
+        assert ProjectReportConsoView.has_cache_access(request)
+        project.is_public = True
+        project.save()
+        request.user = AnonymousUser()
+        assert ProjectReportConsoView.has_cache_access(request)
+
+    def test_get_warm_up_urls(self, projects):
+        project = Project.objects.get(name="COBAS")
+        urls = get_warm_up_urls(project)
+        assert reverse("project:report_conso", kwargs={"pk": project.pk}) in urls
+        assert reverse("project:report_artif", kwargs={"pk": project.pk}) not in urls
+        project.ocsge_coverage_status = Project.OcsgeCoverageStatus.COMPLETE_UNIFORM
+        assert reverse("project:report_artif", kwargs={"pk": project.pk}) in get_warm_up_urls(project)
+
+    def test_get_diagnostic_steps(self, projects):
+        project = Project.objects.get(name="COBAS")
+        steps = get_diagnostic_steps(project, "COMM_33236")
+        assert steps.tasks[0].task.endswith(".add_city")
+        # steps depending only on the cities run in parallel
+        assert len(steps.tasks[1].tasks) == 3
+        project.async_add_city_done = True
+        project.async_set_combined_emprise_done = True
+        project.async_add_comparison_lands_done = True
+        project.async_find_first_and_last_ocsge_done = True
+        project.async_ocsge_coverage_status_done = True
+        steps = get_diagnostic_steps(project, "COMM_33236")
+        assert [task.task.split(".")[-1] for task in steps.tasks] == ["map_tasks", "build_analytics_snapshot"]
+
+    def test_add_communes_and_build_emprise(self, projects):
+        project = Project.objects.get(name="COBAS")
+        region = Region.objects.create(source_id="75", name="Nouvelle-Aquitaine", mpoly=BIG_SQUARE)
+        departement = Departement.objects.create(source_id="33", name="Gironde", mpoly=BIG_SQUARE, region=region)
+        Commune.objects.create(insee="33001", name="Inner", mpoly=INNER_SQUARE, departement=departement)
+        Commune.objects.create(insee="33002", name="Small", mpoly=SMALL_SQUARE, departement=departement)
+
+        assert ProjectCommune.add_communes(project.id, departement.get_cities()) == 2
+        # communes already linked are skipped
+        assert ProjectCommune.add_communes(project.id, departement.get_cities()) == 0
+        assert project.cities.count() == 2
+
+        Emprise.build_from_cities(project)
+        assert project.emprise_set.count() == 1
+        assert project.emprise_set.get().mpoly.area == pytest.approx(INNER_SQUARE.area)
+
+    def test_combined_emprise_follows_emprises(self, projects):
+        project = Project.objects.get(name="COBAS")
+        Emprise.objects.create(project=project, mpoly=INNER_SQUARE)
+        CombinedEmprise.build(project)
+        assert CombinedEmprise.objects.get(project=project).mpoly.area == pytest.approx(INNER_SQUARE.area)
+
+        project.emprise_set.all().delete()
+        CombinedEmprise.build(project)
+        assert not CombinedEmprise.objects.filter(project=project).exists()
+
     def test_set_success(self, projects):
         project = Project.objects.get(name="COBAS")
         project.set_success()
@@ -101,3 +250,66 @@ class TestSettings:
     def test_general(self):
         account_id = os.getenv("ACCOUNT_ID")
         assert account_id == "9876"
+
+
+class TestBasemap:
+    def test_tile_store(self, tmp_path):
+        store = TileStore(tmp_path / "tiles.mbtiles", max_size=20)
+        assert store.get(1, 0, 0) is None
+        store.set(1, 0, 0, b"a" * 12)
+        store.set(1, 0, 0, b"a" * 15)
+        assert store.get(1, 0, 0) == b"a" * 15
+        store.set(1, 1, 0, b"b" * 10)
+        assert store.get_size() == 25
+        assert store.evict() == 1
+        assert not store.exists(1, 0, 0)
+        assert store.exists(1, 1, 0)
+        assert store.get_size() == 10
+
+    def test_tile_extent(self):
+        left, right, bottom, top = get_tile_extent(0, 0, 0)
+        assert left == pytest.approx(-20037508.34, abs=0.01)
+        assert top == pytest.approx(20037508.34, abs=0.01)
+        assert (left, right) == (-top, -bottom)
+
+    def test_offline(self, tmp_path):
+        with override_settings(BASEMAP_TILE_STORE=tmp_path / "tiles.mbtiles"):
+            image, extent = get_basemap_image((-0.6, 43.4, -0.4, 43.6), 10, "http://invalid/{z}/{x}/{y}.png", True)
+        assert image.shape[2] == 4
+        assert not image.any()
+        assert extent[0] < extent[1] and extent[2] < extent[3]
+
+
+class TestGeodata:
+    def test_geometry_to_geodataframe(self):
+        gdf = geometry_to_geodataframe(BIG_SQUARE)
+        assert gdf.crs.to_epsg() == 3857
+        assert len(gdf) == 1
+        assert gdf.total_bounds[0] == pytest.approx(BIG_SQUARE.transform(3857, clone=True).extent[0])
+
+    def test_pixel_size(self):
+        width = BIG_SQUARE.transform(3857, clone=True).extent
+        assert get_pixel_size(BIG_SQUARE, (15, 10), 100) >= (width[2] - width[0]) / 1500
+
+    @pytest.mark.django_db
+    def test_to_merged_geodataframe(self):
+        west = MultiPolygon(Polygon.from_bbox((0, 45, 1, 46)), srid=4326)
+        east = MultiPolygon(Polygon.from_bbox((1, 45, 2, 46)), srid=4326)
+        # smaller than a pixel
+        tiny = MultiPolygon(Polygon.from_bbox((1.5, 45.5, 1.50001, 45.50001)), srid=4326)
+        Region.objects.create(source_id="01", name="A", mpoly=west)
+        Region.objects.create(source_id="02", name="A", mpoly=east)
+        Region.objects.create(source_id="03", name="B", mpoly=tiny)
+        emprise = MultiPolygon(Polygon.from_bbox((0.5, 45, 2, 46)), srid=4326)
+
+        gdf = to_merged_geodataframe(Region.objects.all(), emprise, tolerance=100, class_field="name")
+        gdf = gdf.sort_values("class")
+        assert list(gdf["class"]) == ["A", "B"]
+        # the tiny square is kept as a pixel
+        assert gdf.geometry.iloc[1].area == pytest.approx(100 * 100)
+        # both squares are merged and clipped to the emprise
+        geometry = gdf.geometry.iloc[0]
+        assert geometry.geom_type == "Polygon"
+        xmin, _, xmax, _ = geometry.bounds
+        assert xmin == pytest.approx(emprise.transform(3857, clone=True).extent[0], abs=100)
+        assert xmax == pytest.approx(east.transform(3857, clone=True).extent[2], abs=100)
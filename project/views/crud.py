@@ -23,7 +23,7 @@ from project.forms import (
     UpdateProjectPeriodForm,
 )
 from project.models import Project, create_from_public_key
-from project.models.create import update_period
+from project.models.create import get_steps_state, update_period
 from project.models.enums import ProjectChangeReason
 from public_data.exceptions import LandException
 from public_data.models import AdminRef, Land
@@ -309,4 +309,5 @@ class SplashProgressionView(GroupMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         kwargs["last_update"] = timezone.now()
+        kwargs["steps"] = get_steps_state(self.object)
         return super().get_context_data(**kwargs)
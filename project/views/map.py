@@ -3,19 +3,21 @@ from django.contrib.gis.geos import Polygon
 from django.db.models import F, FloatField, Max, OuterRef, Subquery, Sum
 from django.db.models.functions import Cast
 from django.http import JsonResponse
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import DetailView
 from jenkspy import jenks_breaks
 
 from project.models import Project
 from project.serializers import CityArtifMapSerializer, CitySpaceConsoMapSerializer
-from public_data.models import Cerema, CouvertureSol, UsageSol
+from public_data.data_version import get_data_version
+from public_data.models import Cerema, CouvertureSol, SimplifiedGeometry, UsageSol
 from utils.colors import get_dark_blue_gradient, get_yellow2red_gradient
+from utils.views_mixins import DataVersionETagMixin
 
 from .mixins import GroupMixin, OcsgeCoverageMixin
 
 
-class BaseMap(GroupMixin, DetailView):
+class BaseMap(DataVersionETagMixin, GroupMixin, DetailView):
     """This is a base class for a map. Build for MapLibre
 
     Main methods:
@@ -23,12 +25,52 @@ class BaseMap(GroupMixin, DetailView):
     * get_sources_list: define the data sources to use for the layers
     * get_layers_list: define the filters to be display in the map
     * get_filters_list: define the filters to be display in the filters zone
+
+    Data urls of the sources served by the app get a version query string (v), their
+    responses are then cached by the browser until the data or the project change.
     """
 
     queryset = Project.objects.all()
     template_name = "carto/map_libre.html"
     title = "To be set"
     default_zoom: int
+    etag_public = False
+
+    def should_use_etag(self, request) -> bool:
+        # only data requests are versioned, the page itself embed the versions
+        return super().should_use_etag(request) and "data" in request.GET
+
+    def get_etag_extra(self) -> str:
+        return Project.get_version_token(self.kwargs["pk"])
+
+    def is_project_source(self, source) -> bool:
+        keys = {query_string["key"] for query_string in source.get("query_strings", [])}
+        data_url = str(source["params"].get("data", ""))
+        return bool(keys & {"id", "project_id"}) or "/project/" in data_url
+
+    def add_version_query_strings(self, sources):
+        """Add the version token to the sources served by the app, see DataVersionETagMixin."""
+        data_version = str(get_data_version())
+        project_version = f"{data_version}-{Project.get_version_token(self.object.pk)}"
+        app_url = self.request.build_absolute_uri("/")
+        for source in sources:
+            params = source["params"]
+            if params["type"] == "geojson":
+                is_app_source = str(params.get("data") or "").startswith("/")
+            elif params["type"] == "vector":
+                is_app_source = bool(params.get("tiles")) and params["tiles"][0].startswith(app_url)
+            else:
+                is_app_source = False
+            if not is_app_source:
+                continue
+            source.setdefault("query_strings", []).append(
+                {
+                    "type": "string",
+                    "key": self.etag_version_param,
+                    "value": project_version if self.is_project_source(source) else data_version,
+                }
+            )
+        return sources
 
     def get_context_breadcrumbs(self):
         breadcrumbs = super().get_context_breadcrumbs()
@@ -37,6 +79,18 @@ class BaseMap(GroupMixin, DetailView):
         ]
         return breadcrumbs
 
+    def get_zoom(self):
+        """Return the zoom of the map sent with data request, None if not provided."""
+        try:
+            return int(self.request.GET.get("zoom"))
+        except (TypeError, ValueError):
+            return None
+
+    def get_tiles_url(self, viewname: str) -> str:
+        """Return the absolute url template of a vector tile endpoint, as expected by MapLibre."""
+        url = self.request.build_absolute_uri(reverse(viewname, kwargs={"z": 0, "x": 0, "y": 0}))
+        return url.replace("/0/0/0.pbf", "/{z}/{x}/{y}.pbf")
+
     def get_sources_list(self):
         return [
             {
@@ -340,7 +394,7 @@ class BaseMap(GroupMixin, DetailView):
                 "center_lng": center.x,
                 "default_zoom": self.default_zoom,
                 "data": {
-                    "sources": self.get_sources_list(),
+                    "sources": self.add_version_query_strings(self.get_sources_list()),
                     "layers": layers,
                     "filters": filters,
                 },
@@ -373,6 +427,11 @@ class MapTestView(BaseMap):
                         "key": "in_bbox",
                         "value": "getBbox",
                     },
+                    {
+                        "type": "function",
+                        "key": "zoom",
+                        "value": "getZoom",
+                    },
                 ],
                 "min_zoom": 8,
             },
@@ -510,21 +569,12 @@ class UrbanZonesMapView(OcsgeCoverageMixin, BaseMap):
             {
                 "key": "ocs-ge-source",
                 "params": {
-                    "type": "geojson",
-                    "data": reverse_lazy("public_data:ocsge-optimized"),
-                    "generateId": True,  # This ensures that all features have unique IDs
+                    "type": "vector",
+                    "tiles": [self.get_tiles_url("public_data:ocsge-tiles")],
+                    "minzoom": 15,
+                    "maxzoom": 15,
                 },
                 "query_strings": [
-                    {
-                        "type": "function",
-                        "key": "in_bbox",
-                        "value": "getBbox",
-                    },
-                    {
-                        "type": "function",
-                        "key": "zoom",
-                        "value": "getZoom",
-                    },
                     {
                         "type": "string",
                         "key": "year",
@@ -541,22 +591,11 @@ class UrbanZonesMapView(OcsgeCoverageMixin, BaseMap):
             {
                 "key": "zonages-d-urbanisme-source",
                 "params": {
-                    "type": "geojson",
-                    "data": reverse_lazy("public_data:zoneurba-optimized"),
-                    "generateId": True,  # This ensures that all features have unique IDs
+                    "type": "vector",
+                    "tiles": [self.get_tiles_url("public_data:zoneurba-tiles")],
+                    "minzoom": 12,
+                    "maxzoom": 15,
                 },
-                "query_strings": [
-                    {
-                        "type": "function",
-                        "key": "in_bbox",
-                        "value": "getBbox",
-                    },
-                    {
-                        "type": "function",
-                        "key": "zoom",
-                        "value": "getZoom",
-                    },
-                ],
                 "min_zoom": 12,
             },
         ]
@@ -568,6 +607,7 @@ class UrbanZonesMapView(OcsgeCoverageMixin, BaseMap):
                 "z-index": 6,
                 "type": "fill",
                 "source": "zonages-d-urbanisme-source",
+                "source-layer": "zones_urbaines",
                 "minzoom": 12,
                 "maxzoom": 19,
                 "paint": {
@@ -623,6 +663,7 @@ class UrbanZonesMapView(OcsgeCoverageMixin, BaseMap):
                 "z-index": 7,
                 "type": "fill",
                 "source": "ocs-ge-source",
+                "source-layer": "ocsge",
                 "minzoom": 15,
                 "maxzoom": 19,
                 "paint": {
@@ -678,6 +719,7 @@ class UrbanZonesMapView(OcsgeCoverageMixin, BaseMap):
                 "z-index": 8,
                 "type": "line",
                 "source": "zonages-d-urbanisme-source",
+                "source-layer": "zones_urbaines",
                 "minzoom": 12,
                 "maxzoom": 19,
                 "paint": {
@@ -702,6 +744,7 @@ class UrbanZonesMapView(OcsgeCoverageMixin, BaseMap):
                 "z-index": 9,
                 "type": "symbol",
                 "source": "zonages-d-urbanisme-source",
+                "source-layer": "zones_urbaines",
                 "minzoom": 12,
                 "maxzoom": 19,
                 "layout": {
@@ -900,16 +943,12 @@ class MyArtifMapView(OcsgeCoverageMixin, BaseMap):
             {
                 "key": "zones-artificielles-source",
                 "params": {
-                    "type": "geojson",
-                    "data": reverse_lazy("public_data:artificialarea-optimized"),
-                    "generateId": True,  # This ensures that all features have unique IDs
+                    "type": "vector",
+                    "tiles": [self.get_tiles_url("public_data:artificialarea-tiles")],
+                    "minzoom": 12,
+                    "maxzoom": 15,
                 },
                 "query_strings": [
-                    {
-                        "type": "function",
-                        "key": "in_bbox",
-                        "value": "getBbox",
-                    },
                     {
                         "type": "string",
                         "key": "year",
@@ -926,9 +965,10 @@ class MyArtifMapView(OcsgeCoverageMixin, BaseMap):
             {
                 "key": "ocsge-diff-source",
                 "params": {
-                    "type": "geojson",
-                    "data": reverse_lazy("public_data:ocsgediff-optimized"),
-                    "generateId": True,  # This ensures that all features have unique IDs
+                    "type": "vector",
+                    "tiles": [self.get_tiles_url("public_data:ocsgediff-tiles")],
+                    "minzoom": 10,
+                    "maxzoom": 15,
                 },
                 "query_strings": [
                     {
@@ -1030,6 +1070,7 @@ class MyArtifMapView(OcsgeCoverageMixin, BaseMap):
                 "z-index": 6,
                 "type": "fill",
                 "source": "zones-artificielles-source",
+                "source-layer": "zones_artificielles",
                 "minzoom": 12,
                 "maxzoom": 19,
                 "paint": {
@@ -1078,6 +1119,7 @@ class MyArtifMapView(OcsgeCoverageMixin, BaseMap):
                 "z-index": 7,
                 "type": "fill",
                 "source": "ocsge-diff-source",
+                "source-layer": "ocsge_diff",
                 "minzoom": 10,
                 "maxzoom": 19,
                 "paint": {
@@ -1264,6 +1306,11 @@ class CitySpaceConsoMapView(BaseMap):
                         "key": "in_bbox",
                         "value": "getBbox",
                     },
+                    {
+                        "type": "function",
+                        "key": "zoom",
+                        "value": "getZoom",
+                    },
                 ],
                 "min_zoom": 8,
             },
@@ -1401,6 +1448,7 @@ class CitySpaceConsoMapView(BaseMap):
         if bbox is not None and len(bbox) > 0:
             polygon_box = Polygon.from_bbox(bbox.split(","))
             queryset = queryset.filter(mpoly__within=polygon_box)
+        queryset = SimplifiedGeometry.annotate_simplified_mpoly(queryset, self.get_zoom())
         serializer = CitySpaceConsoMapSerializer(queryset, many=True)
         return JsonResponse(serializer.data, status=200)
 
@@ -1437,6 +1485,11 @@ class CityArtifMapView(OcsgeCoverageMixin, BaseMap):
                         "key": "in_bbox",
                         "value": "getBbox",
                     },
+                    {
+                        "type": "function",
+                        "key": "zoom",
+                        "value": "getZoom",
+                    },
                 ],
                 "min_zoom": 8,
             },
@@ -1556,6 +1609,7 @@ class CityArtifMapView(OcsgeCoverageMixin, BaseMap):
         if bbox is not None and len(bbox) > 0:
             polygon_box = Polygon.from_bbox(bbox.split(","))
             queryset = queryset.filter(mpoly__within=polygon_box)
+        queryset = SimplifiedGeometry.annotate_simplified_mpoly(queryset, self.get_zoom())
         serializer = CityArtifMapSerializer(queryset, many=True)
         return JsonResponse(serializer.data, status=200)
 
@@ -6,7 +6,7 @@ from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
 
 from project.models import Project
-from utils.views_mixins import BreadCrumbMixin, GetObjectMixin
+from utils.views_mixins import BreadCrumbMixin, CacheMixin, GetObjectMixin
 
 
 class UserQuerysetOnlyMixin:
@@ -57,10 +57,56 @@ class GroupMixin(GetObjectMixin, UserQuerysetOrPublicMixin, BreadCrumbMixin):
         return breadcrumbs
 
 
+class ProjectCacheMixin(CacheMixin):
+    """Cache pages of a project (project_id_url_kwarg url argument) until the project
+    is saved or new data are loaded. An expired page still belongs to the current
+    namespace, so it can be served while it is rendered again."""
+
+    cache_stale_while_revalidate = True
+    project_id_url_kwarg = "pk"
+
+    @classmethod
+    def should_warm_up(cls, project: Project) -> bool:
+        """Override to skip the page when warm_report_cache task renders the project pages."""
+        return True
+
+    @classmethod
+    def get_project_id(cls, request):
+        resolver_match = request.resolver_match
+        return resolver_match.kwargs.get(cls.project_id_url_kwarg) if resolver_match else None
+
+    @classmethod
+    def has_cache_access(cls, request) -> bool:
+        """Same rule as UserQuerysetOrPublicMixin: public projects or projects of the user."""
+        project_id = cls.get_project_id(request)
+        if project_id is None:
+            return True
+        access = Q(is_public=True)
+        if request.user.is_authenticated:
+            access |= Q(user=request.user)
+        return Project.objects.filter(access, pk=project_id).exists()
+
+    @classmethod
+    def get_cache_namespace(cls, request) -> str:
+        project_id = cls.get_project_id(request)
+        if project_id is None:
+            return super().get_cache_namespace(request)
+        return Project.get_cache_namespace(project_id)
+
+
 class OcsgeCoverageMixin:
+    @classmethod
+    def has_required_coverage(cls, project: Project) -> bool:
+        return project.ocsge_coverage_status == project.OcsgeCoverageStatus.COMPLETE_UNIFORM
+
+    @classmethod
+    def should_warm_up(cls, project: Project) -> bool:
+        # pages redirecting to the synthesis are not cached
+        return cls.has_required_coverage(project) and super().should_warm_up(project)
+
     def dispatch(self, request, *args, **kwargs):
         project: Project = self.get_object()
-        if project.ocsge_coverage_status != project.OcsgeCoverageStatus.COMPLETE_UNIFORM:
+        if not self.has_required_coverage(project):
             message = self._build_error_message()
             messages.error(request, message)
             return redirect(reverse("project:report_synthesis", kwargs={"pk": project.pk}))
@@ -47,17 +47,17 @@ from public_data.models.administration import AdminRef
 from public_data.models.gpu import ZoneUrba
 from public_data.models.ocsge import Ocsge, OcsgeDiff
 from utils.htmx import StandAloneMixin
-from utils.views_mixins import CacheMixin
 
 from .mixins import (
     BreadCrumbMixin,
     GroupMixin,
     OcsgeCoverageMixin,
+    ProjectCacheMixin,
     UserQuerysetOrPublicMixin,
 )
 
 
-class ProjectReportBaseView(CacheMixin, GroupMixin, DetailView):
+class ProjectReportBaseView(ProjectCacheMixin, GroupMixin, DetailView):
     breadcrumbs_title = "To be set"
     context_object_name = "project"
     queryset = Project.objects.all()
@@ -551,7 +551,7 @@ class DownloadWordView(TemplateView):
         return super().get(request, *args, **kwargs)
 
 
-class ConsoRelativeSurfaceChart(CacheMixin, UserQuerysetOrPublicMixin, DetailView):
+class ConsoRelativeSurfaceChart(ProjectCacheMixin, UserQuerysetOrPublicMixin, DetailView):
     context_object_name = "project"
     queryset = Project.objects.all()
     template_name = "project/partials/surface_comparison_conso.html"
@@ -581,12 +581,13 @@ class ConsoRelativeSurfaceChart(CacheMixin, UserQuerysetOrPublicMixin, DetailVie
         return super().get_context_data(**kwargs)
 
 
-class ArtifZoneUrbaView(CacheMixin, StandAloneMixin, DetailView):
+class ArtifZoneUrbaView(ProjectCacheMixin, StandAloneMixin, DetailView):
     """Content of the pannel in Urba Area Explorator."""
 
     context_object_name = "zone_urba"
     queryset = ZoneUrba.objects.all()
     template_name = "project/partials/artif_zone_urba.html"
+    project_id_url_kwarg = "project_id"
 
     def get_context_data(self, **kwargs):
         diagnostic = Project.objects.get(pk=self.kwargs["project_id"])
@@ -608,7 +609,7 @@ class ArtifZoneUrbaView(CacheMixin, StandAloneMixin, DetailView):
         return super().get_context_data(**kwargs)
 
 
-class ArtifNetChart(CacheMixin, TemplateView):
+class ArtifNetChart(ProjectCacheMixin, TemplateView):
     template_name = "project/partials/artif_net_chart.html"
 
     def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
@@ -670,7 +671,7 @@ class ArtifNetChart(CacheMixin, TemplateView):
         return super().get_context_data(**kwargs)
 
 
-class ArtifDetailCouvChart(CacheMixin, TemplateView):
+class ArtifDetailCouvChart(ProjectCacheMixin, TemplateView):
     template_name = "project/partials/artif_detail_couv_chart.html"
 
     def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
@@ -704,7 +705,7 @@ class ArtifDetailCouvChart(CacheMixin, TemplateView):
         groups = []
 
         for group in qs:
-            couverture = CouvertureSol.objects.get(code_prefix=group["couverture"])
+            couverture = CouvertureSol.get_by_code_prefix(group["couverture"])
             groups.append(
                 {
                     "code_prefix": couverture.code_prefix,
@@ -753,7 +754,7 @@ class ArtifDetailCouvChart(CacheMixin, TemplateView):
         return super().get_context_data(**kwargs)
 
 
-class ArtifDetailUsaChart(CacheMixin, TemplateView):
+class ArtifDetailUsaChart(ProjectCacheMixin, TemplateView):
     template_name = "project/partials/artif_detail_usage_chart.html"
 
     def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
@@ -787,7 +788,7 @@ class ArtifDetailUsaChart(CacheMixin, TemplateView):
         groups = []
 
         for group in qs:
-            usage = UsageSol.objects.get(code_prefix=group["usage"])
+            usage = UsageSol.get_by_code_prefix(group["usage"])
             groups.append(
                 {
                     "code_prefix": usage.code_prefix,
@@ -856,7 +857,7 @@ class ProjectReportGpuView(ProjectReportBaseView):
         return super().get_context_data(**kwargs)
 
 
-class ProjectReportGpuZoneSynthesisTable(CacheMixin, StandAloneMixin, TemplateView):
+class ProjectReportGpuZoneSynthesisTable(ProjectCacheMixin, StandAloneMixin, TemplateView):
     template_name = "project/partials/zone_urba_aggregated_table.html"
 
     @cached_property
@@ -868,6 +869,10 @@ class ProjectReportGpuZoneSynthesisTable(CacheMixin, StandAloneMixin, TemplateVi
             return False
         return True
 
+    @classmethod
+    def should_warm_up(cls, project: Project) -> bool:
+        return bool(project.theme_map_gpu)
+
     def get_context_data(self, **kwargs):
         kwargs |= {
             "zone_list": self.diagnostic.get_artif_per_zone_urba_type(),
@@ -911,3 +916,30 @@ class ProjectReportArtifCitiesMap(StandAloneMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         return super().get_context_data(diagnostic=Project.objects.get(pk=self.kwargs["pk"]), **kwargs)
+
+
+# cached pages rendered by warm_report_cache task once the project is ready,
+# partials by zone d'urbanisme are not included
+WARM_UP_VIEWS = {
+    "project:detail": ProjectReportSynthesisView,
+    "project:report_synthesis": ProjectReportSynthesisView,
+    "project:report_conso": ProjectReportConsoView,
+    "project:relative-surface": ConsoRelativeSurfaceChart,
+    "project:report_discover": ProjectReportDicoverOcsgeView,
+    "project:report_imper": ProjectReportImperView,
+    "project:report_artif": ProjectReportArtifView,
+    "project:report_target_2031": ProjectReportTarget2031View,
+    "project:target-2031-graphic": ProjectReportTarget2031GraphView,
+    "project:report_urban_zones": ProjectReportUrbanZonesView,
+    "project:synthesis-zone-urba-all": ProjectReportGpuZoneSynthesisTable,
+    "project:report_gpu": ProjectReportGpuView,
+    "project:report_local": ProjectReportLocalView,
+}
+
+
+def get_warm_up_urls(project: Project) -> list[str]:
+    return [
+        reverse(url_name, kwargs={"pk": project.pk})
+        for url_name, view_class in WARM_UP_VIEWS.items()
+        if view_class.should_warm_up(project)
+    ]
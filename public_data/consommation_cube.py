@@ -0,0 +1,247 @@
+"""Consumption of the Cerema (MAJIC) table as a read-only NumPy cube.
+
+The cube holds the consumption in m² of each commune, per year and per
+determinant: values[commune, year, determinant]. Communes are sorted by insee
+code, and label arrays (epci, departement, region, scot...) give the membership of
+each commune. It is memory-mapped, so every process shares the same pages and a
+land / period aggregation is a slice followed by a sum, without any database query.
+
+Like in Cerema, a year N is the consumption between 01/01/N and 01/01/N+1 (stored
+in nafNNartNN+1 field).
+
+The cube is built by build_consommation_cube command (called by load_cerema).
+Activation is done with CONSOMMATION_CUBE_STORAGE setting:
+* "" (default): cube is disabled, consumption is aggregated by PostgreSQL
+* "local": cube is read from CONSOMMATION_CUBE_ROOT folder
+* "s3": cube is also uploaded to the bucket by the build, other servers download
+  it in CONSOMMATION_CUBE_ROOT when the data version changes
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from public_data.data_version import get_data_version
+from public_data.models.cerema import Cerema
+from public_data.storages import DataStorage
+
+logger = logging.getLogger(__name__)
+
+
+YEARS = list(range(2009, 2023))
+# naf is the total consumption, others are the determinants (activité, habitat...)
+DETERMINANTS = ["naf", "act", "hab", "mix", "rou", "fer", "inc"]
+LEVELS = [
+    "city_insee",
+    "city_name",
+    "epci_id",
+    "epci_name",
+    "dept_id",
+    "dept_name",
+    "region_id",
+    "region_name",
+    "scot",
+]
+STORAGE_FOLDER = "conso_cube"
+FILES = ["meta.json", "values.npy"] + [f"{level}.npy" for level in LEVELS]
+
+
+def get_field_name(year: int, determinant: str) -> str:
+    start, end = year - 2000, year + 1 - 2000
+    if determinant == "naf":
+        return f"naf{start:0>2}art{end:0>2}"
+    return f"art{start:0>2}{determinant}{end:0>2}"
+
+
+class ConsommationCube:
+    def __init__(self, directory: Path, mmap_mode: Optional[str] = "r"):
+        self.directory = Path(directory)
+        self.meta = json.loads((self.directory / "meta.json").read_text())
+        self.values = np.load(self.directory / "values.npy", mmap_mode=mmap_mode)
+        self.labels = {level: np.load(self.directory / f"{level}.npy") for level in LEVELS}
+        self.years = self.meta["years"]
+        self.determinants = self.meta["determinants"]
+
+    @property
+    def build_id(self) -> str:
+        return self.meta["build_id"]
+
+    @classmethod
+    def build(cls, directory: Path) -> "ConsommationCube":
+        """Read Cerema table and write the cube in directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        value_fields = [get_field_name(year, det) for year in YEARS for det in DETERMINANTS]
+        qs = Cerema.objects.values_list(*LEVELS, *value_fields)
+        rows = list(qs.iterator(chunk_size=2000))
+
+        values = np.zeros((len(rows), len(YEARS), len(DETERMINANTS)), dtype=np.float64)
+        labels = {level: [] for level in LEVELS}
+        first_value = len(LEVELS)
+        for i, row in enumerate(rows):
+            for level, label in zip(LEVELS, row):
+                labels[level].append(label or "")
+            values[i] = np.array(row[first_value:], dtype=np.float64).reshape(len(YEARS), len(DETERMINANTS))
+        # null values of Cerema are considered as no consumption
+        np.nan_to_num(values, copy=False)
+        label_arrays = {level: np.array(labels[level], dtype=str) for level in LEVELS}
+
+        # rows are sorted by numpy order of insee codes, as expected by searchsorted
+        order = np.argsort(label_arrays["city_insee"], kind="stable")
+        np.save(directory / "values.npy", values[order])
+        for level in LEVELS:
+            np.save(directory / f"{level}.npy", label_arrays[level][order])
+        meta = {
+            "build_id": str(int(time.time())),
+            "years": YEARS,
+            "determinants": DETERMINANTS,
+            "communes": len(rows),
+        }
+        (directory / "meta.json").write_text(json.dumps(meta))
+        logger.info("Consommation cube built with %d communes", len(rows))
+        return cls(directory)
+
+    def get_year_slice(self, start, end) -> slice:
+        start, end = int(start), int(end)
+        if start not in self.years or end not in self.years or end < start:
+            raise ValueError(f"Period {start}-{end} is not available in the consommation cube")
+        return slice(self.years.index(start), self.years.index(end) + 1)
+
+    def get_rows(self, insee_codes: Iterable[str]) -> np.ndarray:
+        """Return the rows of the communes, unknown insee codes are ignored."""
+        all_insee = self.labels["city_insee"]
+        codes = np.unique(np.array(list(insee_codes), dtype=str))
+        if not len(codes) or not len(all_insee):
+            return np.array([], dtype=np.intp)
+        rows = np.minimum(np.searchsorted(all_insee, codes), len(all_insee) - 1)
+        return rows[all_insee[rows] == codes]
+
+    def get_rows_by(self, level: str, label: str) -> np.ndarray:
+        """Return the rows of the communes belonging to a land (epci_id, dept_id, region_id...)."""
+        return np.flatnonzero(self.labels[level] == label)
+
+    def get_values(self, rows: np.ndarray, start, end, determinants: Optional[List[str]] = None) -> np.ndarray:
+        """Return values[rows, start:end, determinants] with shape (rows, years, determinants)."""
+        det_indexes = [self.determinants.index(det) for det in (determinants or self.determinants)]
+        return self.values[rows, self.get_year_slice(start, end)][:, :, det_indexes]
+
+    def sum_per_year(self, rows: np.ndarray, start, end, determinant: str = "naf") -> Dict[str, float]:
+        """Return {"2015": m², ...} for the communes of rows."""
+        sums = self.get_values(rows, start, end, [determinant]).sum(axis=0)[:, 0]
+        years = self.years[self.get_year_slice(start, end)]
+        return {str(year): float(value) for year, value in zip(years, sums)}
+
+    def sum_per_year_and_determinant(self, rows: np.ndarray, start, end) -> Dict[str, Dict[str, float]]:
+        """Return {"naf": {"2015": m², ...}, "hab": {...}, ...} for the communes of rows."""
+        sums = self.get_values(rows, start, end).sum(axis=0)
+        years = self.years[self.get_year_slice(start, end)]
+        return {
+            det: {str(year): float(value) for year, value in zip(years, sums[:, i])}
+            for i, det in enumerate(self.determinants)
+        }
+
+    def sum_per_year_by(self, rows: np.ndarray, level: str, start, end, determinant: str = "naf"):
+        """Return {label: {"2015": m², ...}} with communes of rows grouped by a level (dept_name...)."""
+        if not len(rows):
+            return {}
+        labels = self.labels[level][rows]
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        group_starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        values = self.get_values(rows[order], start, end, [determinant])[:, :, 0]
+        sums = np.add.reduceat(values, group_starts, axis=0)
+        years = self.years[self.get_year_slice(start, end)]
+        return {
+            str(sorted_labels[group_start]): {str(year): float(value) for year, value in zip(years, group_sums)}
+            for group_start, group_sums in zip(group_starts, sums)
+        }
+
+
+def get_cube_root() -> Path:
+    return Path(settings.CONSOMMATION_CUBE_ROOT)
+
+
+def build_consommation_cube() -> ConsommationCube:
+    """Build the cube in a new folder, upload it when stored on s3, and drop older builds."""
+    root = get_cube_root()
+    build_dir = root / f"build-{int(time.time())}"
+    cube = ConsommationCube.build(build_dir)
+    current_dir = root / cube.build_id
+    if current_dir.exists():
+        shutil.rmtree(current_dir)
+    build_dir.rename(current_dir)
+    if settings.CONSOMMATION_CUBE_STORAGE == "s3":
+        storage = DataStorage()
+        # meta.json is uploaded last, it points the other servers to the new files
+        for filename in FILES[1:] + FILES[:1]:
+            key = f"{STORAGE_FOLDER}/{filename}"
+            if storage.exists(key):
+                storage.delete(key)
+            with open(current_dir / filename, "rb") as f:
+                storage.save(key, f)
+    for directory in root.iterdir():
+        if directory.is_dir() and directory.name != cube.build_id:
+            shutil.rmtree(directory, ignore_errors=True)
+    return ConsommationCube(current_dir)
+
+
+def find_local_cube() -> Optional[ConsommationCube]:
+    root = get_cube_root()
+    if not root.exists():
+        return None
+    builds = sorted((d for d in root.iterdir() if d.is_dir() and d.name.isdigit()), key=lambda d: int(d.name))
+    return ConsommationCube(builds[-1]) if builds else None
+
+
+def download_cube() -> Optional[ConsommationCube]:
+    """Download the cube from the bucket if the local copy is missing or older."""
+    storage = DataStorage()
+    meta_key = f"{STORAGE_FOLDER}/meta.json"
+    if not storage.exists(meta_key):
+        return None
+    with storage.open(meta_key, "rb") as f:
+        build_id = json.loads(f.read())["build_id"]
+    local_dir = get_cube_root() / build_id
+    if not (local_dir / "meta.json").exists():
+        tmp_dir = get_cube_root() / f"download-{build_id}-{os.getpid()}"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        for filename in FILES:
+            with storage.open(f"{STORAGE_FOLDER}/{filename}", "rb") as source:
+                with open(tmp_dir / filename, "wb") as destination:
+                    shutil.copyfileobj(source, destination)
+        try:
+            tmp_dir.rename(local_dir)
+        except OSError:
+            # already downloaded by another process
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return ConsommationCube(local_dir)
+
+
+# (data version, cube) of the current process, checked again when data version changes
+_loaded_cube = None
+
+
+def get_consommation_cube() -> Optional[ConsommationCube]:
+    """Return the cube, None if disabled or not built: consumption has to be read from Cerema table."""
+    global _loaded_cube
+    if not settings.CONSOMMATION_CUBE_STORAGE:
+        return None
+    data_version = get_data_version()
+    if _loaded_cube is not None and _loaded_cube[0] == data_version:
+        return _loaded_cube[1]
+    try:
+        if settings.CONSOMMATION_CUBE_STORAGE == "s3":
+            cube = download_cube()
+        else:
+            cube = find_local_cube()
+    except (OSError, ValueError) as exc:
+        logger.error("Consommation cube can't be loaded: %s", exc)
+        cube = None
+    _loaded_cube = (data_version, cube)
+    return cube
@@ -0,0 +1,44 @@
+"""Global version of the public data.
+
+The version is stored in DATA_VERSION app parameter and incremented by every
+command loading data (OCS GE, Cerema, GPU...). It is used to build ETags and
+versioned urls of the map layers: a response tagged with a version can't change.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django_app_parameter.models import Parameter
+
+logger = logging.getLogger(__name__)
+
+
+DATA_VERSION_SLUG = "DATA_VERSION"
+DATA_VERSION_CACHE_KEY = "public_data/data_version"
+
+
+def get_data_version() -> int:
+    version = cache.get(DATA_VERSION_CACHE_KEY)
+    if version is None:
+        parameter = Parameter.objects.filter(slug=DATA_VERSION_SLUG).first()
+        version = int(parameter.value) if parameter else 0
+        cache.set(DATA_VERSION_CACHE_KEY, version, timeout=60 * 5)
+    return version
+
+
+def bump_data_version() -> int:
+    """Increment the data version, to be called once new data are loaded."""
+    with transaction.atomic():
+        parameter, _ = Parameter.objects.select_for_update().get_or_create(
+            slug=DATA_VERSION_SLUG,
+            defaults={
+                "name": "Version des données publiques",
+                "value_type": "INT",
+                "value": "0",
+            },
+        )
+        parameter.value = str(int(parameter.value) + 1)
+        parameter.save()
+    cache.delete(DATA_VERSION_CACHE_KEY)
+    logger.info("Data version is now %s", parameter.value)
+    return int(parameter.value)
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Any, Callable
 
 
 class ClassCacher(ABC):
@@ -13,3 +14,11 @@ class ClassCacher(ABC):
     @abstractmethod
     def set(self, key, value):
         pass
+
+    def get_or_compute(self, key, compute: Callable[[], Any]):
+        """Return the cached value of key, or compute, cache and return it."""
+        if self.exists(key):
+            return self.get(key)
+        value = compute()
+        self.set(key, value)
+        return value
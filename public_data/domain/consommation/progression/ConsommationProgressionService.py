@@ -1,6 +1,9 @@
+from typing import Callable, Optional
+
 from django.db.models import Sum
 from django.db.models.query import QuerySet
 
+from public_data.consommation_cube import ConsommationCube
 from public_data.domain.ClassCacher import ClassCacher
 from public_data.models import Cerema, Commune, Land
 
@@ -12,21 +15,30 @@ from .ConsommationProgression import (
 
 
 class ConsommationProgressionService:
-    def __init__(self, class_cacher: ClassCacher):
-        self.class_cacher = class_cacher
-
-    def get_by_communes_aggregation(
+    def __init__(
         self,
-        communes: QuerySet[Commune],
-        start_date: int,
-        end_date: int,
-    ) -> ConsommationProgressionAggregation:
-        communes_key = "-".join(communes.values_list("insee", flat=True))
-        key = f"{start_date}-{end_date}-{communes_key}"
-
-        if self.class_cacher.exists(key):
-            return self.class_cacher.get(key)
+        class_cacher: ClassCacher,
+        cube_getter: Optional[Callable[[], Optional[ConsommationCube]]] = None,
+    ):
+        self.class_cacher = class_cacher
+        self.cube_getter = cube_getter
+
+    def get_cube_sums(self, communes: QuerySet[Commune], start_date: int, end_date: int) -> Optional[dict]:
+        """Return {year: {"total": m², "hab": m², ...}} read from the consommation cube,
+        None if the cube is not available."""
+        cube = self.cube_getter() if self.cube_getter else None
+        if cube is None:
+            return None
+        rows = cube.get_rows(communes.values_list("insee", flat=True))
+        conso = cube.sum_per_year_and_determinant(rows, start_date, end_date)
+        results = {}
+        for det, years in conso.items():
+            for year, val in years.items():
+                results.setdefault(int(year), {})["total" if det == "naf" else det] = val
+        return results
 
+    def get_cerema_sums(self, communes: QuerySet[Commune], start_date: int, end_date: int) -> dict:
+        """Return {year: {"total": m², "hab": m², ...}} aggregated by PostgreSQL."""
         artif_fields = Cerema.get_art_field(
             start=str(start_date),
             end=str(end_date),
@@ -52,8 +64,6 @@ class ConsommationProgressionService:
 
         results = {}
 
-        surface = float(sum([commune.area for commune in communes]))
-
         for key, val in qs.items():
             year = int(f"20{key[3:5]}")
 
@@ -67,6 +77,34 @@ class ConsommationProgressionService:
                 det = key[5:8]
                 results[year][det] = val
 
+        return results
+
+    def get_by_communes_aggregation(
+        self,
+        communes: QuerySet[Commune],
+        start_date: int,
+        end_date: int,
+    ) -> ConsommationProgressionAggregation:
+        communes_key = "-".join(communes.values_list("insee", flat=True))
+        key = f"{start_date}-{end_date}-{communes_key}"
+
+        return self.class_cacher.get_or_compute(
+            key,
+            lambda: self.compute_by_communes_aggregation(communes, start_date, end_date),
+        )
+
+    def compute_by_communes_aggregation(
+        self,
+        communes: QuerySet[Commune],
+        start_date: int,
+        end_date: int,
+    ) -> ConsommationProgressionAggregation:
+        results = self.get_cube_sums(communes, start_date, end_date)
+        if results is None:
+            results = self.get_cerema_sums(communes, start_date, end_date)
+
+        surface = float(sum([commune.area for commune in communes]))
+
         progression = ConsommationProgressionAggregation(
             start_date=start_date,
             end_date=end_date,
@@ -87,8 +125,6 @@ class ConsommationProgressionService:
             ],
         )
 
-        self.class_cacher.set(key, value=progression)
-
         return progression
 
     def get_by_lands(
@@ -100,19 +136,33 @@ class ConsommationProgressionService:
         if not lands:
             return []
 
+        conso_per_land = Land.get_conso_by_lands(lands, start_date, end_date)
+        surfaces = Land.get_surface_by_lands(lands)
+
         output = []
 
         for land in lands:
+            conso = conso_per_land[land.public_key]
+            surface = surfaces.get(land.public_key, 0)
             output.append(
                 ConsommationProgressionLand(
                     land=land,
                     start_date=start_date,
                     end_date=end_date,
-                    consommation=self.get_by_communes_aggregation(
-                        communes=land.get_cities(),
-                        start_date=start_date,
-                        end_date=end_date,
-                    ).consommation,
+                    consommation=[
+                        AnnualConsommation(
+                            year=year,
+                            total=conso[year]["total"] / 10000,
+                            habitat=conso[year]["hab"] / 10000,
+                            activite=conso[year]["act"] / 10000,
+                            mixte=conso[year]["mix"] / 10000,
+                            route=conso[year]["rou"] / 10000,
+                            ferre=conso[year]["fer"] / 10000,
+                            non_reseigne=conso[year]["inc"] / 10000,
+                            per_mille_of_area=conso[year]["total"] / 10000 / surface * 1000 if surface else 0,
+                        )
+                        for year in sorted(conso)
+                    ],
                 )
             )
 
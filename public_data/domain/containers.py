@@ -1,7 +1,9 @@
 from dependency_injector import containers, providers
+from django.conf import settings
 from django.core.cache import cache as django_cache
 
-from public_data.infra.PickleClassCacher import PickleClassCacher
+from public_data.consommation_cube import get_consommation_cube
+from public_data.infra.VersionedClassCacher import VersionedClassCacher
 
 from .ClassCacher import ClassCacher
 from .consommation.progression.ConsommationProgressionService import (
@@ -13,11 +15,13 @@ class PublicDataContainer(containers.DeclarativeContainer):
     config = providers.Configuration()
 
     class_cacher: ClassCacher = providers.Factory(
-        PickleClassCacher,
+        VersionedClassCacher,
         cache=django_cache,
+        timeout=settings.CLASS_CACHER_TIMEOUT,
     )
 
     consommation_progression_service = providers.Factory(
         ConsommationProgressionService,
         class_cacher=class_cacher,
+        cube_getter=providers.Object(get_consommation_cube),
     )
@@ -56,7 +56,7 @@ class ImpermeabilisationDifferenceService:
 
             for item in result:
                 if sol == "usage":
-                    sol_object = UsageSol.objects.get(code_prefix=item["code_prefix"])
+                    sol_object = UsageSol.get_by_code_prefix(item["code_prefix"])
                     usage.append(
                         ImpermeabilisationDifferenceSol(
                             **item,
@@ -65,7 +65,7 @@ class ImpermeabilisationDifferenceService:
                         )
                     )
                 else:
-                    sol_object = CouvertureSol.objects.get(code_prefix=item["code_prefix"])
+                    sol_object = CouvertureSol.get_by_code_prefix(item["code_prefix"])
                     difference.couverture.append(
                         ImpermeabilisationDifferenceSol(
                             **item,
@@ -94,7 +94,7 @@ class ImpermeabilisationDifferenceService:
                     label_short=existing_aggregate.label_short,
                 )
             else:
-                sol_object = UsageSol.objects.get(code_prefix=level_one_code)
+                sol_object = UsageSol.get_by_code_prefix(level_one_code)
                 grouped[level_one_code] = ImpermeabilisationDifferenceSol(
                     code_prefix=level_one_code,
                     imper=item.imper,
@@ -0,0 +1,309 @@
+"""Binary outputs of the geometry endpoints: FlatGeobuf and GeoArrow.
+
+The format is negotiated by DRF, with ?format=fgb|arrow or the Accept header
+(application/flatgeobuf, application/vnd.apache.arrow.stream), GeoJSON stays the
+default output.
+
+* FlatGeobuf is built by PostGIS (ST_AsFlatGeobuf) with its spatial index, so a
+  client can read only the features of its bbox with HTTP range requests. The
+  file is cached for a short time as those clients send several requests, in
+  redis or, when it is too big and FLATGEOBUF_STORAGE is set, in that storage
+  until the data version changes.
+* GeoArrow is an Arrow IPC stream with a WKB geometry column (geoarrow.wkb),
+  streamed by batch from a server side cursor. It requires pyarrow, which is an
+  optional dependency: the format is not offered when it is not installed.
+
+A query is described by its property columns [(sql, name), ...], the sql of its
+geometry and its "from ... where ..." part.
+"""
+import hashlib
+import io
+import json
+import re
+from functools import cache as cache_function
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from public_data.data_version import get_data_version
+from public_data.storages import FlatGeobufStorage
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+FLATGEOBUF = "fgb"
+GEOARROW = "arrow"
+BINARY_FORMATS = (FLATGEOBUF, GEOARROW)
+
+# FlatGeobuf files bigger than that are not cached in redis but in a storage (bytes)
+FLATGEOBUF_CACHE_MAX_SIZE = 20 * 1024 * 1024
+FLATGEOBUF_CACHE_TIMEOUT = 60 * 10
+
+Columns = Sequence[Tuple[str, str]]
+
+
+class BinaryGeoRenderer(BaseRenderer):
+    """Declare a binary format to DRF content negotiation, content is built by the view."""
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return data
+        # errors raised by the view are still sent as json
+        if renderer_context and renderer_context.get("response") is not None:
+            renderer_context["response"]["Content-Type"] = "application/json"
+        return json.dumps(data).encode()
+
+
+class FlatGeobufRenderer(BinaryGeoRenderer):
+    media_type = "application/flatgeobuf"
+    format = FLATGEOBUF
+
+
+class GeoArrowRenderer(BinaryGeoRenderer):
+    media_type = "application/vnd.apache.arrow.stream"
+    format = GEOARROW
+
+
+class BinaryGeoFormatMixin:
+    """Add FlatGeobuf and GeoArrow to the formats a DRF view can negotiate."""
+
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [FlatGeobufRenderer]
+    if pa is not None:
+        renderer_classes.append(GeoArrowRenderer)
+
+    def get_binary_format(self) -> Optional[str]:
+        """Return the binary format requested, None for default output (GeoJSON)."""
+        renderer_format = getattr(self.request, "accepted_renderer", None)
+        renderer_format = getattr(renderer_format, "format", None)
+        return renderer_format if renderer_format in BINARY_FORMATS else None
+
+    def binary_response(self, columns: Columns, geometry: str, from_where: str, params: Sequence):
+        return binary_geo_response(self.request, self.get_binary_format(), columns, geometry, from_where, params)
+
+
+def queryset_parts(queryset: QuerySet, fields: Sequence[str], geo_field: str = "mpoly"):
+    """Return the parts of a binary query selecting fields of the objects of a queryset."""
+    opts = queryset.model._meta
+    ids_sql, ids_params = queryset.values("pk").query.sql_with_params()
+    columns = [(f'o."{opts.get_field(field).column}"', field) for field in fields]
+    geometry = f'o."{opts.get_field(geo_field).column}"'
+    from_where = f'FROM "{opts.db_table}" o WHERE o."{opts.pk.column}" IN ({ids_sql})'
+    return columns, geometry, from_where, list(ids_params)
+
+
+def get_select(columns: Columns, geometry: str) -> str:
+    return ", ".join([f'{sql} AS "{name}"' for sql, name in columns] + [f"{geometry} AS geom"])
+
+
+class BytesSource:
+    """Content of a binary response kept in memory."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.size = len(data)
+
+    def read(self, start: int, stop: int) -> bytes:
+        return self.data[start:stop]
+
+    def full_response(self, content_type: str) -> HttpResponse:
+        return HttpResponse(self.data, content_type=content_type)
+
+
+class StoredSource:
+    """Content of a binary response kept in a storage, ranges are read without loading the file."""
+
+    def __init__(self, storage: Storage, name: str):
+        self.storage = storage
+        self.name = name
+        self.size = storage.size(name)
+
+    def read(self, start: int, stop: int) -> bytes:
+        if hasattr(self.storage, "bucket"):
+            # S3 storage files are downloaded entirely on read, ask the range to the bucket
+            key = self.storage._normalize_name(self.name)
+            return self.storage.bucket.Object(key).get(Range=f"bytes={start}-{stop - 1}")["Body"].read()
+        with self.storage.open(self.name, "rb") as f:
+            f.seek(start)
+            return f.read(stop - start)
+
+    def full_response(self, content_type: str) -> HttpResponse:
+        return FileResponse(self.storage.open(self.name, "rb"), content_type=content_type)
+
+
+@cache_function
+def get_flatgeobuf_storage() -> Optional[Storage]:
+    """Return the storage of big FlatGeobuf files configured in settings, None if disabled."""
+    if settings.FLATGEOBUF_STORAGE == "local":
+        return FileSystemStorage(location=settings.FLATGEOBUF_ROOT)
+    if settings.FLATGEOBUF_STORAGE == "s3":
+        return FlatGeobufStorage()
+    return None
+
+
+def store_flatgeobuf(storage: Storage, data_version: int, name: str, data: bytes) -> None:
+    """Store a big FlatGeobuf, files of previous data versions are deleted with the first
+    file of a new version."""
+    folder = str(data_version)
+    try:
+        directories, _ = storage.listdir("")
+    except FileNotFoundError:
+        directories = []
+    if folder not in directories:
+        for directory in directories:
+            _, files = storage.listdir(directory)
+            for filename in files:
+                storage.delete(f"{directory}/{filename}")
+    storage.save(name, ContentFile(data))
+
+
+def get_flatgeobuf(columns: Columns, geometry: str, from_where: str, params: Sequence):
+    """Build a spatially indexed FlatGeobuf with PostGIS, cached for range requests.
+    Return a BytesSource or a StoredSource."""
+    query = f"SELECT ST_AsFlatGeobuf(q, true, 'geom') FROM (SELECT {get_select(columns, geometry)} {from_where}) AS q"
+    data_version = get_data_version()
+    with connection.cursor() as cursor:
+        # key of the query with its params as SQL literals, geometries included
+        literal = cursor.mogrify(query, params)
+    literal = literal if isinstance(literal, bytes) else literal.encode()
+    digest = hashlib.sha1(f"{data_version}|".encode() + literal).hexdigest()
+    cache_key = f"public_data/fgb/{digest}"
+    data = cache.get(cache_key)
+    if data is not None:
+        return BytesSource(data)
+    storage = get_flatgeobuf_storage()
+    name = f"{data_version}/{digest}.fgb"
+    if storage is not None and storage.exists(name):
+        return StoredSource(storage, name)
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    data = bytes(row[0]) if row and row[0] is not None else b""
+    if len(data) <= FLATGEOBUF_CACHE_MAX_SIZE:
+        cache.set(cache_key, data, timeout=FLATGEOBUF_CACHE_TIMEOUT)
+    elif storage is not None:
+        store_flatgeobuf(storage, data_version, name, data)
+    return BytesSource(data)
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Return (start, end) included of a single "bytes=" range, None if it can't be satisfied."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # suffix range: last n bytes
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def range_response(request, source: Union[bytes, BytesSource, StoredSource], content_type: str) -> HttpResponse:
+    """Serve the content, or the part of it requested with a Range header."""
+    if isinstance(source, bytes):
+        source = BytesSource(source)
+    range_header = request.META.get("HTTP_RANGE")
+    if not range_header:
+        response = source.full_response(content_type)
+    else:
+        byte_range = parse_range(range_header, source.size)
+        if byte_range is None:
+            response = HttpResponse(status=416, content_type=content_type)
+            response["Content-Range"] = f"bytes */{source.size}"
+        else:
+            start, end = byte_range
+            response = HttpResponse(source.read(start, end + 1), status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{source.size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+# psycopg2 type oid => (arrow type name, python converter)
+ARROW_TYPES = {
+    16: ("bool_", None),
+    20: ("int64", None),
+    21: ("int64", None),
+    23: ("int64", None),
+    700: ("float64", None),
+    701: ("float64", None),
+    1700: ("float64", float),
+    17: ("binary", bytes),
+}
+
+
+def get_arrow_field(name: str, type_code: int) -> Tuple[object, Optional[Callable]]:
+    type_name, converter = ARROW_TYPES.get(type_code, ("string", str))
+    return pa.field(name, getattr(pa, type_name)()), converter
+
+
+def stream_geoarrow(columns: Columns, geometry: str, from_where: str, params: Sequence, batch_size: int = 1000):
+    """Return an iterator of Arrow IPC stream chunks, geometries are WKB encoded (geoarrow.wkb)."""
+    if pa is None:
+        raise NotAcceptable("GeoArrow output is not available, pyarrow is not installed.")
+
+    query = f"SELECT {get_select(columns, f'ST_AsBinary({geometry})')} {from_where}"
+    geo_metadata = {
+        b"ARROW:extension:name": b"geoarrow.wkb",
+        b"ARROW:extension:metadata": json.dumps({"crs": "EPSG:4326", "crs_type": "authority_code"}).encode(),
+    }
+
+    def convert(values: list, converter: Optional[Callable]) -> list:
+        if converter is None:
+            return values
+        return [converter(v) if v is not None else None for v in values]
+
+    def stream() -> Iterator[bytes]:
+        sink = io.BytesIO()
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(query, params)
+            # description of a server side cursor is available after the first fetch
+            rows = cursor.fetchmany(batch_size)
+            fields: List[Tuple[object, Optional[Callable]]] = [
+                get_arrow_field(column.name, column.type_code) for column in cursor.description[:-1]
+            ]
+            fields.append((pa.field("geometry", pa.binary(), metadata=geo_metadata), bytes))
+            schema = pa.schema([field for field, _ in fields])
+            with pa.ipc.new_stream(sink, schema) as writer:
+                while rows:
+                    arrays = [
+                        pa.array(convert(list(values), converter), type=field.type)
+                        for values, (field, converter) in zip(zip(*rows), fields)
+                    ]
+                    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                    yield sink.getvalue()
+                    sink.seek(0)
+                    sink.truncate()
+                    rows = cursor.fetchmany(batch_size)
+        # end of stream marker written when the writer is closed
+        yield sink.getvalue()
+
+    return stream()
+
+
+def binary_geo_response(request, output_format: str, columns: Columns, geometry: str, from_where: str, params):
+    if output_format == FLATGEOBUF:
+        source = get_flatgeobuf(columns, geometry, from_where, params)
+        return range_response(request, source, FlatGeobufRenderer.media_type)
+    if output_format == GEOARROW:
+        return StreamingHttpResponse(
+            stream_geoarrow(columns, geometry, from_where, params),
+            content_type=GeoArrowRenderer.media_type,
+        )
+    raise NotAcceptable(f"{output_format} is not a binary format")
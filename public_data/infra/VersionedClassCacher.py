@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import pickle
+import zlib
+from typing import Any, Callable
+
+from django.core.cache import BaseCache
+
+from public_data.data_version import get_data_version
+from public_data.domain.ClassCacher import ClassCacher
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyzstd
+except ImportError:  # pragma: no cover
+    pyzstd = None
+
+
+MISSING = object()
+
+# first byte of a stored value, tells how the pickle is compressed
+RAW = b"r"
+ZLIB = b"z"
+ZSTD = b"s"
+
+
+class VersionedClassCacher(ClassCacher):
+    """Cache pickled values under short keys, namespaced by the data version.
+
+    * keys are a digest of the caller key, so a key built from thousands of insee
+      codes costs 40 characters in Redis
+    * values are stored under the current data version: they are never read again
+      after a data import, and expire after timeout seconds
+    * pickles bigger than compress_min_size are compressed with zstd (zlib if
+      pyzstd is not installed)
+    * get and get_or_compute make one cache request (no has_key before get), the
+      data version is read once per cacher
+    """
+
+    def __init__(
+        self,
+        cache: BaseCache,
+        namespace: str = "class_cacher",
+        timeout: int | None = 60 * 60 * 24,
+        compress_min_size: int = 1024,
+    ):
+        self.cache = cache
+        self.namespace = namespace
+        self.timeout = timeout
+        self.compress_min_size = compress_min_size
+        self._data_version = None
+
+    @property
+    def data_version(self) -> int:
+        # read once: the cacher is built for a service call, not kept for the process
+        if self._data_version is None:
+            self._data_version = get_data_version()
+        return self._data_version
+
+    def get_cache_key(self, key) -> str:
+        digest = hashlib.sha1(str(key).encode()).hexdigest()
+        return f"public_data/{self.namespace}/v{self.data_version}/{digest}"
+
+    def dumps(self, value) -> bytes:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) < self.compress_min_size:
+            return RAW + data
+        if pyzstd is not None:
+            return ZSTD + pyzstd.compress(data)
+        return ZLIB + zlib.compress(data)
+
+    def loads(self, data: bytes) -> Any:
+        method, payload = data[:1], data[1:]
+        if method == ZSTD:
+            payload = pyzstd.decompress(payload)
+        elif method == ZLIB:
+            payload = zlib.decompress(payload)
+        return pickle.loads(payload)
+
+    def fetch(self, cache_key: str) -> Any:
+        """Return the value of a cache key, MISSING if it is not cached or can't be read."""
+        data = self.cache.get(cache_key, MISSING)
+        if data is MISSING:
+            return MISSING
+        try:
+            return self.loads(data)
+        except Exception as exc:
+            logger.warning("Cached value of %s can't be read: %s", cache_key, exc)
+            return MISSING
+
+    def exists(self, key) -> bool:
+        return self.cache.has_key(self.get_cache_key(key))
+
+    def get(self, key) -> Any | None:
+        value = self.fetch(self.get_cache_key(key))
+        return None if value is MISSING else value
+
+    def set(self, key, value) -> None:
+        self.cache.set(self.get_cache_key(key), self.dumps(value), timeout=self.timeout)
+
+    def get_or_compute(self, key, compute: Callable[[], Any]) -> Any:
+        cache_key = self.get_cache_key(key)
+        value = self.fetch(cache_key)
+        if value is MISSING:
+            value = compute()
+            self.cache.set(cache_key, self.dumps(value), timeout=self.timeout)
+        return value
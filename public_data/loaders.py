@@ -17,7 +17,7 @@ from utils.db import DynamicSRIDTransform
 
 
 # syntaxic sugar to avoid writing long line of code
-# cache has been added to matrix_dict method
+# matrix_dict is served by the referential cache (see public_data.referentials)
 def get_matrix(cs, us):
     return CouvertureUsageMatrix().matrix_dict()[(cs, us)]
 
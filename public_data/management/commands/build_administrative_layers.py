@@ -1,10 +1,12 @@
 import logging
 
 from django.contrib.gis.db.models import Union
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.core.paginator import Paginator
 from django.db.models import QuerySet
 
+from public_data.data_version import bump_data_version
 from public_data.models import Cerema, Commune, Departement, Epci, Region
 from public_data.models.administration import Scot
 from utils.db import fix_poly
@@ -54,6 +56,9 @@ class Command(BaseCommand):
         self.load_scot(base_qs)
         self.link_epci(base_qs)
         self.load_communes(base_qs, table_was_cleaned=clean)
+        call_command("build_conso_rollups")
+        call_command("build_simplified_geometries")
+        bump_data_version()
 
     def load_region(self, base_qs: QuerySet):
         logger.info("Loading regions")
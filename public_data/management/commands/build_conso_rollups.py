@@ -0,0 +1,16 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from public_data.models import CeremaRollup
+
+logger = logging.getLogger("management.commands")
+
+
+class Command(BaseCommand):
+    help = "Aggregate Cerema consumption per year for each EPCI, SCoT, departement and region"
+
+    def handle(self, *args, **options):
+        logger.info("Build Cerema rollups")
+        created = CeremaRollup.build()
+        logger.info("%d rollups created", created)
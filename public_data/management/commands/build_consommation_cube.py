@@ -0,0 +1,20 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from public_data.consommation_cube import build_consommation_cube
+
+logger = logging.getLogger("management.commands")
+
+
+class Command(BaseCommand):
+    help = "Build the NumPy consommation cube from Cerema data"
+
+    def handle(self, *args, **options):
+        if not settings.CONSOMMATION_CUBE_STORAGE:
+            logger.warning("Consommation cube is disabled, set CONSOMMATION_CUBE_STORAGE")
+            return
+        logger.info("Build consommation cube")
+        cube = build_consommation_cube()
+        logger.info("Consommation cube %s built in %s", cube.build_id, cube.directory)
@@ -3,6 +3,7 @@ import logging
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from public_data.data_version import bump_data_version
 from public_data.models import CouvertureSol, CouvertureUsageMatrix, UsageSol
 
 logger = logging.getLogger("management.commands")
@@ -69,4 +70,6 @@ class Command(BaseCommand):
             is_artificial=True,
             label=CouvertureUsageMatrix.LabelChoices.ARTIFICIAL,
         )
+        # refresh the referential cache of the matrix
+        bump_data_version()
         logger.info("End")
@@ -0,0 +1,28 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from public_data.models import OcsgeDiff, OcsgeGridCell
+
+logger = logging.getLogger("management.commands")
+
+
+class Command(BaseCommand):
+    help = "Build the grids of OCS GE surfaces used by maps at low zoom"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--departement",
+            type=str,
+            help="Departement code (default: all departements with OCS GE differences)",
+        )
+
+    def handle(self, *args, **options):
+        if options.get("departement"):
+            departements = [options["departement"]]
+        else:
+            departements = OcsgeDiff.objects.values_list("departement", flat=True).order_by("departement").distinct()
+        for departement in departements:
+            logger.info("Build OCS GE grid of departement %s", departement)
+            created = OcsgeGridCell.build_departement(departement)
+            logger.info("%d cells created", created)
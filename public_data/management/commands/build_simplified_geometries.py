@@ -0,0 +1,36 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from public_data.models import (
+    Commune,
+    Departement,
+    Epci,
+    Region,
+    Scot,
+    SimplifiedGeometry,
+)
+
+logger = logging.getLogger("management.commands")
+
+
+land_models = {model.land_type: model for model in [Commune, Epci, Scot, Departement, Region]}
+
+
+class Command(BaseCommand):
+    help = "Build simplified geometries of administrative lands used by maps at low zoom"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--land-type",
+            type=str,
+            choices=land_models.keys(),
+            help="Build only this land type (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        land_types = [options["land_type"]] if options.get("land_type") else list(land_models.keys())
+        for land_type in land_types:
+            logger.info("Build simplified geometries of %s", land_type)
+            created = SimplifiedGeometry.build(land_models[land_type])
+            logger.info("%d simplified geometries created", created)
@@ -3,6 +3,7 @@ import re
 
 from django.core.management.base import BaseCommand
 
+from public_data.data_version import bump_data_version
 from public_data.models import CouvertureSol, UsageSol
 
 logger = logging.getLogger("management.commands")
@@ -32,4 +33,5 @@ class Command(BaseCommand):
             usage.label_short = build_short_label(usage.label)
             usage.save()
 
+        bump_data_version()
         logger.info("End")
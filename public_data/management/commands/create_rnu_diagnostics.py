@@ -8,7 +8,6 @@ from project.models.create import trigger_async_tasks_rnu_pakage_one_off
 from public_data.models import Commune, Land
 from public_data.models.sudocuh import DocumentUrbanismeChoices, Sudocuh
 from users.models import User
-from utils.db import fix_poly
 
 logger = logging.getLogger("management.commands")
 
@@ -85,11 +84,8 @@ class Command(BaseCommand):
 
             project.cities.add(commune)
 
-            Emprise.objects.create(
-                mpoly=fix_poly(commune.mpoly),
-                srid_source=commune.srid_source,
-                project=project,
-            )
+            Emprise.build_from_cities(project)
+            project.update_combined_emprise()
 
             similar_lands_public_keys = [
                 comparison_land.public_key for comparison_land in project.get_comparison_lands()
@@ -5,9 +5,11 @@ from django.contrib.gis.geos import GEOSGeometry
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from public_data.data_version import bump_data_version
 from public_data.management.commands.load_gpu import ZoneUrbaFrance
 from public_data.models import Departement, ZoneUrba
 from public_data.storages import DataStorage
+from public_data.tile_cache import invalidate_zone_urba_tiles
 
 logger = logging.getLogger("management.commands")
 
@@ -70,6 +72,7 @@ class Command(BaseCommand):
             except MissingFile:
                 logger.warning("Missing file for departement %s", dept.name)
 
+        bump_data_version()
         logger.info("End importing GPU")
 
     def process_one(self, dept: Departement) -> None:
@@ -112,3 +115,4 @@ class Command(BaseCommand):
 
         logger.info("Start calculating fields")
         ZoneUrbaFrance.calculate_fields()
+        invalidate_zone_urba_tiles(dept.mpoly.extent)
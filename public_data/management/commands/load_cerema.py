@@ -1,9 +1,11 @@
 import logging
 from typing import Callable, Tuple
 
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
 from public_data import loaders
+from public_data.data_version import bump_data_version
 from public_data.factories import LayerMapperFactory
 from public_data.models import DataSource
 
@@ -62,4 +64,7 @@ class Command(BaseCommand):
             logger.info("Process %s", layer_mapper_proxy_class.__name__)
             layer_mapper_proxy_class.load()
 
+        call_command("build_consommation_cube")
+        call_command("build_conso_rollups")
+        bump_data_version()
         logger.info("End load_cerema")
@@ -7,8 +7,10 @@ from django.db import connection
 from django.db.models import DecimalField, F
 from django.db.models.functions import Cast
 
+from public_data.data_version import bump_data_version
 from public_data.models import ZoneUrba
 from public_data.models.mixins import AutoLoadMixin
+from public_data.tile_cache import invalidate_zone_urba_tiles
 from utils.db import DynamicSRIDTransform
 
 logger = logging.getLogger("management.commands")
@@ -57,22 +59,38 @@ class ZoneUrbaFrance(AutoLoadMixin, ZoneUrba):
         return super().save(*args, **kwargs)
 
     @classmethod
-    def calculate_fields(cls):
-        """Override if you need to calculate some fields after loading data.
-        By default, it will calculate label for couverture and usage if couverture_field
-        and usage_field are set with the name of the field containing code (cs.2.1.3)
-        """
-        # TODO : insee, surface, type_zone
-        logger.info("Calculate fields")
+    def calculate_label_center(cls):
+        """Make mpoly valid when possible, then evaluate validity and label position
+        of the zones not evaluated yet (is_valid is null)."""
         logger.info("Make mpoly valid")
         make_valid_mpoly_query = (
             "UPDATE public_data_zoneurba pdz "
             "SET mpoly = ST_Multi(ST_CollectionExtract(ST_MakeValid(mpoly), 3)) "
-            "WHERE ST_IsValid(mpoly) IS FALSE "
+            "WHERE is_valid IS NULL "
+            "    AND ST_IsValid(mpoly) IS FALSE "
             "    AND ST_IsValid(ST_MakeValid(mpoly))"
         )
         with connection.cursor() as cursor:
             cursor.execute(make_valid_mpoly_query)
+        logger.info("Evaluate validity and label position")
+        label_center_query = (
+            "UPDATE public_data_zoneurba "
+            "SET is_valid = ST_IsValid(mpoly), "
+            "    label_center = CASE WHEN ST_IsValid(mpoly) THEN (ST_MaximumInscribedCircle(mpoly)).center END "
+            "WHERE is_valid IS NULL"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(label_center_query)
+
+    @classmethod
+    def calculate_fields(cls):
+        """Override if you need to calculate some fields after loading data.
+        By default, it will calculate label for couverture and usage if couverture_field
+        and usage_field are set with the name of the field containing code (cs.2.1.3)
+        """
+        # TODO : insee, surface, type_zone
+        logger.info("Calculate fields")
+        cls.calculate_label_center()
         logger.info("Evaluate area")
 
         cls.objects.filter(area__isnull=True).update(
@@ -137,6 +155,8 @@ class Command(BaseCommand):
         if options["truncate"]:
             self.truncate()
         self.load()
+        bump_data_version()
+        invalidate_zone_urba_tiles()
         logger.info("End loading GPU")
 
     def truncate(self):
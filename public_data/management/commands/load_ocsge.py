@@ -5,8 +5,10 @@ from django.core.management.base import BaseCommand
 from django.db.models import Q
 
 from public_data import loaders
+from public_data.data_version import bump_data_version
 from public_data.factories import LayerMapperFactory
-from public_data.models import DataSource, Departement
+from public_data.models import DataSource, Departement, OcsgeGridCell
+from public_data.tile_cache import invalidate_data_source_tiles
 
 logger = logging.getLogger("management.commands")
 
@@ -108,3 +110,16 @@ class Command(BaseCommand):
             layer_mapper_proxy_class = OcsgeFactory(source).get_layer_mapper_proxy_class(module_name=__name__)
             logger.info("Process %s", layer_mapper_proxy_class.__name__)
             layer_mapper_proxy_class.load()
+
+        self.refresh_derived_data(sources)
+
+    def refresh_derived_data(self, sources) -> None:
+        """Invalidate the cached tiles and rebuild the grids of the loaded departements."""
+        for source in sources:
+            invalidate_data_source_tiles(source)
+
+        for departement in sorted({source.official_land_id for source in sources}):
+            logger.info("Refresh OCS GE grid of departement %s", departement)
+            OcsgeGridCell.build_departement(departement)
+
+        bump_data_version()
@@ -5,8 +5,17 @@ from pathlib import Path
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
-from public_data.models import Cerema, DataSource, Ocsge, OcsgeDiff, ZoneConstruite
+from public_data.data_version import bump_data_version
+from public_data.models import (
+    Cerema,
+    DataSource,
+    Ocsge,
+    OcsgeDiff,
+    OcsgeGridCell,
+    ZoneConstruite,
+)
 from public_data.shapefile import ShapefileFromSource
+from public_data.tile_cache import invalidate_data_source_tiles
 
 logger = logging.getLogger("management.commands")
 
@@ -273,6 +282,7 @@ class Command(BaseCommand):
         subprocess.run(" ".join(command), check=True, shell=True)
 
     def handle(self, *args, **options) -> None:
+        ocsge_departements = set()
         for source in self.get_sources_queryset(options):
             with ShapefileFromSource(source=source) as shapefile_path:
                 logger.info("Deleting previously loaded data")
@@ -284,3 +294,12 @@ class Command(BaseCommand):
                     source=source,
                 )
                 logger.info("Loaded shapefile to db")
+                invalidate_data_source_tiles(source)
+                if source.dataset == DataSource.DatasetChoices.OCSGE:
+                    ocsge_departements.add(source.official_land_id)
+
+        for departement in sorted(ocsge_departements):
+            logger.info("Refresh OCS GE grid of departement %s", departement)
+            OcsgeGridCell.build_departement(departement)
+
+        bump_data_version()
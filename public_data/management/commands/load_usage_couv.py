@@ -3,6 +3,7 @@ import re
 
 from django.core.management.base import BaseCommand
 
+from public_data.data_version import bump_data_version
 from public_data.models import CouvertureSol, UsageSol
 
 logger = logging.getLogger("management.commands")
@@ -213,6 +214,7 @@ class Command(BaseCommand):
         self.load(DATA_USAGE, UsageSol)
         logger.info("set is key")
         self.set_is_key()
+        bump_data_version()
         logger.info("End uploading CSV usage and couverture")
 
     def load(self, DATA, klass):
@@ -0,0 +1,69 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+from public_data import views
+from public_data.models import Departement
+from public_data.tile_cache import get_tile_cache, iter_tiles
+
+logger = logging.getLogger("management.commands")
+
+
+layers = {
+    "ocsge": views.OcsgeViewSet,
+    "ocsge_diff": views.OcsgeDiffViewSet,
+    "zones_construites": views.ZoneConstruiteViewSet,
+    "zones_artificielles": views.ArtificialAreaViewSet,
+    "zones_urbaines": views.ZoneUrbaViewSet,
+}
+
+
+class Command(BaseCommand):
+    help = "Pre-build the vector tiles of a departement and store them in the tile cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--departement", type=str, required=True, help="Departement source_id or name")
+        parser.add_argument("--layer", type=str, required=True, choices=layers.keys())
+        parser.add_argument(
+            "--query",
+            type=str,
+            default="",
+            help="Query string used by the map, e.g. 'year=2021&is_artificial=1' or 'year_old=2018&year_new=2021'",
+        )
+        parser.add_argument("--min-zoom", type=int, help="Default to the minimum zoom of the layer")
+        parser.add_argument("--max-zoom", type=int, default=15)
+
+    def handle(self, *args, **options):
+        tile_cache = get_tile_cache()
+        if tile_cache is None:
+            raise ValueError("Tile cache is disabled, set TILE_CACHE_STORAGE")
+
+        departement_param = options["departement"]
+        departement = Departement.objects.filter(
+            Q(source_id=departement_param) | Q(name__icontains=departement_param)
+        ).first()
+        if not departement:
+            raise ValueError(f"{departement_param} is not a valid departement")
+
+        http_request = HttpRequest()
+        http_request.method = "GET"
+        http_request.GET = QueryDict(options["query"])
+        view = layers[options["layer"]](request=Request(http_request), format_kwarg=None)
+
+        min_zoom = options["min_zoom"] if options["min_zoom"] is not None else view.get_tile_min_zoom()
+        max_zoom = options["max_zoom"]
+        logger.info("Seed %s tiles of %s from zoom %d to %d", options["layer"], departement.name, min_zoom, max_zoom)
+
+        count = 0
+        for z, x, y in iter_tiles(departement.mpoly.extent, min_zoom, max_zoom):
+            key = view.get_tile_cache_key(z, x, y)
+            if key is None:
+                raise ValueError("Those query parameters can't be cached")
+            tile_cache.set(key, view.get_tile(z, x, y))
+            count += 1
+            if count % 1000 == 0:
+                logger.info("%d tiles seeded", count)
+        logger.info("Done, %d tiles seeded", count)
@@ -2,6 +2,7 @@ import logging
 
 from django.core.management.base import BaseCommand
 
+from public_data.data_version import bump_data_version
 from public_data.models import CouvertureSol, UsageSol
 
 logging.basicConfig(level=logging.INFO)
@@ -17,3 +18,4 @@ class Command(BaseCommand):
         logging.info("Re-evaluate UsageSol parents of all instances")
         for usage in UsageSol.objects.all():
             usage.set_parent()
+        bump_data_version()
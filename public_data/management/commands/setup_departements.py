@@ -2,6 +2,7 @@ import logging
 
 from django.core.management.base import BaseCommand
 
+from public_data.data_version import bump_data_version
 from public_data.models import Commune, DataSource, Departement
 
 logger = logging.getLogger("management.commands")
@@ -60,4 +61,7 @@ class Command(BaseCommand):
 
             logger.info(f"Done {departement.name}: {departement.ocsge_millesimes}")
 
+        # refresh the referential cache of departement millésimes
+        bump_data_version()
+
         logger.info(msg="End setup departements OCSGE")
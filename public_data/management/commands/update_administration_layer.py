@@ -1,6 +1,7 @@
 import logging
 
 from django.contrib.gis.db.models import Union
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
 from project.models.project_base import ProjectCommune
@@ -24,6 +25,7 @@ class Command(BaseCommand):
         self.update_epci()
         self.update_commune()
         self.delete_commune()
+        call_command("build_simplified_geometries")
 
     def update_region(self):
         region_list = Cerema.objects.all().values("region_id", "region_name").annotate(geom=Union("mpoly"))
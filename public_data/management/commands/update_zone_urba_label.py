@@ -0,0 +1,20 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from public_data.data_version import bump_data_version
+from public_data.management.commands.load_gpu import ZoneUrbaFrance
+from public_data.tile_cache import invalidate_zone_urba_tiles
+
+logger = logging.getLogger("management.commands")
+
+
+class Command(BaseCommand):
+    help = "Evaluate validity and label position of zones urba not evaluated yet"
+
+    def handle(self, *args, **options):
+        logger.info("Start evaluation of zone urba validity and label position")
+        ZoneUrbaFrance.calculate_label_center()
+        bump_data_version()
+        invalidate_zone_urba_tiles()
+        logger.info("End evaluation of zone urba validity and label position")
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2024-07-10 10:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("public_data", "0187_auto_20240703_1704"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimplifiedGeometry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "land_type",
+                    models.CharField(
+                        choices=[
+                            ("COMM", "Commune"),
+                            ("EPCI", "EPCI"),
+                            ("DEPART", "Département"),
+                            ("SCOT", "SCoT"),
+                            ("REGION", "Région"),
+                            ("COMP", "Composite"),
+                        ],
+                        max_length=7,
+                        verbose_name="Type de territoire",
+                    ),
+                ),
+                ("land_id", models.IntegerField(verbose_name="Identifiant du territoire")),
+                ("max_zoom", models.IntegerField(verbose_name="Zoom maximum d'utilisation")),
+                ("mpoly", django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+            ],
+            options={
+                "verbose_name": "Géométrie simplifiée",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="simplifiedgeometry",
+            constraint=models.UniqueConstraint(
+                fields=("land_type", "max_zoom", "land_id"), name="unique_simplified_geometry"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.13 on 2024-07-12 09:40
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("public_data", "0188_simplifiedgeometry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="zoneurba",
+            name="is_valid",
+            field=models.BooleanField(blank=True, null=True, verbose_name="Géométrie valide"),
+        ),
+        migrations.AddField(
+            model_name="zoneurba",
+            name="label_center",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True, null=True, srid=4326, verbose_name="Position de l'étiquette"
+            ),
+        ),
+    ]
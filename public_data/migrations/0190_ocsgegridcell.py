@@ -0,0 +1,69 @@
+# Generated by Django 4.2.13 on 2024-07-15 14:05
+
+import django.contrib.gis.db.models.fields
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("public_data", "0189_zoneurba_is_valid_label_center"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OcsgeGridCell",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("departement", models.CharField(max_length=15, verbose_name="Département")),
+                ("cell_size", models.IntegerField(verbose_name="Taille de la cellule (m)")),
+                (
+                    "year_old",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MinValueValidator(2000),
+                            django.core.validators.MaxValueValidator(2050),
+                        ],
+                        verbose_name="Ancienne année",
+                    ),
+                ),
+                (
+                    "year_new",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MinValueValidator(2000),
+                            django.core.validators.MaxValueValidator(2050),
+                        ],
+                        verbose_name="Nouvelle année",
+                    ),
+                ),
+                (
+                    "new_artif",
+                    models.DecimalField(
+                        decimal_places=4, max_digits=15, verbose_name="Nouvelle artificialisation (ha)"
+                    ),
+                ),
+                (
+                    "new_natural",
+                    models.DecimalField(decimal_places=4, max_digits=15, verbose_name="Nouvelle naturalisation (ha)"),
+                ),
+                (
+                    "artificial_surface",
+                    models.DecimalField(
+                        decimal_places=4,
+                        max_digits=15,
+                        verbose_name="Surface artificielle de la nouvelle année (ha)",
+                    ),
+                ),
+                ("mpoly", django.contrib.gis.db.models.fields.PolygonField(srid=4326)),
+            ],
+            options={
+                "verbose_name": "OCSGE - Grille d'artificialisation",
+                "verbose_name_plural": "OCSGE - Grille d'artificialisation",
+                "indexes": [
+                    models.Index(fields=["cell_size", "year_old", "year_new"], name="public_data_cell_si_b3252d_idx"),
+                    models.Index(fields=["departement"], name="public_data_departe_d557f3_idx"),
+                ],
+            },
+        ),
+    ]
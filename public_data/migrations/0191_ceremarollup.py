@@ -0,0 +1,36 @@
+# Generated by Django 4.2.13 on 2024-07-17 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("public_data", "0190_ocsgegridcell"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CeremaRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("land_type", models.CharField(max_length=7, verbose_name="Type de territoire")),
+                ("land_id", models.IntegerField(verbose_name="Identifiant du territoire")),
+                ("year", models.IntegerField(verbose_name="Année")),
+                ("naf", models.FloatField(default=0, verbose_name="Consommation totale (m²)")),
+                ("act", models.FloatField(default=0, verbose_name="Consommation activité (m²)")),
+                ("hab", models.FloatField(default=0, verbose_name="Consommation habitat (m²)")),
+                ("mix", models.FloatField(default=0, verbose_name="Consommation mixte (m²)")),
+                ("rou", models.FloatField(default=0, verbose_name="Consommation route (m²)")),
+                ("fer", models.FloatField(default=0, verbose_name="Consommation ferrée (m²)")),
+                ("inc", models.FloatField(default=0, verbose_name="Consommation inconnue (m²)")),
+            ],
+            options={
+                "verbose_name": "Données du cerema agrégées par territoire",
+                "verbose_name_plural": "Données du cerema agrégées par territoire",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="ceremarollup",
+            constraint=models.UniqueConstraint(fields=("land_type", "land_id", "year"), name="unique_cerema_rollup"),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.13 on 2024-07-22 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("public_data", "0191_ceremarollup"),
+    ]
+
+    operations = [
+        # cells were stored per departement, they are rebuilt with build_ocsge_grid
+        migrations.RunSQL("DELETE FROM public_data_ocsgegridcell", migrations.RunSQL.noop),
+        migrations.RemoveIndex(
+            model_name="ocsgegridcell",
+            name="public_data_departe_d557f3_idx",
+        ),
+        migrations.RemoveField(
+            model_name="ocsgegridcell",
+            name="departement",
+        ),
+        migrations.AddField(
+            model_name="ocsgegridcell",
+            name="srid_source",
+            field=models.IntegerField(
+                choices=[
+                    (2154, "France Métropolitaine et Corse"),
+                    (32620, "Guadeloupe et Martinique"),
+                    (2972, "Guyane Française"),
+                    (2975, "La réunion"),
+                    (4326, "Monde (GPS)"),
+                    (3857, "Monde (Google Maps, OpenStreetMap etc.)"),
+                ],
+                default=2154,
+                verbose_name="SRID",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="ocsgegridcell",
+            name="i",
+            field=models.IntegerField(default=0, verbose_name="Colonne de la cellule"),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="ocsgegridcell",
+            name="j",
+            field=models.IntegerField(default=0, verbose_name="Ligne de la cellule"),
+            preserve_default=False,
+        ),
+        migrations.AddConstraint(
+            model_name="ocsgegridcell",
+            constraint=models.UniqueConstraint(
+                fields=("cell_size", "year_old", "year_new", "srid_source", "i", "j"),
+                name="unique_ocsge_grid_cell",
+            ),
+        ),
+    ]
@@ -1,8 +1,15 @@
 from .administration import *  # noqa: F401, F403
+from .cerema import CeremaRollup  # noqa: F401
 from .couverture_usage import *  # noqa: F401, F403
 from .data_source import *  # noqa: F401, F403
 from .deprecated import *  # noqa: F401, F403
 from .gpu import *  # noqa: F401, F403
 from .mixins import *  # noqa: F401, F403
-from .ocsge import ArtificialArea, Ocsge, OcsgeDiff, ZoneConstruite  # noqa: F401, F403
+from .ocsge import (  # noqa: F401, F403
+    ArtificialArea,
+    Ocsge,
+    OcsgeDiff,
+    OcsgeGridCell,
+    ZoneConstruite,
+)
 from .sudocuh import Sudocuh, SudocuhEpci  # noqa: F401
@@ -1,5 +1,7 @@
 from django.contrib.gis.db import models
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import IntegerField
+from django.db.models.functions import Cast
 
 from public_data.models.cerema import Cerema
 from public_data.models.enums import SRID
@@ -7,6 +9,7 @@ from public_data.models.mixins import DataColorationMixin
 from utils.db import IntersectManager
 
 from .AdminRef import AdminRef
+from .Departement import Departement
 from .GetDataFromCeremaMixin import GetDataFromCeremaMixin
 from .LandMixin import LandMixin
 
@@ -70,11 +73,14 @@ class Commune(DataColorationMixin, LandMixin, GetDataFromCeremaMixin, models.Mod
     def get_qs_cerema(self):
         return Cerema.objects.filter(city_insee=self.insee)
 
+    def get_cube_rows(self, cube):
+        return cube.get_rows([self.insee])
+
     def __str__(self):
         return f"{self.name} ({self.insee})"
 
     def get_ocsge_millesimes(self) -> set:
-        return self.departement.ocsge_millesimes
+        return Departement.get_cached_ocsge_millesimes().get(self.departement_id)
 
     def get_cities(self):
         return Commune.objects.filter(id=self.id).all()
@@ -100,8 +106,10 @@ class Commune(DataColorationMixin, LandMixin, GetDataFromCeremaMixin, models.Mod
         return qs
 
     @classmethod
-    def get_property_data(cls, property_name=None):
-        qs = cls.objects.all()
-        qs = qs.values_list(property_name, flat=True)
-        qs = qs.order_by(property_name)
-        return [(int(x),) for x in qs if x.isdigit()]
+    def get_property_queryset(cls, property_name, filters=None):
+        """Text properties (insee) are cast to integer, Corse communes (2A, 2B) are skipped."""
+        if not isinstance(cls._meta.get_field(property_name), models.CharField):
+            return super().get_property_queryset(property_name, filters=filters)
+        qs = cls.objects.filter(**(filters or {}))
+        qs = qs.filter(**{f"{property_name}__regex": r"^\d+$"})
+        return qs.annotate(value=Cast(property_name, IntegerField())).values("value")
@@ -3,6 +3,7 @@ from django.contrib.postgres.fields import ArrayField
 
 from public_data.models.cerema import Cerema
 from public_data.models.enums import SRID
+from public_data.referentials import get_referential
 from utils.db import IntersectManager
 
 from .AdminRef import AdminRef
@@ -30,6 +31,7 @@ class Departement(LandMixin, GetDataFromCeremaMixin, models.Model):
 
     land_type = AdminRef.DEPARTEMENT
     default_analysis_level = AdminRef.SCOT
+    has_conso_rollups = True
 
     @property
     def official_id(self) -> str:
@@ -38,9 +40,20 @@ class Departement(LandMixin, GetDataFromCeremaMixin, models.Model):
     def get_qs_cerema(self):
         return Cerema.objects.filter(dept_id=self.source_id)
 
+    def get_cube_rows(self, cube):
+        return cube.get_rows_by("dept_id", self.source_id)
+
     def get_cities(self):
         return self.commune_set.all()
 
+    @classmethod
+    def get_cached_ocsge_millesimes(cls) -> dict:
+        """Return {departement id: OCS GE millésimes or None}, from the referential cache."""
+        return get_referential(
+            "departement_ocsge_millesimes",
+            lambda: dict(cls.objects.values_list("id", "ocsge_millesimes")),
+        )
+
     def __str__(self):
         return f"{self.source_id} - {self.name}"
 
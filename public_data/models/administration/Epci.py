@@ -5,6 +5,7 @@ from public_data.models.enums import SRID
 from utils.db import IntersectManager
 
 from .AdminRef import AdminRef
+from .Departement import Departement
 from .GetDataFromCeremaMixin import GetDataFromCeremaMixin
 from .LandMixin import LandMixin
 
@@ -27,6 +28,7 @@ class Epci(LandMixin, GetDataFromCeremaMixin, models.Model):
 
     land_type = AdminRef.EPCI
     default_analysis_level = AdminRef.COMMUNE
+    has_conso_rollups = True
 
     @property
     def official_id(self) -> str:
@@ -34,8 +36,9 @@ class Epci(LandMixin, GetDataFromCeremaMixin, models.Model):
 
     def get_ocsge_millesimes(self) -> set:
         millesimes = set()
-        for dept in self.departements.all():
-            millesimes.update(dept.ocsge_millesimes)
+        cached_millesimes = Departement.get_cached_ocsge_millesimes()
+        for dept_id in self.departements.values_list("id", flat=True):
+            millesimes.update(cached_millesimes.get(dept_id) or [])
         return millesimes
 
     @property
@@ -48,6 +51,9 @@ class Epci(LandMixin, GetDataFromCeremaMixin, models.Model):
     def get_qs_cerema(self):
         return apps.get_model("public_data.Cerema").objects.filter(epci_id=self.source_id)
 
+    def get_cube_rows(self, cube):
+        return cube.get_rows_by("epci_id", self.source_id)
+
     def get_cities(self):
         return self.commune_set.all()
 
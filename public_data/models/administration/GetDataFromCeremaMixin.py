@@ -1,14 +1,39 @@
 from django.db.models import Sum
 
-from public_data.models.cerema import Cerema
+from public_data.consommation_cube import ConsommationCube, get_consommation_cube
+from public_data.models.cerema import Cerema, CeremaRollup
 
 
 class GetDataFromCeremaMixin:
+    # set to True by lands aggregated in CeremaRollup
+    has_conso_rollups = False
+
     def get_qs_cerema(self):
         raise NotImplementedError("Need to be specified in child")
 
+    def get_cube_rows(self, cube: ConsommationCube):
+        """Return the rows of the communes of the land in the consommation cube."""
+        return cube.get_rows(self.get_qs_cerema().values_list("city_insee", flat=True))
+
+    def get_conso_rollups(self, start="2010", end="2020"):
+        """Return the CeremaRollup of the land between 2 years included, None if
+        the land isn't aggregated or the rollups are not built."""
+        if not self.has_conso_rollups:
+            return None
+        rollups = list(CeremaRollup.get_land_rollups(self.land_type, self.id, start, end))
+        if len(rollups) != int(end) - int(start) + 1:
+            return None
+        return rollups
+
     def get_conso_per_year(self, start="2010", end="2020", coef=1):
         """Return Cerema data for the city, transposed and named after year"""
+        rollups = self.get_conso_rollups(start, end)
+        if rollups is not None:
+            return {str(rollup.year): rollup.naf / 10000 * float(coef) for rollup in rollups}
+        cube = get_consommation_cube()
+        if cube is not None:
+            conso = cube.sum_per_year(self.get_cube_rows(cube), start, end)
+            return {year: val / 10000 * float(coef) for year, val in conso.items()}
         fields = Cerema.get_art_field(start, end)
         qs = self.get_qs_cerema()
         args = (Sum(field) for field in fields)
@@ -1,13 +1,18 @@
-from typing import Dict
+import collections
+from typing import Dict, Iterable, List, Literal, Tuple
 
 from django.contrib.gis.db import models
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.db.models import Q, Sum
 from django.db.models.query import QuerySet
 
 from public_data.exceptions import LandException
+from public_data.models.cerema import Cerema, CeremaRollup
 
 from .AdminRef import AdminRef
 from .Commune import Commune
+from .CommunePop import CommunePop
 from .Departement import Departement
 from .Epci import Epci
 from .Region import Region
@@ -27,26 +32,50 @@ class Land:
             AdminRef.REGION: Region,
         }
 
+    # field of Commune giving the land a commune belongs to
+    MEMBERSHIP = {
+        AdminRef.COMMUNE: "id",
+        AdminRef.EPCI: "epci_id",
+        AdminRef.SCOT: "scot_id",
+        AdminRef.DEPARTEMENT: "departement_id",
+        AdminRef.REGION: "departement__region_id",
+    }
+
     def __init__(self, public_key):
         self.public_key = public_key
         self.land_type: str
         self.id: str
         self.land: Commune | Epci | Scot | Departement | Region
 
+        self.land_type, self.id = self.parse_public_key(public_key)
+        klass = self.get_land_class(self.land_type)
+        try:
+            self.land = klass.objects.get(pk=int(self.id))
+        except ObjectDoesNotExist as e:
+            raise LandException(f"Public key '{self.id}' unknown") from e
+
+    @classmethod
+    def parse_public_key(cls, public_key: str) -> Tuple[str, str]:
+        """Return (land_type, id) of a public key, raise LandException if it is not valid."""
         try:
-            self.land_type, self.id = public_key.strip().split("_")
+            land_type, land_id = public_key.strip().split("_")
         except ValueError as e:
             raise LandException("Clé du territoire mal formatée", e)
-        if not self.id.isdigit():
+        if not land_id.isdigit():
             raise LandException("ID n'est pas un entier correcte.")
-        try:
-            klass = self.get_land_class(self.land_type)
-        except KeyError:
+        if land_type.upper() not in cls.Meta.subclasses:
             raise LandException("Territoire inconnu.")
-        try:
-            self.land = klass.objects.get(pk=int(self.id))
-        except ObjectDoesNotExist as e:
-            raise LandException(f"Public key '{self.id}' unknown") from e
+        return land_type, land_id
+
+    @classmethod
+    def from_instance(cls, instance: "Commune | Epci | Scot | Departement | Region") -> "Land":
+        """Wrap an already fetched land, without querying the database."""
+        land = cls.__new__(cls)
+        land.public_key = instance.public_key
+        land.land_type = instance.land_type
+        land.id = str(instance.id)
+        land.land = instance
+        return land
 
     def get_conso_per_year(self, start="2010", end="2020", coef=1):
         return self.land.get_conso_per_year(start, end, coef)
@@ -77,11 +106,156 @@ class Land:
     def official_id(self) -> str:
         return self.land.official_id
 
+    @classmethod
+    def resolve(cls, public_keys: Iterable[str]) -> Tuple[List["Land"], List[str]]:
+        """Return the lands of the public keys with one query per land type, and the
+        list of the public keys not valid or unknown."""
+        lands = dict()
+        invalid_keys = list()
+        ids_per_type = collections.defaultdict(dict)
+        for public_key in public_keys:
+            try:
+                land_type, land_id = cls.parse_public_key(public_key)
+            except LandException:
+                invalid_keys.append(public_key)
+                continue
+            ids_per_type[land_type][int(land_id)] = public_key
+        for land_type, ids in ids_per_type.items():
+            for instance in cls.get_land_class(land_type).objects.filter(pk__in=ids.keys()):
+                land = cls.from_instance(instance)
+                land.public_key = ids[instance.id]
+                lands[land.public_key] = land
+            invalid_keys += [public_key for public_key in ids.values() if public_key not in lands]
+        return [lands[key] for key in public_keys if key in lands], invalid_keys
+
     @classmethod
     def get_lands(cls, public_keys):
         if not isinstance(public_keys, list):
             public_keys = [public_keys]
-        return [Land(pk) for pk in public_keys]
+        lands, invalid_keys = cls.resolve(public_keys)
+        if invalid_keys:
+            raise LandException(f"Public key '{invalid_keys[0]}' unknown")
+        return lands
+
+    @classmethod
+    def group_by_type(cls, lands: Iterable) -> Dict[str, Dict[int, str]]:
+        """Return {land_type: {land id: public key}} of lands (Land or Commune, Epci...)."""
+        groups = collections.defaultdict(dict)
+        for land in lands:
+            instance = getattr(land, "land", land)
+            groups[instance.land_type][instance.id] = land.public_key
+        return groups
+
+    @classmethod
+    def get_surface_by_lands(cls, lands: Iterable) -> Dict[str, float]:
+        """Return {public key: sum of the area of its communes}, one query per land type."""
+        surfaces = dict()
+        for land_type, ids in cls.group_by_type(lands).items():
+            field = cls.MEMBERSHIP[land_type]
+            qs = Commune.objects.filter(**{f"{field}__in": ids.keys()}).values(field).annotate(total=Sum("area"))
+            surfaces |= {ids[row[field]]: float(row["total"] or 0) for row in qs}
+        return surfaces
+
+    @classmethod
+    def get_conso_by_lands(cls, lands: Iterable, start, end) -> Dict[str, Dict[int, Dict[str, float]]]:
+        """Return the consumption in m² of several lands:
+        {public key: {2015: {"total": 10, "hab": 5, "act": 3, ...}}}
+
+        Lands aggregated in CeremaRollup are read with one query, the others with one
+        Cerema aggregate per land type grouped by land through the communes membership.
+        """
+        lands = list(lands)
+        start, end = int(start), int(end)
+        years = range(start, end + 1)
+        fields = ["naf"] + CeremaRollup.DETERMINANTS
+        results = dict()
+
+        groups = cls.group_by_type(lands)
+        rollup_filter = Q()
+        for land_type, ids in groups.items():
+            if getattr(cls.get_land_class(land_type), "has_conso_rollups", False):
+                rollup_filter |= Q(land_type=land_type, land_id__in=ids.keys())
+        if rollup_filter:
+            rollups = collections.defaultdict(dict)
+            qs = CeremaRollup.objects.filter(rollup_filter, year__gte=start, year__lte=end)
+            for row in qs.values("land_type", "land_id", "year", *fields):
+                public_key = groups[row["land_type"]][row["land_id"]]
+                rollups[public_key][row["year"]] = {
+                    ("total" if field == "naf" else field): row[field] for field in fields
+                }
+            # a land without a complete period is computed from Cerema
+            results |= {key: conso for key, conso in rollups.items() if len(conso) == len(years)}
+
+        for land_type, ids in groups.items():
+            missing = {land_id: key for land_id, key in ids.items() if key not in results}
+            if missing:
+                results |= cls.get_cerema_conso_by_lands(land_type, missing, years)
+        return results
+
+    @classmethod
+    def get_cerema_conso_by_lands(
+        cls, land_type: str, ids: Dict[int, str], years: range
+    ) -> Dict[str, Dict[int, Dict[str, float]]]:
+        """Aggregate Cerema per land of a land type in one query (see get_conso_by_lands)."""
+        columns = []
+        for year in years:
+            start, end = f"{year - 2000:0>2}", f"{year + 1 - 2000:0>2}"
+            columns.append((year, "total", f"naf{start}art{end}"))
+            columns += [(year, det, f"art{start}{det}{end}") for det in CeremaRollup.DETERMINANTS]
+        if land_type == AdminRef.REGION:
+            land_column = "d.region_id"
+        else:
+            land_column = f"m.{cls.MEMBERSHIP[land_type]}"
+        sums = ", ".join(f"COALESCE(SUM(c.{field}), 0)" for _, _, field in columns)
+        query = f"""
+            SELECT {land_column}, {sums}
+            FROM {Commune._meta.db_table} m
+            INNER JOIN {Departement._meta.db_table} d ON d.id = m.departement_id
+            INNER JOIN {Cerema._meta.db_table} c ON c.city_insee = m.insee
+            WHERE {land_column} = ANY(%s)
+            GROUP BY {land_column}
+        """
+        results = {public_key: {year: {} for year in years} for public_key in ids.values()}
+        with connection.cursor() as cursor:
+            cursor.execute(query, [list(ids.keys())])
+            for land_id, *values in cursor.fetchall():
+                conso = results[ids[land_id]]
+                for (year, det, _), value in zip(columns, values):
+                    conso[year][det] = value
+        # lands without Cerema data have no consumption
+        for conso in results.values():
+            for year in years:
+                if not conso[year]:
+                    conso[year] = {det: 0 for det in ["total"] + CeremaRollup.DETERMINANTS}
+        return results
+
+    @classmethod
+    def get_pop_change_by_lands(
+        cls,
+        lands: Iterable,
+        start: str = "2010",
+        end: str = "2020",
+        criteria: Literal["pop", "household"] = "pop",
+    ) -> Dict[str, Dict[str, int | None]]:
+        """Return the result of get_pop_change_per_year for several lands, one query per land type."""
+        field = "pop_change" if criteria == "pop" else "household_change"
+        data = collections.defaultdict(dict)
+        groups = cls.group_by_type(lands)
+        for land_type, ids in groups.items():
+            membership = f"city__{cls.MEMBERSHIP[land_type]}"
+            qs = (
+                CommunePop.objects.filter(**{f"{membership}__in": ids.keys()})
+                .filter(year__gte=start, year__lte=end)
+                .values(membership, "year")
+                .annotate(progression=Sum(field))
+            )
+            for row in qs:
+                data[ids[row[membership]]][row["year"]] = row["progression"]
+        return {
+            public_key: {str(year): data[public_key].get(year, None) for year in range(int(start), int(end) + 1)}
+            for ids in groups.values()
+            for public_key in ids.values()
+        }
 
     @classmethod
     def get_land_class(cls, land_type):
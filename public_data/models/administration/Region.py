@@ -6,6 +6,7 @@ from public_data.models.enums import SRID
 from utils.db import IntersectManager
 
 from .AdminRef import AdminRef
+from .Departement import Departement
 from .GetDataFromCeremaMixin import GetDataFromCeremaMixin
 from .LandMixin import LandMixin
 
@@ -27,6 +28,7 @@ class Region(LandMixin, GetDataFromCeremaMixin, models.Model):
 
     land_type = AdminRef.REGION
     default_analysis_level = AdminRef.DEPARTEMENT
+    has_conso_rollups = True
 
     @property
     def official_id(self) -> str:
@@ -34,8 +36,9 @@ class Region(LandMixin, GetDataFromCeremaMixin, models.Model):
 
     def get_ocsge_millesimes(self) -> set:
         millesimes = set()
-        for dept in self.departement_set.all():
-            millesimes.update(dept.ocsge_millesimes)
+        cached_millesimes = Departement.get_cached_ocsge_millesimes()
+        for dept_id in self.departement_set.values_list("id", flat=True):
+            millesimes.update(cached_millesimes.get(dept_id) or [])
         return millesimes
 
     @classmethod
@@ -56,6 +59,9 @@ class Region(LandMixin, GetDataFromCeremaMixin, models.Model):
     def get_qs_cerema(self):
         return Cerema.objects.filter(region_id=self.source_id)
 
+    def get_cube_rows(self, cube):
+        return cube.get_rows_by("region_id", self.source_id)
+
     def get_cities(self):
         return apps.get_model("public_data.Commune").objects.filter(departement__region=self)
 
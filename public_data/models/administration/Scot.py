@@ -26,6 +26,7 @@ class Scot(LandMixin, GetDataFromCeremaMixin, models.Model):
 
     land_type = AdminRef.SCOT
     default_analysis_level = AdminRef.EPCI
+    has_conso_rollups = True
 
     @property
     def official_id(self) -> str:
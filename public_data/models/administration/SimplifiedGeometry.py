@@ -0,0 +1,133 @@
+from typing import Optional
+
+from django.contrib.gis.db import models
+from django.db import connection
+from django.db.models import F, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from .AdminRef import AdminRef
+
+# Queries of SimplifiedGeometry.build, formatted with the tables names
+COVERAGE_SIMPLIFY_QUERY = """
+    INSERT INTO {table} (land_type, land_id, max_zoom, mpoly)
+    SELECT %(land_type)s, id, %(max_zoom)s, ST_Multi(ST_CollectionExtract(simple_mpoly, 3))
+    FROM (
+        SELECT id, ST_CoverageSimplify(mpoly, %(tolerance)s) OVER () AS simple_mpoly
+        FROM {land_table}
+        WHERE mpoly IS NOT NULL
+    ) AS simplified
+    WHERE NOT ST_IsEmpty(simple_mpoly)
+"""
+
+EDGES_SIMPLIFY_QUERY = """
+    INSERT INTO {table} (land_type, land_id, max_zoom, mpoly)
+    WITH edges AS (
+        SELECT (ST_Dump(ST_LineMerge(ST_Union(ST_Boundary(mpoly))))).geom AS geom
+        FROM {land_table}
+        WHERE mpoly IS NOT NULL
+    ),
+    faces AS (
+        SELECT (ST_Dump(ST_Polygonize(ST_SimplifyPreserveTopology(geom, %(tolerance)s)))).geom AS geom
+        FROM edges
+    )
+    SELECT %(land_type)s, land.id, %(max_zoom)s, ST_Multi(ST_CollectionExtract(ST_Union(faces.geom), 3))
+    FROM faces
+    INNER JOIN {land_table} AS land ON ST_Intersects(land.mpoly, ST_PointOnSurface(faces.geom))
+    GROUP BY land.id
+"""
+
+MISSING_QUERY = """
+    INSERT INTO {table} (land_type, land_id, max_zoom, mpoly)
+    SELECT %(land_type)s, land.id, %(max_zoom)s, ST_Multi(ST_SimplifyPreserveTopology(land.mpoly, %(tolerance)s))
+    FROM {land_table} AS land
+    WHERE land.mpoly IS NOT NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM {table} AS simplified
+            WHERE simplified.land_type = %(land_type)s
+                AND simplified.max_zoom = %(max_zoom)s
+                AND simplified.land_id = land.id
+        )
+"""
+
+
+class SimplifiedGeometry(models.Model):
+    """Lighter geometries of administrative lands, used by maps at low zoom.
+
+    Borders shared by lands are simplified once, so neighbours have no gap nor
+    overlap, and no land vanishes. Geometries are built by build_simplified_geometries
+    command, called by the commands loading administrative lands.
+    """
+
+    # (max zoom where the geometry is used, tolerance in degree)
+    LEVELS = (
+        (7, 0.005),
+        (9, 0.001),
+        (11, 0.0002),
+    )
+
+    land_type = models.CharField("Type de territoire", max_length=7, choices=AdminRef.CHOICES)
+    land_id = models.IntegerField("Identifiant du territoire")
+    max_zoom = models.IntegerField("Zoom maximum d'utilisation")
+    mpoly = models.MultiPolygonField(srid=4326)
+
+    class Meta:
+        verbose_name = "Géométrie simplifiée"
+        constraints = [
+            models.UniqueConstraint(fields=["land_type", "max_zoom", "land_id"], name="unique_simplified_geometry")
+        ]
+
+    @classmethod
+    def get_max_zoom(cls, zoom: Optional[int]) -> Optional[int]:
+        """Return the level to use for a zoom, None if full resolution geometry is required."""
+        if zoom is None:
+            return None
+        for max_zoom, _ in cls.LEVELS:
+            if zoom <= max_zoom:
+                return max_zoom
+        return None
+
+    @classmethod
+    def annotate_simplified_mpoly(cls, queryset: QuerySet, zoom: Optional[int]) -> QuerySet:
+        """Add simple_mpoly to a land queryset, with the geometry adapted to the zoom."""
+        max_zoom = cls.get_max_zoom(zoom)
+        if max_zoom is None:
+            return queryset.annotate(simple_mpoly=F("mpoly"))
+        simplified = cls.objects.filter(
+            land_type=queryset.model.land_type,
+            land_id=OuterRef("pk"),
+            max_zoom=max_zoom,
+        )
+        return queryset.defer("mpoly").annotate(
+            simple_mpoly=Coalesce(Subquery(simplified.values("mpoly")[:1]), F("mpoly")),
+        )
+
+    @staticmethod
+    def has_coverage_simplify() -> bool:
+        """ST_CoverageSimplify is available from PostGIS 3.4 (with GEOS 3.12)."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regprocedure('st_coveragesimplify(geometry, float8, boolean)') IS NOT NULL")
+            return cursor.fetchone()[0]
+
+    @classmethod
+    def build(cls, land_model) -> int:
+        """(Re)build all levels of simplified geometries of a land model, return number of created rows.
+
+        Lands of a type share their borders, which are simplified once for all lands so
+        that no gap or overlap appears between neighbours: with ST_CoverageSimplify when
+        available, otherwise the borders are noded, simplified and polygonized, and each
+        face is given back to the land containing it. Lands lost in the process (smaller
+        than the tolerance) get their own simplified geometry.
+        """
+        created = 0
+        cls.objects.filter(land_type=land_model.land_type).delete()
+        query = COVERAGE_SIMPLIFY_QUERY if cls.has_coverage_simplify() else EDGES_SIMPLIFY_QUERY
+        with connection.cursor() as cursor:
+            for max_zoom, tolerance in cls.LEVELS:
+                params = {"land_type": land_model.land_type, "max_zoom": max_zoom, "tolerance": tolerance}
+                cursor.execute(query.format(table=cls._meta.db_table, land_table=land_model._meta.db_table), params)
+                created += cursor.rowcount
+                cursor.execute(
+                    MISSING_QUERY.format(table=cls._meta.db_table, land_table=land_model._meta.db_table), params
+                )
+                created += cursor.rowcount
+        return created
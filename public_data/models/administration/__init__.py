@@ -10,6 +10,7 @@ from .Land import Land
 from .LandMixin import LandMixin
 from .Region import Region
 from .Scot import Scot
+from .SimplifiedGeometry import SimplifiedGeometry
 
 __all__ = [
     "AdminRef",
@@ -24,4 +25,5 @@ __all__ = [
     "LandMixin",
     "Region",
     "Scot",
+    "SimplifiedGeometry",
 ]
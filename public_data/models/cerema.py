@@ -13,7 +13,9 @@ Données récupérées le 16/12/2021
 https://cerema.app.box.com/v/pnb-action7-indicateurs-ff/folder/149684581362
 La description précise des données est disponible dans un PDF dans lien ci-dessus
 """
+from django.apps import apps
 from django.contrib.gis.db import models
+from django.db import connection, transaction
 from django.db.models import F
 
 from public_data.models.enums import SRID
@@ -240,3 +242,95 @@ class Cerema(DataColorationMixin, models.Model):
         From : naf09art10 (year 2009) to naf19art20 (year 2020)
         """
         return [f"naf{y:0>2}art{y+1:0>2}" for y in range(9, 21 + 1)]
+
+
+class CeremaRollup(models.Model):
+    """Consumption of Cerema aggregated per year for each EPCI, SCoT, departement and
+    region, so the reports of those lands don't sum thousands of communes.
+
+    A row holds the consumption in m² of a land (land_type and id of the land) for a
+    year: naf is the total, other fields are the determinants. Rebuilt by
+    build_conso_rollups command (called by load_cerema and build_administrative_layers).
+    """
+
+    YEARS = range(2009, 2023)
+    DETERMINANTS = ["act", "hab", "mix", "rou", "fer", "inc"]
+
+    land_type = models.CharField("Type de territoire", max_length=7)
+    land_id = models.IntegerField("Identifiant du territoire")
+    year = models.IntegerField("Année")
+    naf = models.FloatField("Consommation totale (m²)", default=0)
+    act = models.FloatField("Consommation activité (m²)", default=0)
+    hab = models.FloatField("Consommation habitat (m²)", default=0)
+    mix = models.FloatField("Consommation mixte (m²)", default=0)
+    rou = models.FloatField("Consommation route (m²)", default=0)
+    fer = models.FloatField("Consommation ferrée (m²)", default=0)
+    inc = models.FloatField("Consommation inconnue (m²)", default=0)
+
+    class Meta:
+        verbose_name = "Données du cerema agrégées par territoire"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=["land_type", "land_id", "year"], name="unique_cerema_rollup"),
+        ]
+
+    @classmethod
+    def get_unpivot_sql(cls) -> str:
+        """Return a lateral VALUES turning the yearly columns of a Cerema row (alias c) into rows."""
+        rows = []
+        for year in cls.YEARS:
+            start, end = f"{year - 2000:0>2}", f"{year + 1 - 2000:0>2}"
+            fields = [f"c.naf{start}art{end}"] + [f"c.art{start}{det}{end}" for det in cls.DETERMINANTS]
+            rows.append(f"({year}, {', '.join(fields)})")
+        return f"CROSS JOIN LATERAL (VALUES {', '.join(rows)}) AS v(year, naf, {', '.join(cls.DETERMINANTS)})"
+
+    @classmethod
+    def get_land_joins(cls) -> dict:
+        """Return, per land type, the join giving the id of the land of a Cerema row (alias c)."""
+        from .administration import AdminRef
+
+        def table(name):
+            return apps.get_model("public_data", name)._meta.db_table
+
+        # same membership rules than get_qs_cerema of the lands
+        return {
+            AdminRef.EPCI: f"INNER JOIN {table('Epci')} l ON l.source_id = c.epci_id",
+            AdminRef.DEPARTEMENT: f"INNER JOIN {table('Departement')} l ON l.source_id = c.dept_id",
+            AdminRef.REGION: f"INNER JOIN {table('Region')} l ON l.source_id = c.region_id",
+            AdminRef.SCOT: (
+                f"INNER JOIN {table('Commune')} m ON m.insee = c.city_insee "
+                f"INNER JOIN {table('Scot')} l ON l.id = m.scot_id"
+            ),
+        }
+
+    @classmethod
+    def build(cls) -> int:
+        """Rebuild all the rollups in a transaction, return the number of rows created."""
+        fields = ["naf"] + cls.DETERMINANTS
+        sums = ", ".join(f"COALESCE(SUM(v.{field}), 0)" for field in fields)
+        created = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {cls._meta.db_table}")
+            for land_type, join in cls.get_land_joins().items():
+                cursor.execute(
+                    f"""
+                    INSERT INTO {cls._meta.db_table} (land_type, land_id, year, {", ".join(fields)})
+                    SELECT %s, l.id, v.year, {sums}
+                    FROM {Cerema._meta.db_table} c
+                    {join}
+                    {cls.get_unpivot_sql()}
+                    GROUP BY l.id, v.year
+                    """,
+                    [land_type],
+                )
+                created += cursor.rowcount
+        return created
+
+    @classmethod
+    def get_land_rollups(cls, land_type: str, land_id: int, start, end) -> models.QuerySet:
+        return cls.objects.filter(
+            land_type=land_type,
+            land_id=land_id,
+            year__gte=int(start),
+            year__lte=int(end),
+        ).order_by("year")
@@ -2,10 +2,10 @@
 Ce fichier contient les référentiels CouvertureSol et UsageSol qui sont les deux
 types d'analyse fournies par l'OCSGE.
 """
-from functools import cache
-
 from django.db import models
 
+from public_data.referentials import get_referential
+
 
 class BaseSol(models.Model):
     class Meta:
@@ -18,6 +18,33 @@ class BaseSol(models.Model):
     map_color = models.CharField("Couleur", max_length=8, blank=True, null=True)
     is_key = models.BooleanField("Est déterminant", default=False)
 
+    # codes of the most detailed level of the nomenclature
+    leaf_codes: list = []
+
+    @classmethod
+    def get_cached_by_code_prefix(cls) -> dict:
+        """Return {code_prefix: item} of the whole nomenclature, from the referential cache.
+        Items are shared by the process and must not be modified."""
+        return get_referential(
+            cls._meta.model_name,
+            lambda: {item.code_prefix: item for item in cls.objects.order_by("pk")},
+        )
+
+    @classmethod
+    def get_cached(cls) -> list:
+        return list(cls.get_cached_by_code_prefix().values())
+
+    @classmethod
+    def get_by_code_prefix(cls, code_prefix: str):
+        try:
+            return cls.get_cached_by_code_prefix()[code_prefix]
+        except KeyError as exc:
+            raise cls.DoesNotExist(f"{cls.__name__} {code_prefix} does not exist") from exc
+
+    @classmethod
+    def get_leafs(cls) -> list:
+        return [item for item in cls.get_cached() if item.code in cls.leaf_codes]
+
     def get_label_short(self):
         if not self.label_short:
             return self.label[:50]
@@ -93,36 +120,32 @@ class UsageSol(BaseSol):
         related_name="children",
     )
 
-    @classmethod
-    def get_usage_nomenclature(cls):
-        return cls.objects.all()
+    leaf_codes = [
+        "1.1",
+        "1.2",
+        "1.3",
+        "1.4",
+        "1.5",
+        "2",
+        "235",
+        "3",
+        "4.1.1",
+        "4.1.2",
+        "4.1.3",
+        "4.1.4",
+        "4.1.5",
+        "4.2",
+        "4.3",
+        "5",
+        "6.1",
+        "6.2",
+        "6.3",
+        "6.6",
+    ]
 
     @classmethod
-    def get_leafs(cls):
-        return cls.objects.filter(
-            code__in=[
-                "1.1",
-                "1.2",
-                "1.3",
-                "1.4",
-                "1.5",
-                "2",
-                "235",
-                "3",
-                "4.1.1",
-                "4.1.2",
-                "4.1.3",
-                "4.1.4",
-                "4.1.5",
-                "4.2",
-                "4.3",
-                "5",
-                "6.1",
-                "6.2",
-                "6.3",
-                "6.6",
-            ]
-        )
+    def get_usage_nomenclature(cls):
+        return cls.get_cached()
 
 
 class CouvertureSol(BaseSol):
@@ -135,30 +158,26 @@ class CouvertureSol(BaseSol):
         related_name="children",
     )
 
-    @classmethod
-    def get_couv_nomenclature(cls):
-        return cls.objects.all()
+    leaf_codes = [
+        "1.1.1.1",
+        "1.1.1.2",
+        "1.1.2.1",
+        "1.1.2.2",
+        "1.2.1",
+        "1.2.2",
+        "1.2.3",
+        "2.1.1.1",
+        "2.1.1.2",
+        "2.1.1.3",
+        "2.1.2",
+        "2.1.3",
+        "2.2.1",
+        "2.2.2",
+    ]
 
     @classmethod
-    def get_leafs(cls):
-        return cls.objects.filter(
-            code__in=[
-                "1.1.1.1",
-                "1.1.1.2",
-                "1.1.2.1",
-                "1.1.2.2",
-                "1.2.1",
-                "1.2.2",
-                "1.2.3",
-                "2.1.1.1",
-                "2.1.1.2",
-                "2.1.1.3",
-                "2.1.2",
-                "2.1.3",
-                "2.2.1",
-                "2.2.2",
-            ]
-        )
+    def get_couv_nomenclature(cls):
+        return cls.get_cached()
 
 
 class CouvertureUsageMatrix(models.Model):
@@ -212,8 +231,12 @@ class CouvertureUsageMatrix(models.Model):
         return f"{cs}-{us}:{a}{c}{n}"
 
     @classmethod
-    @cache
     def matrix_dict(cls):
+        """Return {(couverture code_prefix, usage code_prefix): item}, from the referential cache."""
+        return get_referential("couvertureusagematrix", cls.build_matrix_dict)
+
+    @classmethod
+    def build_matrix_dict(cls):
         _matrix_dict = dict()
 
         for item in cls.objects.all().select_related("usage", "couverture"):
@@ -40,10 +40,13 @@ class ZoneUrba(models.Model):
     insee = models.CharField("insee", max_length=10, blank=True, null=True)
     area = models.DecimalField("area", max_digits=15, decimal_places=4, blank=True, null=True)
     typezone = models.CharField("typezone", max_length=3, blank=True, null=True)
+    is_valid = models.BooleanField("Géométrie valide", blank=True, null=True)
+    label_center = models.PointField("Position de l'étiquette", srid=4326, blank=True, null=True)
 
     objects = ZoneUrbaManager()
 
-    def get_color(self):
+    @staticmethod
+    def get_typezone_color(typezone: str) -> list[int]:
         transco = {
             "a": [255, 255, 0],
             "auc": [255, 101, 101],
@@ -51,7 +54,10 @@ class ZoneUrba(models.Model):
             "n": [86, 170, 2],
             "u": [230, 0, 0],
         }
-        return transco.get(self.typezone.lower(), [0, 0, 0])
+        return transco.get(typezone.lower(), [0, 0, 0])
+
+    def get_color(self):
+        return self.get_typezone_color(self.typezone)
 
     def __str__(self):
         return f"{self.insee} {self.typezone} {self.area}Ha"
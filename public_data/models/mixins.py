@@ -1,3 +1,4 @@
+import hashlib
 from logging import DEBUG, INFO, getLogger
 from os import getenv
 from pathlib import Path
@@ -5,12 +6,14 @@ from tempfile import TemporaryDirectory
 from typing import Dict
 from zipfile import ZipFile
 
-import numpy as np
 from colour import Color
 from django.contrib.gis.utils import LayerMapping
+from django.core.cache import cache
 from django.core.exceptions import FieldDoesNotExist
 from django.db import connection
+from django.db.models import F, QuerySet
 
+from public_data.data_version import get_data_version
 from public_data.models.enums import SRID
 from public_data.storages import DataStorage
 from utils.colors import get_onecolor_gradient, get_random_color, is_valid
@@ -19,6 +22,8 @@ logger = getLogger(__name__)
 
 LOCAL_FILE_DIRECTORY = getenv("LOCAL_FILE_DIRECTORY")
 
+PERCENTILE_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 class AutoLoadMixin:
     """
@@ -282,9 +287,9 @@ class DataColorationMixin:
     default_color: str = ""
 
     @classmethod
-    def get_gradient(cls, color_name=None, property_name=None):
+    def get_gradient(cls, color_name=None, property_name=None, filters=None):
         # get the numeric scale
-        percentiles = cls.get_percentile(property_name=property_name)
+        percentiles = cls.get_percentile(property_name=property_name, filters=filters) or []
 
         # evaluate how many steps there is in the scale to get same number of color
         nb_colors = len(percentiles) + 1
@@ -316,22 +321,26 @@ class DataColorationMixin:
             return get_random_color()
 
     @classmethod
-    def get_property_data(cls, property_name=None):
-        qs = cls.objects.all()
-        qs = qs.values_list(property_name)
-        qs = qs.order_by(property_name)
-        return list(qs)
+    def get_property_queryset(cls, property_name, filters=None) -> QuerySet:
+        """Return a queryset with the values of the property in a "value" column."""
+        qs = cls.objects.filter(**(filters or {}))
+        qs = qs.filter(**{f"{property_name}__isnull": False})
+        return qs.annotate(value=F(property_name)).values("value")
 
     @classmethod
-    def get_percentile(cls, property_name=None, percentiles=None):
+    def get_percentile(cls, property_name=None, percentiles=None, filters=None):
         """
         Return decile scale of the specified property
         Deciles are the 9 values that divide  distribution in 10 equal parts
 
+        Percentiles are computed by PostgreSQL (percentile_disc) and cached until the
+        data version changes.
+
         Args:
             property_name=self.default_property: a name of a field of the model
             if not provided, uses self.default_property
             percentiles=boundaries (between 0 - 100) to compute
+            filters=lookups to restrict the rows used (year, departement, mpoly__intersects...)
         """
         try:
             # will raise an exception if field does not exist or is None
@@ -343,11 +352,20 @@ class DataColorationMixin:
 
         if not percentiles:
             percentiles = range(10, 100, 10)
-        rows = cls.get_property_data(property_name=property_name)
-        if not rows:
-            return None
-        else:
-            return np.percentile(rows, percentiles, interpolation="lower")
+        fractions = [percentile / 100 for percentile in percentiles]
+
+        filters_key = sorted((key, str(value)) for key, value in (filters or {}).items())
+        digest = hashlib.md5(f"{fractions}{filters_key}".encode()).hexdigest()
+        cache_key = f"public_data/percentile/{cls.__name__}/{property_name}/{get_data_version()}/{digest}"
+        result = cache.get(cache_key)
+        if result is None:
+            sql, params = cls.get_property_queryset(property_name, filters).query.sql_with_params()
+            query = f"SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY q.value) FROM ({sql}) AS q"
+            with connection.cursor() as cursor:
+                cursor.execute(query, [fractions] + list(params))
+                result = cursor.fetchone()[0] or []
+            cache.set(cache_key, result, timeout=PERCENTILE_CACHE_TIMEOUT)
+        return result or None
 
 
 class TruncateTableMixin:
@@ -1,8 +1,10 @@
 from django.contrib.gis.db import models
 from django.contrib.gis.db.models.functions import Area, Intersection, MakeValid
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connection, transaction
 from django.db.models import Sum
 
+from public_data.models.administration import Departement
 from public_data.models.enums import SRID
 from public_data.models.mixins import DataColorationMixin, TruncateTableMixin
 from utils.db import DynamicSRIDTransform, IntersectManager
@@ -161,3 +163,158 @@ class ZoneConstruite(TruncateTableMixin, DataColorationMixin, models.Model):
             models.Index(fields=["year"]),
             models.Index(fields=["departement"]),
         ]
+
+
+class OcsgeGridCell(models.Model):
+    """Surfaces of OCS GE aggregated on square grids, displayed by maps at low zoom.
+
+    Cells are aligned on the projection of the departements (srid_source) and each
+    polygon is counted in the cell containing a point on its surface. A cell is
+    identified by its position (i, j) in the grid, so a cell on the border of two
+    departements is stored once with the polygons of both. Several cell sizes are
+    built, each one used up to a zoom level (see SIZES).
+    """
+
+    # (max zoom where the grid is used, cell size in meter)
+    SIZES = (
+        (7, 10000),
+        (9, 4000),
+        (11, 2000),
+        (14, 500),
+    )
+
+    cell_size = models.IntegerField("Taille de la cellule (m)")
+    year_old = models.IntegerField("Ancienne année", validators=[MinValueValidator(2000), MaxValueValidator(2050)])
+    year_new = models.IntegerField("Nouvelle année", validators=[MinValueValidator(2000), MaxValueValidator(2050)])
+    srid_source = models.IntegerField("SRID", choices=SRID.choices)
+    i = models.IntegerField("Colonne de la cellule")
+    j = models.IntegerField("Ligne de la cellule")
+    new_artif = models.DecimalField("Nouvelle artificialisation (ha)", max_digits=15, decimal_places=4)
+    new_natural = models.DecimalField("Nouvelle naturalisation (ha)", max_digits=15, decimal_places=4)
+    artificial_surface = models.DecimalField(
+        "Surface artificielle de la nouvelle année (ha)", max_digits=15, decimal_places=4
+    )
+    mpoly = models.PolygonField(srid=4326)
+
+    class Meta:
+        verbose_name = "OCSGE - Grille d'artificialisation"
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["cell_size", "year_old", "year_new"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cell_size", "year_old", "year_new", "srid_source", "i", "j"],
+                name="unique_ocsge_grid_cell",
+            ),
+        ]
+
+    @classmethod
+    def get_cell_size(cls, zoom: int) -> int:
+        for max_zoom, cell_size in cls.SIZES:
+            if zoom <= max_zoom:
+                return cell_size
+        return cls.SIZES[-1][1]
+
+    @classmethod
+    def build(cls, departement: str, year_old: int, year_new: int) -> int:
+        """(Re)build the cells covering a departement for a millesime pair, return the number of cells.
+
+        Cells are computed from the polygons of every departement, those covering the
+        border are then complete whichever departement is loaded last."""
+        bounds = f"""
+            WITH envelope AS (
+                SELECT srid_source, ST_Envelope(ST_Transform(mpoly, srid_source)) AS geom
+                FROM {Departement._meta.db_table}
+                WHERE source_id = %(departement)s
+            ), bounds AS (
+                SELECT
+                    srid_source,
+                    floor(ST_XMin(geom) / %(cell_size)s)::integer AS i_min,
+                    floor(ST_XMax(geom) / %(cell_size)s)::integer AS i_max,
+                    floor(ST_YMin(geom) / %(cell_size)s)::integer AS j_min,
+                    floor(ST_YMax(geom) / %(cell_size)s)::integer AS j_max,
+                    -- the margin covers the cells cut by the envelope and the reprojection
+                    ST_Transform(ST_Expand(geom, 2 * %(cell_size)s), 4326) AS search_area
+                FROM envelope
+            )
+        """
+        delete_query = f"""
+            {bounds}
+            DELETE FROM {cls._meta.db_table} AS cell
+            USING bounds
+            WHERE cell.cell_size = %(cell_size)s AND cell.year_old = %(year_old)s AND cell.year_new = %(year_new)s
+                AND cell.srid_source = bounds.srid_source
+                AND cell.i BETWEEN bounds.i_min AND bounds.i_max
+                AND cell.j BETWEEN bounds.j_min AND bounds.j_max
+        """
+        insert_query = f"""
+            {bounds}
+            INSERT INTO {cls._meta.db_table}
+                (cell_size, year_old, year_new, srid_source, i, j, new_artif, new_natural, artificial_surface, mpoly)
+            SELECT
+                %(cell_size)s, %(year_old)s, %(year_new)s, srid_source, i, j,
+                SUM(new_artif) / 10000, SUM(new_natural) / 10000, SUM(artificial_surface) / 10000,
+                ST_Transform(
+                    ST_MakeEnvelope(
+                        i * %(cell_size)s, j * %(cell_size)s, (i + 1) * %(cell_size)s, (j + 1) * %(cell_size)s,
+                        srid_source
+                    ),
+                    4326
+                )
+            FROM (
+                SELECT
+                    floor(ST_X(point) / %(cell_size)s)::integer AS i,
+                    floor(ST_Y(point) / %(cell_size)s)::integer AS j,
+                    srid_source, new_artif, new_natural, artificial_surface
+                FROM (
+                    SELECT
+                        ST_Transform(ST_PointOnSurface(diff.mpoly), bounds.srid_source) AS point,
+                        bounds.srid_source,
+                        CASE WHEN diff.is_new_artif THEN diff.surface ELSE 0 END AS new_artif,
+                        CASE WHEN diff.is_new_natural THEN diff.surface ELSE 0 END AS new_natural,
+                        0 AS artificial_surface
+                    FROM {OcsgeDiff._meta.db_table} AS diff, bounds
+                    WHERE diff.year_old = %(year_old)s AND diff.year_new = %(year_new)s
+                        AND (diff.is_new_artif OR diff.is_new_natural)
+                        AND diff.srid_source = bounds.srid_source
+                        AND diff.mpoly && bounds.search_area
+                    UNION ALL
+                    SELECT
+                        ST_Transform(ST_PointOnSurface(ocsge.mpoly), bounds.srid_source),
+                        bounds.srid_source, 0, 0, ocsge.surface
+                    FROM {Ocsge._meta.db_table} AS ocsge, bounds
+                    WHERE ocsge.year = %(year_new)s AND ocsge.is_artificial
+                        AND ocsge.srid_source = bounds.srid_source
+                        AND ocsge.mpoly && bounds.search_area
+                ) AS features
+            ) AS located, bounds
+            WHERE located.srid_source = bounds.srid_source
+                AND i BETWEEN bounds.i_min AND bounds.i_max
+                AND j BETWEEN bounds.j_min AND bounds.j_max
+            GROUP BY i, j, located.srid_source
+        """
+        created = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            for _, cell_size in cls.SIZES:
+                params = {
+                    "departement": departement,
+                    "cell_size": cell_size,
+                    "year_old": year_old,
+                    "year_new": year_new,
+                }
+                cursor.execute(delete_query, params)
+                cursor.execute(insert_query, params)
+                created += cursor.rowcount
+        return created
+
+    @classmethod
+    def build_departement(cls, departement: str) -> int:
+        """(Re)build the grids of all millesime pairs of a departement."""
+        pairs = (
+            OcsgeDiff.objects.filter(departement=departement)
+            .values_list("year_old", "year_new")
+            .order_by("year_old", "year_new")
+            .distinct()
+        )
+        return sum(cls.build(departement, year_old, year_new) for year_old, year_new in pairs)
@@ -0,0 +1,82 @@
+"""Small referential tables kept in the memory of every process.
+
+Nomenclatures (CouvertureSol, UsageSol, CouvertureUsageMatrix) and OCS GE
+millésimes of departements are read by almost every chart, report and task,
+but they only change when new data are loaded. They are cached in two tiers:
+* a process-local LRU, checked against the data version at most every
+  LOCAL_CHECK_INTERVAL seconds, so a lookup usually costs no network call,
+* Redis, with keys including the data version, shared by web and celery workers
+  so a new process does not query the database either.
+
+The local tier can be disabled with REFERENTIAL_LOCAL_CACHE setting (off in local
+environment, as the redis cache).
+
+Commands updating those tables call bump_data_version, which invalidates both
+tiers. Cached objects are shared within a process, callers must not modify them.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, TypeVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from public_data.data_version import get_data_version
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# seconds a local value is used without checking the data version
+LOCAL_CHECK_INTERVAL = 10
+LOCAL_MAX_SIZE = 32
+REDIS_TIMEOUT = 60 * 60 * 24
+
+# name => (data version, last check, value), most recently used last
+_local: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_cache_key(name: str, data_version: int) -> str:
+    return f"public_data/referential/{name}/v{data_version}"
+
+
+def _set_local(name: str, data_version: int, value) -> None:
+    with _lock:
+        _local[name] = (data_version, time.monotonic(), value)
+        _local.move_to_end(name)
+        while len(_local) > LOCAL_MAX_SIZE:
+            _local.popitem(last=False)
+
+
+def get_referential(name: str, loader: Callable[[], T]) -> T:
+    """Return the value of a referential, loader is called only when both tiers miss."""
+    entry = _local.get(name) if settings.REFERENTIAL_LOCAL_CACHE else None
+    if entry is not None and time.monotonic() - entry[1] < LOCAL_CHECK_INTERVAL:
+        return entry[2]
+
+    data_version = get_data_version()
+    if entry is not None and entry[0] == data_version:
+        _set_local(name, data_version, entry[2])
+        return entry[2]
+
+    cache_key = get_cache_key(name, data_version)
+    data = cache.get(cache_key)
+    if data is not None:
+        value = pickle.loads(data)
+    else:
+        value = loader()
+        cache.set(cache_key, pickle.dumps(value), timeout=REDIS_TIMEOUT)
+        logger.info("Referential %s loaded for data version %s", name, data_version)
+    if settings.REFERENTIAL_LOCAL_CACHE:
+        _set_local(name, data_version, value)
+    return value
+
+
+def clear_local() -> None:
+    """Empty the local tier, mainly for tests."""
+    with _lock:
+        _local.clear()
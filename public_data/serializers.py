@@ -4,6 +4,17 @@ from rest_framework_gis import serializers
 from public_data import models
 
 
+class SimplifiedGeometryMixin:
+    """Serialize the geometry adapted to the zoom when the queryset has been annotated
+    with SimplifiedGeometry.annotate_simplified_mpoly. Declare mpoly as follow:
+    mpoly = serializers.GeometrySerializerMethodField()
+    """
+
+    def get_mpoly(self, obj):
+        simple_mpoly = getattr(obj, "simple_mpoly", None)
+        return simple_mpoly if simple_mpoly is not None else obj.mpoly
+
+
 class OcsgeSerializer(serializers.GeoFeatureModelSerializer):
     class Meta:
         fields = (
@@ -7,3 +7,19 @@ class DataStorage(S3Boto3Storage):
 
     bucket_name = settings.AWS_STORAGE_BUCKET_NAME
     location = "data"
+
+
+class TileStorage(S3Boto3Storage):
+    """Enable access to tiles folder at root of the bucket, used by the tile cache."""
+
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+    location = "tiles"
+    file_overwrite = True
+
+
+class FlatGeobufStorage(S3Boto3Storage):
+    """Enable access to fgb folder at root of the bucket, used to cache big FlatGeobuf files."""
+
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+    location = "fgb"
+    file_overwrite = True
@@ -1,6 +1,7 @@
+from django.db.models import Sum
 from django.test import TestCase
 
-from public_data.models import Cerema
+from public_data.models import Cerema, CeremaRollup, Departement, Land, Region
 
 
 class TestCerema(TestCase):
@@ -58,3 +59,59 @@ class TestCerema(TestCase):
 
     def test_same_start_and_end(self):
         self.assertListEqual(Cerema.get_art_field(start=2014, end=2014), ["naf14art15"])
+
+    def test_rollup_unpivot_sql(self):
+        sql = CeremaRollup.get_unpivot_sql()
+        self.assertIn("(2009, c.naf09art10, c.art09act10, c.art09hab10", sql)
+        self.assertIn("(2022, c.naf22art23, c.art22act23", sql)
+        self.assertTrue(sql.endswith("AS v(year, naf, act, hab, mix, rou, fer, inc)"))
+
+
+class TestCeremaRollup(TestCase):
+    def setUp(self):
+        region = Region.objects.create(source_id="75", name="Nouvelle-Aquitaine", mpoly="MULTIPOLYGON EMPTY")
+        self.departement = Departement.objects.create(
+            source_id="33",
+            name="Gironde",
+            mpoly="MULTIPOLYGON EMPTY",
+            region=region,
+        )
+        for insee, naf, hab in [("33063", 1000, 600), ("33281", 250, None)]:
+            Cerema.objects.create(
+                city_insee=insee,
+                city_name=insee,
+                region_id="75",
+                region_name="Nouvelle-Aquitaine",
+                dept_id="33",
+                dept_name="Gironde",
+                epci_id="",
+                epci_name="",
+                naf15art16=naf,
+                art15hab16=hab,
+                naf16art17=naf * 2,
+                art16hab17=hab,
+                mpoly="MULTIPOLYGON EMPTY",
+            )
+        CeremaRollup.build()
+
+    def get_cerema_sum(self, field):
+        return Cerema.objects.filter(dept_id="33").aggregate(total=Sum(field))["total"] or 0
+
+    def test_conso_rollups_sum_cerema(self):
+        rollups = self.departement.get_conso_rollups("2015", "2016")
+        self.assertEqual([rollup.year for rollup in rollups], [2015, 2016])
+        self.assertEqual(rollups[0].naf, self.get_cerema_sum("naf15art16"))
+        self.assertEqual(rollups[0].hab, self.get_cerema_sum("art15hab16"))
+        self.assertEqual(rollups[1].naf, self.get_cerema_sum("naf16art17"))
+        self.assertEqual(rollups[1].act, 0)
+
+    def test_conso_by_lands_uses_rollups(self):
+        land = Land.from_instance(self.departement)
+        conso = Land.get_conso_by_lands([land], 2015, 2016)[land.public_key]
+        self.assertEqual(conso[2015]["total"], self.get_cerema_sum("naf15art16"))
+        self.assertEqual(conso[2015]["hab"], self.get_cerema_sum("art15hab16"))
+        self.assertEqual(conso[2016]["total"], self.get_cerema_sum("naf16art17"))
+
+    def test_conso_per_year_matches_cerema(self):
+        conso = self.departement.get_conso_per_year("2015", "2016")
+        self.assertEqual(conso, {"2015": 0.125, "2016": 0.25})
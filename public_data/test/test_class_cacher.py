@@ -0,0 +1,39 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from public_data.infra.VersionedClassCacher import VersionedClassCacher
+
+
+class TestVersionedClassCacher(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("test_class_cacher", {})
+        self.cacher = VersionedClassCacher(cache=self.cache, compress_min_size=100)
+        self.cacher._data_version = 1
+
+    def test_short_keys(self):
+        key = "-".join(str(i) for i in range(10000))
+        self.assertLess(len(self.cacher.get_cache_key(key)), 100)
+
+    def test_get_or_compute(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"big": "x" * 1000, "none": None}
+
+        first = self.cacher.get_or_compute("key", compute)
+        second = self.cacher.get_or_compute("key", compute)
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(self.cacher.exists("key"))
+
+    def test_cached_none(self):
+        self.assertIsNone(self.cacher.get_or_compute("none", lambda: None))
+        self.assertIsNone(self.cacher.get_or_compute("none", lambda: 1))
+
+    def test_data_version_namespace(self):
+        self.cacher.set("key", 1)
+        other_version = VersionedClassCacher(cache=self.cache)
+        other_version._data_version = 2
+        self.assertFalse(other_version.exists("key"))
+        self.assertIsNone(other_version.get("key"))
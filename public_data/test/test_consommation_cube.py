@@ -0,0 +1,46 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from public_data.consommation_cube import DETERMINANTS, LEVELS, YEARS, ConsommationCube
+
+
+class TestConsommationCube(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        directory = Path(self.tmp_dir.name)
+        values = np.zeros((3, len(YEARS), len(DETERMINANTS)))
+        # naf consumption of 2015: 100, 200 and 400 m²
+        values[:, YEARS.index(2015), 0] = [100, 200, 400]
+        np.save(directory / "values.npy", values)
+        labels = {
+            "city_insee": ["32001", "32002", "33001"],
+            "dept_name": ["Gers", "Gers", "Gironde"],
+        }
+        for level in LEVELS:
+            np.save(directory / f"{level}.npy", np.array(labels.get(level, ["", "", ""]), dtype=str))
+        meta = {"build_id": "1", "years": YEARS, "determinants": DETERMINANTS, "communes": 3}
+        (directory / "meta.json").write_text(json.dumps(meta))
+        self.cube = ConsommationCube(directory)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_rows(self):
+        self.assertEqual(list(self.cube.get_rows(["33001", "32001", "99999"])), [0, 2])
+
+    def test_sum_per_year(self):
+        rows = self.cube.get_rows(["32001", "32002"])
+        self.assertEqual(self.cube.sum_per_year(rows, 2014, 2015), {"2014": 0.0, "2015": 300.0})
+
+    def test_sum_per_year_by(self):
+        rows = self.cube.get_rows(["32001", "32002", "33001"])
+        result = self.cube.sum_per_year_by(rows, "dept_name", 2015, 2015)
+        self.assertEqual(result, {"Gers": {"2015": 300.0}, "Gironde": {"2015": 400.0}})
+
+    def test_unavailable_period(self):
+        with self.assertRaises(ValueError):
+            self.cube.get_year_slice(2005, 2015)
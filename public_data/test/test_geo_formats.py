@@ -0,0 +1,63 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import RequestFactory, TestCase
+
+from public_data.geo_formats import (
+    GEOARROW,
+    BinaryGeoFormatMixin,
+    StoredSource,
+    pa,
+    parse_range,
+    range_response,
+    store_flatgeobuf,
+)
+
+
+class TestRangeResponse(TestCase):
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        self.assertIsNone(parse_range("bytes=100-", 100))
+        self.assertIsNone(parse_range("bytes=-", 100))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+
+    def test_range_response(self):
+        data = bytes(range(100))
+        request = RequestFactory().get("/", HTTP_RANGE="bytes=10-19")
+        response = range_response(request, data, "application/flatgeobuf")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, data[10:20])
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+
+        response = range_response(RequestFactory().get("/"), data, "application/flatgeobuf")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_stored_source(self):
+        data = bytes(range(100))
+        with tempfile.TemporaryDirectory() as root:
+            storage = FileSystemStorage(location=root)
+            storage.save("1/old.fgb", ContentFile(b"old"))
+            store_flatgeobuf(storage, 2, "2/big.fgb", data)
+            # files of previous data versions are dropped
+            self.assertFalse(storage.exists("1/old.fgb"))
+
+            source = StoredSource(storage, "2/big.fgb")
+            request = RequestFactory().get("/", HTTP_RANGE="bytes=-10")
+            response = range_response(request, source, "application/flatgeobuf")
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.content, data[90:])
+
+            response = range_response(RequestFactory().get("/"), source, "application/flatgeobuf")
+            self.assertEqual(b"".join(response.streaming_content), data)
+            response.close()
+
+
+class TestBinaryGeoFormatMixin(TestCase):
+    def test_geoarrow_offered_with_pyarrow(self):
+        formats = [renderer.format for renderer in BinaryGeoFormatMixin.renderer_classes]
+        self.assertEqual(GEOARROW in formats, pa is not None)
@@ -0,0 +1,17 @@
+from django.test import SimpleTestCase
+
+from public_data.exceptions import LandException
+from public_data.models import Land
+
+
+class TestLand(SimpleTestCase):
+    def test_parse_public_key(self):
+        self.assertEqual(Land.parse_public_key("EPCI_12"), ("EPCI", "12"))
+        for public_key in ["EPCI12", "EPCI_abc", "PAYS_12"]:
+            with self.assertRaises(LandException):
+                Land.parse_public_key(public_key)
+
+    def test_resolve_invalid_keys(self):
+        lands, invalid_keys = Land.resolve(["EPCI12", "PAYS_12"])
+        self.assertEqual(lands, [])
+        self.assertEqual(invalid_keys, ["EPCI12", "PAYS_12"])
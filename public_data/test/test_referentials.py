@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from public_data import referentials
+from public_data.data_version import bump_data_version
+from public_data.models import CouvertureSol
+
+
+@override_settings(REFERENTIAL_LOCAL_CACHE=True)
+class TestReferentials(TestCase):
+    def setUp(self):
+        referentials.clear_local()
+
+    def tearDown(self):
+        referentials.clear_local()
+
+    def test_local_tier(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"CS1": "Sans végétation"}
+
+        self.assertEqual(referentials.get_referential("test", loader), {"CS1": "Sans végétation"})
+        self.assertEqual(referentials.get_referential("test", loader), {"CS1": "Sans végétation"})
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidated_by_data_version(self):
+        CouvertureSol.objects.create(code_prefix="CS1", code="1", label="Sans végétation")
+        self.assertEqual(CouvertureSol.get_by_code_prefix("CS1").label, "Sans végétation")
+        CouvertureSol.objects.filter(code_prefix="CS1").update(label="Nouveau libellé")
+        # local value is used until the next check of the data version
+        self.assertEqual(CouvertureSol.get_by_code_prefix("CS1").label, "Sans végétation")
+        bump_data_version()
+        with mock.patch.object(referentials, "LOCAL_CHECK_INTERVAL", 0):
+            self.assertEqual(CouvertureSol.get_by_code_prefix("CS1").label, "Nouveau libellé")
+        with self.assertRaises(CouvertureSol.DoesNotExist):
+            CouvertureSol.get_by_code_prefix("CS9")
@@ -0,0 +1,31 @@
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.test import TestCase
+
+from public_data.models import Region, SimplifiedGeometry
+
+
+def wavy_border() -> list:
+    """Points of a jagged vertical border at longitude 1, from south to north."""
+    return [(1 + (0.0005 if i % 2 else -0.0005), 44 + i * 0.01) for i in range(101)]
+
+
+class TestSimplifiedGeometry(TestCase):
+    def test_shared_borders_stay_shared(self):
+        border = wavy_border()
+        west = Polygon([(0, 44), *border, (0, 45), (0, 44)], srid=4326)
+        east = Polygon([(2, 44), (2, 45), *reversed(border), (2, 44)], srid=4326)
+        Region.objects.create(source_id="01", name="West", mpoly=MultiPolygon(west, srid=4326))
+        Region.objects.create(source_id="02", name="East", mpoly=MultiPolygon(east, srid=4326))
+
+        self.assertEqual(SimplifiedGeometry.build(Region), 2 * len(SimplifiedGeometry.LEVELS))
+
+        for max_zoom, _ in SimplifiedGeometry.LEVELS:
+            west_simple, east_simple = [
+                item.mpoly
+                for item in SimplifiedGeometry.objects.filter(land_type=Region.land_type, max_zoom=max_zoom).order_by(
+                    "land_id"
+                )
+            ]
+            # no overlap and no gap between the neighbours
+            self.assertAlmostEqual(west_simple.intersection(east_simple).area, 0)
+            self.assertAlmostEqual(west_simple.union(east_simple).area, west.union(east).area, places=4)
@@ -0,0 +1,31 @@
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from public_data.tile_cache import TileCache, get_tile_cache, invalidate_zone_urba_tiles
+
+
+class TestTileCache(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        get_tile_cache.cache_clear()
+
+    def tearDown(self):
+        get_tile_cache.cache_clear()
+        self.root.cleanup()
+
+    def test_invalidate_zone_urba_tiles(self):
+        with override_settings(TILE_CACHE_STORAGE="local", TILE_CACHE_ROOT=self.root.name):
+            tile_cache = get_tile_cache()
+            # zoom 10 tiles of Gironde and of Bas-Rhin
+            gironde = TileCache.get_key("zones_urbaines+type_zone-U", "all", 10, 510, 369)
+            bas_rhin = TileCache.get_key("zones_urbaines", "all", 10, 533, 353)
+            tile_cache.set(gironde, b"tile")
+            tile_cache.set(bas_rhin, b"tile")
+
+            self.assertEqual(invalidate_zone_urba_tiles((-1.3, 44.2, 0.3, 45.6)), 1)
+            self.assertIsNone(tile_cache.get(gironde))
+            self.assertEqual(tile_cache.get(bas_rhin), b"tile")
+
+            self.assertEqual(invalidate_zone_urba_tiles(), 1)
+            self.assertIsNone(tile_cache.get(bas_rhin))
@@ -0,0 +1,162 @@
+"""Persistent cache of the vector tiles served by public_data views.
+
+Tiles are stored in a django storage (S3 bucket or local folder) with the path
+<layer>/<year>/<z>/<x>/<y>.pbf. Layer may have a suffix when the tile was built
+with additional filters (ocsge+is_artificial-1 for instance).
+
+Activation is done with TILE_CACHE_STORAGE setting:
+* "" (default): tile cache is disabled, all tiles are built by PostGIS
+* "local": tiles are stored in TILE_CACHE_ROOT folder
+* "s3": tiles are stored in the bucket (see TileStorage)
+"""
+import logging
+import math
+from functools import cache
+from typing import Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+
+from public_data.models import DataSource, Departement
+from public_data.storages import TileStorage
+
+logger = logging.getLogger(__name__)
+
+
+BBox = Tuple[float, float, float, float]
+WORLD_BBOX: BBox = (-180.0, -85.0511, 180.0, 85.0511)
+# zone urba tiles don't depend on a year, see ZoneUrbaViewSet
+ZONE_URBA_LAYER = ("zones_urbaines", "all")
+
+
+def tile_range(bbox: BBox, z: int) -> Tuple[int, int, int, int]:
+    """Return (x_min, y_min, x_max, y_max) of the tiles covering a bbox (EPSG:4326) at zoom z."""
+    lon_min, lat_min, lon_max, lat_max = bbox
+    n = 2**z
+
+    def to_x(lon: float) -> int:
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def to_y(lat: float) -> int:
+        lat = max(min(lat, 85.0511), -85.0511)
+        lat_rad = math.radians(lat)
+        y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+        return min(n - 1, max(0, int(y)))
+
+    # y axis goes from north to south
+    return to_x(lon_min), to_y(lat_max), to_x(lon_max), to_y(lat_min)
+
+
+def iter_tiles(bbox: BBox, min_zoom: int, max_zoom: int) -> Iterator[Tuple[int, int, int]]:
+    for z in range(min_zoom, max_zoom + 1):
+        x_min, y_min, x_max, y_max = tile_range(bbox, z)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                yield z, x, y
+
+
+class TileCache:
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    @staticmethod
+    def get_key(layer: str, year: str, z: int, x: int, y: int) -> str:
+        return f"{layer}/{year}/{z}/{x}/{y}.pbf"
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.storage.exists(key):
+            return None
+        with self.storage.open(key, "rb") as f:
+            return f.read()
+
+    def set(self, key: str, tile: bytes) -> None:
+        if self.storage.exists(key):
+            self.storage.delete(key)
+        self.storage.save(key, ContentFile(tile))
+
+    def get_layer_variants(self, layer: str) -> List[str]:
+        """Return the layer and all its stored variants (same layer, with other filters)."""
+        try:
+            directories, _ = self.storage.listdir("")
+        except FileNotFoundError:
+            return []
+        return [d for d in directories if d == layer or d.startswith(f"{layer}+")]
+
+    def invalidate(self, layer: str, year: str, bbox: BBox, min_zoom: int = 0, max_zoom: int = 22) -> int:
+        """Delete tiles of a layer and a year intersecting the bbox, only existing tiles are listed.
+
+        Return the number of deleted tiles.
+        """
+        deleted = 0
+        for variant in self.get_layer_variants(layer):
+            prefix = f"{variant}/{year}"
+            try:
+                zooms, _ = self.storage.listdir(prefix)
+            except FileNotFoundError:
+                continue
+            for z in sorted(map(int, filter(str.isdigit, zooms))):
+                if not min_zoom <= z <= max_zoom:
+                    continue
+                x_min, y_min, x_max, y_max = tile_range(bbox, z)
+                xs, _ = self.storage.listdir(f"{prefix}/{z}")
+                for x in map(int, filter(str.isdigit, xs)):
+                    if not x_min <= x <= x_max:
+                        continue
+                    _, files = self.storage.listdir(f"{prefix}/{z}/{x}")
+                    for filename in files:
+                        y = filename.split(".")[0]
+                        if y.isdigit() and y_min <= int(y) <= y_max:
+                            self.storage.delete(f"{prefix}/{z}/{x}/{filename}")
+                            deleted += 1
+        logger.info("Tile cache: %d tiles deleted for %s/%s", deleted, layer, year)
+        return deleted
+
+
+@cache
+def get_tile_cache() -> Optional[TileCache]:
+    """Return the tile cache configured in settings, None if disabled."""
+    if settings.TILE_CACHE_STORAGE == "local":
+        return TileCache(FileSystemStorage(location=settings.TILE_CACHE_ROOT))
+    if settings.TILE_CACHE_STORAGE == "s3":
+        return TileCache(TileStorage())
+    return None
+
+
+def get_data_source_layer(source: DataSource) -> Optional[Tuple[str, str]]:
+    """Return (layer, year) of the tiles built from the data of a source."""
+    if source.dataset != DataSource.DatasetChoices.OCSGE or not source.millesimes:
+        return None
+    if source.name == DataSource.DataNameChoices.DIFFERENCE:
+        return "ocsge_diff", f"{min(source.millesimes)}-{max(source.millesimes)}"
+    layer = {
+        DataSource.DataNameChoices.OCCUPATION_DU_SOL: "ocsge",
+        DataSource.DataNameChoices.ZONE_CONSTRUITE: "zones_construites",
+        DataSource.DataNameChoices.ZONE_ARTIFICIELLE: "zones_artificielles",
+    }.get(source.name)
+    if layer is None:
+        return None
+    return layer, str(source.millesimes[0])
+
+
+def invalidate_data_source_tiles(source: DataSource) -> int:
+    """Drop cached tiles covering the departement of a freshly loaded source."""
+    tile_cache = get_tile_cache()
+    layer_year = get_data_source_layer(source)
+    if tile_cache is None or layer_year is None:
+        return 0
+    departement = Departement.objects.filter(source_id=source.official_land_id).first()
+    if departement is None:
+        logger.warning("Tile cache: no departement %s, tiles not invalidated", source.official_land_id)
+        return 0
+    layer, year = layer_year
+    return tile_cache.invalidate(layer, year, departement.mpoly.extent)
+
+
+def invalidate_zone_urba_tiles(bbox: BBox = WORLD_BBOX) -> int:
+    """Drop cached zone urba tiles intersecting the bbox, after a GPU import."""
+    tile_cache = get_tile_cache()
+    if tile_cache is None:
+        return 0
+    layer, year = ZONE_URBA_LAYER
+    return tile_cache.invalidate(layer, year, bbox)
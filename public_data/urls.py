@@ -12,6 +12,19 @@ urlpatterns = [
     path("search-land", views.SearchLandApiView.as_view({"post": "post"}), name="search-land"),
 ]
 
+# vector tiles, registered outside the router to get rid of the trailing slash
+tiles = [
+    ("ocsge/general", views.OcsgeViewSet, "ocsge-tiles"),
+    ("ocsge/diff", views.OcsgeDiffViewSet, "ocsgediff-tiles"),
+    ("ocsge/zones-construites", views.ZoneConstruiteViewSet, "zoneconstruite-tiles"),
+    ("ocsge/zones-artificielles", views.ArtificialAreaViewSet, "artificialarea-tiles"),
+    ("referentiel/zones-urbaines", views.ZoneUrbaViewSet, "zoneurba-tiles"),
+]
+urlpatterns += [
+    path(f"{prefix}/tiles/<int:z>/<int:x>/<int:y>.pbf", viewset.as_view({"get": "tiles"}), name=name)
+    for prefix, viewset, name in tiles
+]
+
 
 router = routers.DefaultRouter()
 router.register(r"referentiel/couverture-sol", views.CouvertureSolViewset)
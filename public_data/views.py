@@ -1,9 +1,10 @@
 import json
-from typing import Dict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
+from django.apps import apps
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import connection
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView
 from rest_framework import viewsets
@@ -14,10 +15,11 @@ from rest_framework.viewsets import GenericViewSet
 from rest_framework_gis import filters
 
 from public_data import models, serializers
+from public_data.geo_formats import BinaryGeoFormatMixin
 from public_data.models.administration import Land
 from public_data.throttles import SearchLandApiThrottle
-from utils.functions import decimal2float
-from utils.views_mixins import BreadCrumbMixin
+from public_data.tile_cache import TileCache, get_tile_cache
+from utils.views_mixins import BreadCrumbMixin, DataVersionETagMixin
 
 from .models import CouvertureSol, CouvertureUsageMatrix, UsageSol
 
@@ -36,27 +38,40 @@ class DisplayMatrix(LoginRequiredMixin, BreadCrumbMixin, TemplateView):
         return breadcrumbs
 
     def get_context_data(self, **kwargs):
-        couvertures = CouvertureSol.get_leafs()
-        usages = UsageSol.get_leafs()
-        qs = CouvertureUsageMatrix.objects.filter(couverture__in=couvertures, usage__in=usages).order_by(
-            "usage__code", "couverture__code"
-        )
-        qs = qs.select_related("usage", "couverture")
+        couvertures = sorted(CouvertureSol.get_leafs(), key=lambda couverture: couverture.code)
+        usages = sorted(UsageSol.get_leafs(), key=lambda usage: usage.code)
+        matrix = CouvertureUsageMatrix.matrix_dict()
         kwargs = dict()
-        for item in qs:
-            label = f"matrix_{item.usage.code}".replace(".", "_")
-            if label not in kwargs:
-                kwargs[label] = dict()
-            kwargs[label][item.couverture.code] = item
+        for usage in usages:
+            for couverture in couvertures:
+                item = matrix.get((couverture.code_prefix, usage.code_prefix))
+                if item is None:
+                    continue
+                label = f"matrix_{usage.code}".replace(".", "_")
+                if label not in kwargs:
+                    kwargs[label] = dict()
+                kwargs[label][couverture.code] = item
         return super().get_context_data(**kwargs)
 
 
 # OCSGE layers viewssets
 
 
-class OptimizedMixins:
+class OptimizedMixins(BinaryGeoFormatMixin):
+    """Build GeoJSON features in PostGIS and stream them to the client.
+
+    Features are fetched by batch through a server side cursor, so memory does not
+    depend on the number of polygons in the bbox. FlatGeobuf and GeoArrow outputs
+    are built from the same query, see public_data.geo_formats.
+    """
+
     optimized_fields: Dict[str, str] = {}
     optimized_geo_field = "st_AsGeoJSON(o.mpoly, 6, 0)"
+    # geometry of binary outputs, same as optimized_geo_field without GeoJSON encoding
+    binary_geo_field = "o.mpoly"
+    # alias of numeric fields to cast, ST_AsFlatGeobuf does not handle decimal type
+    binary_float_fields: Tuple[str, ...] = ("surface",)
+    stream_batch_size = 1000
 
     def get_params(self, request):
         bbox = request.query_params.get("in_bbox")
@@ -70,14 +85,16 @@ class OptimizedMixins:
     def get_optimized_geo_field(self):
         return self.optimized_geo_field
 
-    def get_sql_fields(self):
-        return list(self.optimized_fields.keys()) + [self.get_optimized_geo_field()]
-
-    def get_field_names(self):
-        return list(self.optimized_fields.values()) + ["geojson"]
+    def get_sql_feature(self):
+        properties = ", ".join(f"'{name}', {sql_field}" for sql_field, name in self.optimized_fields.items())
+        return (
+            "json_build_object('type', 'Feature', "
+            f"'properties', json_build_object({properties}), "
+            f"'geometry', ({self.get_optimized_geo_field()})::json)::text"
+        )
 
     def get_sql_select(self):
-        return f"select {', '.join(self.get_sql_fields())}"
+        return f"select {self.get_sql_feature()}"
 
     def get_sql_from(self):
         return f"from {self.queryset.model._meta.db_table} o"
@@ -94,50 +111,49 @@ class OptimizedMixins:
             ]
         )
 
-    def get_data(self, request):
-        query = self.get_sql_query()
-        params = self.get_params(request)
-        fields_names = self.get_field_names()
-        with connection.cursor() as cursor:
+    def get_binary_columns(self):
+        return [
+            (f"({sql_field})::float" if name in self.binary_float_fields else sql_field, name)
+            for sql_field, name in self.optimized_fields.items()
+        ]
+
+    def get_binary_from_where(self):
+        return " ".join([self.get_sql_from(), self.get_sql_where()])
+
+    def stream_features(self, query, params) -> Iterator[str]:
+        """Yield batches of features, each batch is a string of comma separated GeoJSON features."""
+        with connection.chunked_cursor() as cursor:
             cursor.execute(query, params)
-            return [{name: row[i] for i, name in enumerate(fields_names)} for row in cursor.fetchall()]
+            while rows := cursor.fetchmany(self.stream_batch_size):
+                yield ", ".join(row[0] for row in rows)
 
-    def clean_properties(self, props):
-        cleaned_props = dict()
-        for name, val in props.items():
-            try:
-                clean_method = getattr(self, f"clean_{name}")
-                cleaned_props[name] = clean_method(val)
-            except AttributeError:
-                # no cleaning required
-                cleaned_props[name] = val
-        return cleaned_props
+    def get_data(self, request) -> Iterable[str]:
+        # query and params are built now to raise ValueError before streaming starts
+        query = self.get_sql_query()
+        params = self.get_params(request)
+        return self.stream_features(query, params)
+
+    def stream_feature_collection(self, batches: Iterable[str]) -> Iterator[str]:
+        envelope = {"type": "FeatureCollection", "crs": {"type": "name", "properties": {"name": "EPSG:4326"}}}
+        yield json.dumps(envelope)[:-1] + ', "features": ['
+        separator = ""
+        for batch in batches:
+            yield separator + batch
+            separator = ", "
+        yield "]}"
+
+    def get_binary_response(self, request):
+        # from and where are built first, as they may check parameters
+        from_where = self.get_binary_from_where()
+        params = self.get_params(request)
+        return self.binary_response(self.get_binary_columns(), self.binary_geo_field, from_where, params)
 
     @action(detail=False)
     def optimized(self, request):
         try:
-            envelope = json.dumps(
-                {
-                    "type": "FeatureCollection",
-                    "crs": {"type": "name", "properties": {"name": "EPSG:4326"}},
-                    "features": "-features-",
-                }
-            )
-            features = []
-            for row in self.get_data(request):
-                geojson = row.pop("geojson")
-                feature = json.dumps(
-                    {
-                        "type": "Feature",
-                        "properties": self.clean_properties(row),
-                        "geometry": "-geometry-",
-                    },
-                    default=decimal2float,
-                )
-                feature = feature.replace('"-geometry-"', geojson)
-                features.append(feature)
-            features = f" [{', '.join(features)}]"
-            envelope = envelope.replace('"-features-"', features)
+            if self.get_binary_format():
+                return self.get_binary_response(request)
+            batches = self.get_data(request)
         except ValueError as exc:
             envelope = json.dumps(
                 {
@@ -147,11 +163,13 @@ class OptimizedMixins:
                     }
                 }
             )
-        return HttpResponse(envelope, content_type="application/json")
+            return HttpResponse(envelope, content_type="application/json")
+        return StreamingHttpResponse(self.stream_feature_collection(batches), content_type="application/json")
 
 
 class OnlyBoundingBoxMixin:
     optimized_geo_field = "st_AsGeoJSON(ST_Intersection(ST_MakeValid(mpoly), b.box), 6, 0)"
+    binary_geo_field = "ST_Intersection(ST_MakeValid(mpoly), b.box)"
 
     def get_sql_from(self) -> str:
         from_parts = [
@@ -182,12 +200,157 @@ class ZoomSimplificationMixin:
             return super().get_data(request)
         return []
 
+    def get_binary_from_where(self):
+        from_where = super().get_binary_from_where()
+        if self.get_zoom() >= self.min_zoom:
+            return from_where
+        return f"{from_where} LIMIT 0"
+
+
+class VectorTileMixin:
+    """Serve the layer as Mapbox Vector Tiles (/{z}/{x}/{y}.pbf) built by PostGIS.
+
+    Properties of the features are the ones of the optimized endpoint (optimized_fields).
+    Joins and filters are returned as (sql, params) tuples to keep params next to their sql.
+    """
+
+    tile_layer_name = ""
+    tile_geo_field = "o.mpoly"
+    # alias of numeric fields to cast, ST_AsMVT does not handle decimal type
+    tile_float_fields = ("surface",)
+    tile_extent = 4096
+    tile_buffer = 64
+    tile_min_zoom = None
+    # query params composing the year part of the cache key, and the ones making a variant of the layer
+    tile_cache_year_params: Tuple[str, ...] = ("year",)
+    tile_cache_variant_params: Tuple[str, ...] = ()
+
+    def get_tile_min_zoom(self) -> int:
+        if self.tile_min_zoom is not None:
+            return self.tile_min_zoom
+        return getattr(self, "min_zoom", 0)
+
+    def get_tile_param(self, name, cast=str):
+        value = self.request.query_params.get(name)
+        if value is None:
+            raise ValueError(f"{name} parameter must be set.")
+        return cast(value)
+
+    def get_tile_project_join(self):
+        if "project_id" not in self.request.query_params:
+            return []
+        sql = "INNER JOIN project_combinedemprise t ON t.project_id = %s AND ST_Intersects(o.mpoly, t.mpoly)"
+        return [(sql, [self.get_tile_param("project_id", int)])]
+
+    def get_tile_joins(self):
+        return []
+
+    def get_tile_filters(self):
+        return []
+
+    def get_tile_sql_fields(self):
+        fields = []
+        for sql_field, name in self.optimized_fields.items():
+            if name in self.tile_float_fields:
+                sql_field = f"({sql_field})::float"
+            fields.append(f"{sql_field} AS {name}")
+        return fields
+
+    def get_tile_sql_query(self, joins, filters):
+        where_members = ["o.mpoly && ST_Transform(tile.envelope, 4326)"] + [sql for sql, _ in filters]
+        fields = self.get_tile_sql_fields()
+        geom = (
+            f"ST_AsMVTGeom(ST_Transform({self.tile_geo_field}, 3857), tile.envelope, "
+            f"{self.tile_extent}, {self.tile_buffer}, true) AS geom"
+        )
+        return " ".join(
+            [
+                "WITH tile AS (SELECT ST_TileEnvelope(%s, %s, %s) AS envelope),",
+                "features AS (",
+                f"SELECT {', '.join(['o.id AS mvt_id'] + fields + [geom])}",
+                f"FROM {self.queryset.model._meta.db_table} o",
+                *[sql for sql, _ in joins],
+                "CROSS JOIN tile",
+                f"WHERE {' AND '.join(where_members)}",
+                ")",
+                f"SELECT ST_AsMVT(features.*, %s, {self.tile_extent}, 'geom', 'mvt_id') FROM features",
+            ]
+        )
+
+    def get_tile(self, z, x, y) -> bytes:
+        if z < self.get_tile_min_zoom():
+            return b""
+        joins = self.get_tile_joins()
+        filters = self.get_tile_filters()
+        params = [z, x, y]
+        for _, join_params in joins:
+            params += join_params
+        for _, filter_params in filters:
+            params += filter_params
+        params.append(self.tile_layer_name)  # /!\ order matter, see sql query above
+        with connection.cursor() as cursor:
+            cursor.execute(self.get_tile_sql_query(joins, filters), params)
+            row = cursor.fetchone()
+        return bytes(row[0]) if row and row[0] else b""
+
+    def get_tile_cache_key(self, z, x, y) -> Optional[str]:
+        """Return the key of the tile in the tile cache, None if the tile should not be cached."""
+        params = self.request.query_params
+        if "project_id" in params:
+            # restricted to a project emprise, tile is not shared between users
+            return None
+        names = [name for name in self.tile_cache_year_params + self.tile_cache_variant_params if name in params]
+        if not all(params[name].replace(",", "").isalnum() for name in names):
+            # values are used in the storage path
+            return None
+        year = "-".join(params[name] for name in self.tile_cache_year_params if name in params) or "all"
+        variant = "".join(f"+{name}-{params[name]}" for name in self.tile_cache_variant_params if name in params)
+        return TileCache.get_key(f"{self.tile_layer_name}{variant}", year, z, x, y)
+
+    def tiles(self, request, z, x, y):
+        tile_cache = get_tile_cache()
+        key = self.get_tile_cache_key(z, x, y) if tile_cache else None
+        tile = tile_cache.get(key) if key else None
+        if tile is None:
+            try:
+                tile = self.get_tile(z, x, y)
+            except ValueError as exc:
+                return HttpResponseBadRequest(str(exc))
+            if key:
+                tile_cache.set(key, tile)
+        return HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile")
 
-class DataViewSet(viewsets.ReadOnlyModelViewSet):
+
+class DataViewSet(DataVersionETagMixin, viewsets.ReadOnlyModelViewSet):
     bbox_filter_field = "mpoly"
     bbox_filter_include_overlapping = True
     filter_backends = (filters.InBBoxFilter,)
 
+    def get_etag_extra(self) -> str:
+        """Layers clipped to a project change with the project territory."""
+        project_id = self.request.GET.get("project_id")
+        if not project_id or not project_id.isdigit():
+            return ""
+        return apps.get_model("project", "Project").get_version_token(int(project_id))
+
+    def get_gradient_filters(self, request) -> Dict:
+        """Restrict the distribution used by the gradient with year, departement or project_id."""
+        model = self.queryset.model
+        field_names = {field.name for field in model._meta.get_fields()}
+        filters = {}
+        if "year" in request.query_params and "year" in field_names:
+            filters["year"] = int(request.query_params["year"])
+        if "departement" in request.query_params and "departement" in field_names:
+            lookup = "departement__source_id" if model._meta.get_field("departement").is_relation else "departement"
+            filters[lookup] = request.query_params["departement"]
+        if "project_id" in request.query_params and "mpoly" in field_names:
+            project = apps.get_model("project", "Project").objects.filter(id=int(request.query_params["project_id"]))
+            project = project.first()
+            if project is None:
+                raise ValueError("project_id does not exist")
+            filters["mpoly__intersects"] = project.combined_emprise
+        return filters
+
     @action(detail=False, methods=["get"])
     def gradient(self, request):
         property_name = color_name = None
@@ -195,15 +358,20 @@ class DataViewSet(viewsets.ReadOnlyModelViewSet):
             property_name = str(request.query_params["property_name"])
         if "color_name" in request.query_params:
             color_name = str(request.query_params["color_name"])
+        try:
+            filters = self.get_gradient_filters(request)
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
         gradient = self.queryset.model.get_gradient(
             property_name=property_name,
             color_name=color_name,
+            filters=filters,
         )
         gradient = [{"value": int(k), "color": v.hex_l} for k, v in gradient.items()]
         return Response(gradient)
 
 
-class OcsgeViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, DataViewSet):
+class OcsgeViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, VectorTileMixin, DataViewSet):
     queryset = models.Ocsge.objects.all()
     serializer_class = serializers.OcsgeSerializer
     optimized_fields = {
@@ -215,6 +383,8 @@ class OcsgeViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixin
         "pdus.label_short": "usage_label_short",
     }
     min_zoom = 12
+    tile_layer_name = "ocsge"
+    tile_cache_variant_params = ("is_artificial",)
 
     def get_queryset(self):
         """
@@ -251,25 +421,46 @@ class OcsgeViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixin
             params.append(bool(request.query_params.get("is_artificial")))
         return params  # /!\ order matter, see sql query below
 
+    def get_tile_joins(self):
+        return [
+            ("INNER JOIN public_data_couverturesol pdcs ON o.couverture = pdcs.code_prefix", []),
+            ("INNER JOIN public_data_usagesol pdus ON o.usage = pdus.code_prefix", []),
+        ]
 
-class OcsgeDiffViewSet(ZoomSimplificationMixin, OptimizedMixins, DataViewSet):
-    # TODO : replace subqueries below by frontend logic
+    def get_tile_filters(self):
+        filters = [("o.year = %s", [self.get_tile_param("year", int)])]
+        if "is_artificial" in self.request.query_params:
+            filters.append(("o.is_artificial = %s", [bool(self.request.query_params.get("is_artificial"))]))
+        return filters
+
+
+class OcsgeDiffViewSet(ZoomSimplificationMixin, OptimizedMixins, VectorTileMixin, DataViewSet):
     queryset = models.OcsgeDiff.objects.all()
     serializer_class = serializers.OcsgeDiffSerializer
     optimized_fields = {
-        # "o.id": "id",
-        "(SELECT code_prefix || ' ' || label_short FROM public_data_couverturesol AS pdcs WHERE pdcs.code_prefix = cs_old)": "cs_old",  # noqa: E501
-        "(SELECT code_prefix || ' ' || label_short FROM public_data_usagesol AS pdus WHERE pdus.code_prefix = us_old)": "us_old",  # noqa: E501
-        "(SELECT code_prefix || ' ' || label_short FROM public_data_couverturesol AS pdcs WHERE pdcs.code_prefix = cs_new)": "cs_new",  # noqa: E501
-        "(SELECT code_prefix || ' ' || label_short FROM public_data_usagesol AS pdus WHERE pdus.code_prefix = us_new)": "us_new",  # noqa: E501
-        "year_new": "year_new",
-        "year_old": "year_old",
-        "is_new_artif": "is_new_artif",
-        "is_new_natural": "is_new_natural",
-        "surface / 10000": "surface",
+        "cs_old.code_prefix || ' ' || cs_old.label_short": "cs_old",
+        "us_old.code_prefix || ' ' || us_old.label_short": "us_old",
+        "cs_new.code_prefix || ' ' || cs_new.label_short": "cs_new",
+        "us_new.code_prefix || ' ' || us_new.label_short": "us_new",
+        "o.year_new": "year_new",
+        "o.year_old": "year_old",
+        "o.is_new_artif": "is_new_artif",
+        "o.is_new_natural": "is_new_natural",
+        "o.surface / 10000": "surface",
     }
+    # labels of couverture and usage are resolved by a join per field
+    label_joins = [
+        f"LEFT JOIN {CouvertureSol._meta.db_table} cs_old ON cs_old.code_prefix = o.cs_old",
+        f"LEFT JOIN {UsageSol._meta.db_table} us_old ON us_old.code_prefix = o.us_old",
+        f"LEFT JOIN {CouvertureSol._meta.db_table} cs_new ON cs_new.code_prefix = o.cs_new",
+        f"LEFT JOIN {UsageSol._meta.db_table} us_new ON us_new.code_prefix = o.us_new",
+    ]
 
     min_zoom = 15
+    tile_layer_name = "ocsge_diff"
+    tile_min_zoom = 10
+    tile_cache_year_params = ("year_old", "year_new")
+    tile_cache_variant_params = ("is_new_artif", "is_new_natural")
 
     def get_zoom(self):
         try:
@@ -278,44 +469,69 @@ class OcsgeDiffViewSet(ZoomSimplificationMixin, OptimizedMixins, DataViewSet):
             return 18  # make old map work
 
     def get_params(self, request):
-        params = [int(request.query_params.get("year_new"))]
+        params = []
+        if "project_id" in request.query_params:
+            params.append(int(request.query_params.get("project_id")))
+        params.append(int(request.query_params.get("year_new")))
         params.append(int(request.query_params.get("year_old")))
 
         if "is_new_artif" in request.query_params:
             params.append(bool(request.query_params.get("is_new_artif")))
         if "is_new_natural" in request.query_params:
             params.append(bool(request.query_params.get("is_new_natural")))
-        if "project_id" in request.query_params:
-            params.append(request.query_params.get("project_id"))
 
         # /!\ order matter, check sql query to know
         return params
 
     def get_sql_from(self):
-        return f"from {self.queryset.model._meta.db_table} o"
+        sql_from = [f"from {self.queryset.model._meta.db_table} o"] + self.label_joins
+        if "project_id" in self.request.query_params:
+            sql_from += [
+                "INNER JOIN project_combinedemprise t ON t.project_id = %s",
+                "AND ST_Intersects(o.mpoly, t.mpoly)",
+            ]
+        return " ".join(sql_from)
 
     def get_sql_where(self):
-        and_group = ["year_new = %s", "year_old = %s"]
+        and_group = ["o.year_new = %s", "o.year_old = %s"]
         or_group = []
         if "is_new_artif" in self.request.query_params:
-            or_group.append("is_new_artif = %s")
+            or_group.append("o.is_new_artif = %s")
         if "is_new_natural" in self.request.query_params:
-            or_group.append("is_new_natural = %s")
+            or_group.append("o.is_new_natural = %s")
         if or_group:
             and_group.append(f"({' or '.join(or_group)})")
-        if "project_id" in self.request.query_params:
-            and_group.append(
-                "ST_Intersects(mpoly, (SELECT ST_Union(mpoly) FROM project_emprise WHERE project_id = %s))"
-            )
         where = f"where {' and '.join(and_group)}"
         return where
 
+    def get_tile_joins(self):
+        return [(join, []) for join in self.label_joins] + self.get_tile_project_join()
+
+    def get_tile_filters(self):
+        filters = [
+            ("o.year_new = %s", [self.get_tile_param("year_new", int)]),
+            ("o.year_old = %s", [self.get_tile_param("year_old", int)]),
+        ]
+        or_group, or_params = [], []
+        for name in ["is_new_artif", "is_new_natural"]:
+            if name in self.request.query_params:
+                or_group.append(f"o.{name} = %s")
+                or_params.append(bool(self.request.query_params.get(name)))
+        if or_group:
+            filters.append((f"({' or '.join(or_group)})", or_params))
+        return filters
+
 
 class OcsgeDiffCentroidViewSet(OcsgeDiffViewSet):
     optimized_geo_field = "st_AsGeoJSON(St_Centroid(o.mpoly))"
+    binary_geo_field = "St_Centroid(o.mpoly)"
+    tile_geo_field = "St_Centroid(o.mpoly)"
+    tile_layer_name = "ocsge_diff_centroids"
 
 
-class ZoneConstruiteViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, DataViewSet):
+class ZoneConstruiteViewSet(
+    OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, VectorTileMixin, DataViewSet
+):
     queryset = models.ZoneConstruite.objects.all()
     serializer_class = serializers.ZoneConstruiteSerializer
     optimized_fields = {
@@ -323,6 +539,7 @@ class ZoneConstruiteViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, Optim
         "surface": "surface",
         "year": "year",
     }
+    tile_layer_name = "zones_construites"
 
     def get_params(self, request):
         bbox = request.query_params.get("in_bbox").split(",")
@@ -340,16 +557,24 @@ class ZoneConstruiteViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, Optim
         ]
         if "project_id" in self.request.query_params:
             sql_from += [
-                "INNER JOIN (SELECT ST_Union(mpoly) as geom FROM project_emprise WHERE project_id = %s) as t",
-                "ON ST_Intersects(o.mpoly, t.geom)",
+                "INNER JOIN project_combinedemprise t ON t.project_id = %s",
+                "AND ST_Intersects(o.mpoly, t.mpoly)",
             ]
         return " ".join(sql_from)
 
     def get_sql_where(self):
         return "WHERE o.year = %s"
 
+    def get_tile_joins(self):
+        return self.get_tile_project_join()
+
+    def get_tile_filters(self):
+        return [("o.year = %s", [self.get_tile_param("year", int)])]
 
-class ArtificialAreaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, DataViewSet):
+
+class ArtificialAreaViewSet(
+    OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, VectorTileMixin, DataViewSet
+):
     queryset = models.ArtificialArea.objects.all()
     serializer_class = serializers.OcsgeDiffSerializer
     optimized_fields = {
@@ -359,7 +584,9 @@ class ArtificialAreaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, Optim
         "o.year": "year",
     }
     optimized_geo_field = "st_AsGeoJSON(ST_Intersection(o.mpoly, b.box), 6, 0)"
+    binary_geo_field = "ST_Intersection(o.mpoly, b.box)"
     min_zoom = 12
+    tile_layer_name = "zones_artificielles"
 
     def get_zoom(self):
         try:
@@ -384,16 +611,23 @@ class ArtificialAreaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, Optim
         ]
         if "project_id" in self.request.query_params:
             sql_from += [
-                "INNER JOIN (SELECT ST_Union(pe.mpoly) as geom FROM project_emprise pe WHERE project_id = %s) as t",
-                "ON ST_Intersects(o.mpoly, t.geom)",
+                "INNER JOIN project_combinedemprise t ON t.project_id = %s",
+                "AND ST_Intersects(o.mpoly, t.mpoly)",
             ]
         return " ".join(sql_from)
 
     def get_sql_where(self):
         return "WHERE o.year = %s"
 
+    def get_tile_joins(self):
+        commune_join = (f"INNER JOIN {models.Commune._meta.db_table} c ON o.city = c.insee", [])
+        return [commune_join] + self.get_tile_project_join()
+
+    def get_tile_filters(self):
+        return [("o.year = %s", [self.get_tile_param("year", int)])]
+
 
-class ZoneUrbaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, DataViewSet):
+class ZoneUrbaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMixins, VectorTileMixin, DataViewSet):
     queryset = models.ZoneUrba.objects.all()
     serializer_class = serializers.ZoneUrbaSerializer
     optimized_fields = {
@@ -404,10 +638,13 @@ class ZoneUrbaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMi
         "o.urlfic": "urlfic",
         "o.datappro": "datappro",
         "o.datvalid": "datvalid",
-        "ST_AsEWKT((ST_MaximumInscribedCircle(o.mpoly)).center)": "label_center",
+        "ST_AsEWKT(o.label_center)": "label_center",
     }
 
     min_zoom = 10
+    tile_layer_name = "zones_urbaines"
+    tile_cache_year_params = ()
+    tile_cache_variant_params = ("type_zone",)
 
     def get_params(self, request):
         bbox = request.query_params.get("in_bbox").split(",")
@@ -425,19 +662,31 @@ class ZoneUrbaViewSet(OnlyBoundingBoxMixin, ZoomSimplificationMixin, OptimizedMi
         ]
         if "project_id" in self.request.query_params:
             sql_from += [
-                "INNER JOIN (SELECT ST_Union(mpoly) as geom FROM project_emprise WHERE project_id = %s) as t",
-                "ON ST_Intersects(o.mpoly, t.geom)",
+                "INNER JOIN project_combinedemprise t ON t.project_id = %s",
+                "AND ST_Intersects(o.mpoly, t.mpoly)",
             ]
         return " ".join(sql_from)
 
     def get_sql_where(self):
-        where_parts = ["St_IsValid(mpoly) = true"]
+        where_parts = ["o.is_valid = true"]
         if "type_zone" in self.request.query_params:
             zones = [_.strip() for _ in self.request.query_params.get("type_zone").split(",")]
             zones = [f"'{_}'" for _ in zones if _ in ["U", "Ah", "Nd", "A", "AUc", "N", "Nh", "AUs"]]
             where_parts.append(f"o.typezone in ({', '.join(zones)})")
         return f"where {' and '.join(where_parts)}"
 
+    def get_tile_joins(self):
+        return self.get_tile_project_join()
+
+    def get_tile_filters(self):
+        filters = [("o.is_valid = true", [])]
+        if "type_zone" in self.request.query_params:
+            zones = [_.strip() for _ in self.request.query_params.get("type_zone").split(",")]
+            zones = [_ for _ in zones if _ in ["U", "Ah", "Nd", "A", "AUc", "N", "Nh", "AUs"]]
+            if zones:
+                filters.append((f"o.typezone in ({', '.join(['%s'] * len(zones))})", zones))
+        return filters
+
 
 # Views for referentials Couverture and Usage
 
@@ -460,14 +709,78 @@ class DepartementViewSet(DataViewSet):
     serializer_class = serializers.DepartementSerializer
 
 
-class grid_view(APIView):
+class grid_view(DataVersionETagMixin, BinaryGeoFormatMixin, APIView):
+    """Return a grid of squares inside a given bbox.
+
+    Without millesimes, squares are empty and their size is given by gride_size (meter).
+    With year_old and year_new, squares are the precomputed cells of OcsgeGridCell with
+    new_artif, new_natural and artificial_surface (ha), the size of the cells depends
+    on zoom parameter.
+    """
+
+    cell_fields = {
+        "o.new_artif::float": "new_artif",
+        "o.new_natural::float": "new_natural",
+        "o.artificial_surface::float": "artificial_surface",
+    }
+
+    def get_cells_query(self, request) -> Tuple[str, list]:
+        """Return the "from where" part of the query of the cells, with its params."""
+        try:
+            zoom = int(request.query_params.get("zoom", "0"))
+            params = [
+                models.OcsgeGridCell.get_cell_size(zoom),
+                int(request.query_params["year_old"]),
+                int(request.query_params["year_new"]),
+            ]
+            params += list(map(float, request.query_params["in_bbox"].split(",")))
+        except (KeyError, ValueError) as exc:
+            raise ValueError(f"in_bbox, year_old and year_new must be set: {exc}")
+        from_where = (
+            f"FROM {models.OcsgeGridCell._meta.db_table} o "
+            "WHERE o.cell_size = %s AND o.year_old = %s AND o.year_new = %s "
+            "AND o.mpoly && ST_MakeEnvelope(%s, %s, %s, %s, 4326)"
+        )
+        return from_where, params
+
+    def get_cells(self, request):
+        try:
+            from_where, params = self.get_cells_query(request)
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+        if self.get_binary_format():
+            return self.binary_response(list(self.cell_fields.items()), "o.mpoly", from_where, params)
+
+        properties = ", ".join(f"'{name}', {sql_field}" for sql_field, name in self.cell_fields.items())
+        query = f"SELECT json_build_object({properties})::text, st_AsGeoJSON(o.mpoly, 6, 0) {from_where}"
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            geojson = {
+                "type": "FeatureCollection",
+                "crs": {"type": "name", "properties": {"name": "EPSG:4326"}},
+                "features": [
+                    {
+                        "type": "Feature",
+                        "properties": json.loads(row[0]),
+                        "geometry": json.loads(row[1]),
+                    }
+                    for row in cursor.fetchall()
+                ],
+            }
+        return Response(geojson)
+
     def get(self, request, format=None):
-        """Return a grid of squares of 1000 size and inside a given bbox."""
+        if "year_old" in request.query_params or "year_new" in request.query_params:
+            return self.get_cells(request)
 
         params = [int(request.query_params.get("gride_size", "1000")) * 0.008983]
         bbox = request.query_params.get("in_bbox").split(",")
         params += list(map(float, bbox))
 
+        if self.get_binary_format():
+            from_where = "FROM ST_SquareGrid(%s, ST_MakeEnvelope(%s, %s, %s, %s, 4326)) AS squares"
+            return self.binary_response([], "squares.geom", from_where, params)
+
         query = (
             "SELECT st_AsGeoJSON(squares.geom, 6, 0) as mpoly "
             "FROM ST_SquareGrid(%s, ST_MakeEnvelope(%s, %s, %s, %s, 4326)) AS squares"
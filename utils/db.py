@@ -1,9 +1,14 @@
 from logging import getLogger
 
 from django.contrib.gis.db.models import Func, MultiPolygonField
-from django.contrib.gis.db.models.functions import Area, Intersection, MakeValid
+from django.contrib.gis.db.models.functions import (
+    Area,
+    GeomOutputGeoFunc,
+    Intersection,
+    MakeValid,
+)
 from django.contrib.gis.geos import GeometryCollection, MultiPolygon, Polygon
-from django.db.models import DecimalField, Manager, QuerySet, Sum
+from django.db.models import DecimalField, Manager, QuerySet, Sum, Value
 from django.db.models.functions import Cast, Coalesce
 
 from public_data.models.enums import SRID
@@ -36,6 +41,22 @@ class DynamicSRIDTransform(Func):
         super().__init__(expression, srid_source, **extra)
 
 
+class Simplify(GeomOutputGeoFunc):
+    """
+    ST_Simplify, tolerance is in the unit of the geometry srid. Polygons smaller
+    than the tolerance are kept (collapsed) instead of removed, so they stay visible
+    on a map.
+
+    Examples:
+    >>> Simplify(Transform('mpoly', 3857), 25)
+    """
+
+    function = "ST_Simplify"
+
+    def __init__(self, expression, tolerance, **extra):
+        super().__init__(expression, Value(float(tolerance)), Value(True), **extra)
+
+
 def cast_sum_area(field, filter=None, divider=10000):
     """
     Sum all area fields and cast the total to DecimalField.
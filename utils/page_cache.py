@@ -0,0 +1,174 @@
+"""Cache of rendered pages, used by utils.views_mixins.CacheMixin.
+
+Pages are stored under a key built from the key prefix (namespace and url) and
+the user of the request, never from its cookies: an anonymous page rendered by a
+celery task or for another visitor is served to every anonymous visitor, a page
+of a logged-in user only to this user. Pages are rendered with CSRF_PLACEHOLDER
+as CSRF token, replaced by the token of the visitor when they are served. Pages
+declaring Vary: Cookie are not stored. A page is stored along with its expiry
+date, and kept stale_timeout seconds after it:
+* single flight: when a page is missing or expired, only the request holding the
+  lock renders it. Other requests serve the expired copy, or wait for the new
+  one when there is none.
+* stale-while-revalidate: an expired page is served at once and rendered again
+  by refresh_cached_page celery task.
+
+refresh_page renders a page outside of any request, it is also used to warm the
+cache up before the first visit.
+"""
+import hashlib
+import io
+import logging
+import time
+from importlib import import_module
+from typing import Optional, Tuple
+from urllib.parse import unquote_to_bytes, urlparse
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import has_vary_header
+
+logger = logging.getLogger(__name__)
+
+# request attribute set by refresh_page, it can't be set by a client
+REFRESH_ATTRIBUTE = "page_cache_refresh"
+# seconds between two checks of a waiting request
+POLL_INTERVAL = 0.2
+# csrf_token of the templates of cached pages, a cached page can't hold the token of a visitor
+CSRF_PLACEHOLDER = "[CSRF_TOKEN_PLACEHOLDER]"
+
+_handler: Optional[BaseHandler] = None
+
+
+def get_page_digest(request, key_prefix: str) -> str:
+    user = getattr(request, "user", None)
+    visitor = f"user{user.pk}" if user is not None and user.is_authenticated else "anonymous"
+    return hashlib.sha1(f"{key_prefix}:{visitor}".encode()).hexdigest()
+
+
+def get_page_key(request, key_prefix: str) -> str:
+    return f"pages/page/{get_page_digest(request, key_prefix)}"
+
+
+def get_lock_key(request, key_prefix: str) -> str:
+    return f"pages/lock/{get_page_digest(request, key_prefix)}"
+
+
+def acquire_lock(lock_key: str, timeout: int) -> bool:
+    return cache.add(lock_key, 1, timeout=timeout)
+
+
+def release_lock(lock_key: str) -> None:
+    cache.delete(lock_key)
+
+
+def get_cached_page(request, key_prefix: str) -> Tuple[Optional[HttpResponse], bool]:
+    """Return (response, is_fresh) of a page, (None, False) when it is not cached."""
+    entry = cache.get(get_page_key(request, key_prefix))
+    if entry is None:
+        return None, False
+    expires, response = entry
+    return response, time.time() < expires
+
+
+def insert_csrf_token(request, response: HttpResponse) -> HttpResponse:
+    """Replace CSRF_PLACEHOLDER by the token of the visitor, the CSRF middleware then
+    sets the cookie of this token."""
+    placeholder = CSRF_PLACEHOLDER.encode()
+    if not response.streaming and placeholder in response.content:
+        response.content = response.content.replace(placeholder, get_token(request).encode())
+    return response
+
+
+def should_store(request, response) -> bool:
+    """Rules of django cache middleware, except that a page is shared by all the
+    anonymous visitors: a page depending on cookies or setting one is not stored."""
+    if response.streaming or response.status_code != 200:
+        return False
+    if "private" in response.get("Cache-Control", ()):
+        return False
+    if response.cookies or has_vary_header(response, "Cookie"):
+        return False
+    return True
+
+
+def store_page(request, response, key_prefix: str, timeout: int, stale_timeout: int) -> None:
+    if not should_store(request, response):
+        return
+    cache.set(
+        get_page_key(request, key_prefix),
+        (time.time() + timeout, response),
+        timeout=timeout + stale_timeout,
+    )
+
+
+def wait_for_page(request, key_prefix: str, lock_key: str, wait: float) -> Optional[HttpResponse]:
+    """Wait for the page rendered by the request holding the lock, None if it is not stored in time."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        response, is_fresh = get_cached_page(request, key_prefix)
+        if response is not None and is_fresh:
+            return response
+        if cache.get(lock_key) is None:
+            # lock released without storing the page (error, page not cacheable...)
+            return None
+    return None
+
+
+def get_handler() -> BaseHandler:
+    global _handler
+    if _handler is None:
+        _handler = BaseHandler()
+        _handler.load_middleware()
+    return _handler
+
+
+def get_site_host_and_scheme() -> Tuple[str, str]:
+    """Host and scheme of the pages rendered outside of a request, from DOMAIN_URL."""
+    url = urlparse(settings.DOMAIN_URL)
+    return url.netloc, url.scheme or "https"
+
+
+def create_user_session(user):
+    """Log the user in a new session, as django test client force_login."""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session
+
+
+def refresh_page(path: str, host: str, scheme: str, user=None) -> int:
+    """Render a page again through the middlewares and store it, anonymously unless a
+    user is given. Return the status code of the page."""
+    path_info, _, query_string = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        # WSGI strings are bytes decoded as latin-1
+        "PATH_INFO": unquote_to_bytes(path_info).decode("iso-8859-1"),
+        "QUERY_STRING": query_string,
+        "HTTP_HOST": host,
+        "SERVER_NAME": host.split(":")[0],
+        "SERVER_PORT": "443" if scheme == "https" else "80",
+        "wsgi.url_scheme": scheme,
+        "wsgi.input": io.BytesIO(),
+    }
+    session = create_user_session(user) if user is not None else None
+    if session is not None:
+        environ["HTTP_COOKIE"] = f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+    try:
+        request = WSGIRequest(environ)
+        setattr(request, REFRESH_ATTRIBUTE, True)
+        response = get_handler().get_response(request)
+    finally:
+        if session is not None:
+            session.delete()
+    return response.status_code
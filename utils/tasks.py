@@ -0,0 +1,19 @@
+import logging
+
+from celery import shared_task
+
+from utils.page_cache import refresh_page
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_cached_page(path, host, scheme):
+    logger.info("Refresh cached page %s", path)
+    try:
+        status_code = refresh_page(path, host, scheme)
+        if status_code != 200:
+            logger.warning("Cached page %s not refreshed, status %s", path, status_code)
+    except Exception as exc:  # noqa: E722, B001
+        logger.error("Failing refreshing cached page %s", path)
+        logger.exception(exc)
@@ -0,0 +1,193 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import path
+from django.views import View
+from django.views.generic.base import ContextMixin
+from django_app_parameter.models import Parameter
+
+from utils import page_cache
+from utils.tasks import refresh_cached_page
+from utils.views_mixins import CacheMixin
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class CountingView(CacheMixin, View):
+    cache_stale_while_revalidate = True
+    renders = 0
+
+    def get(self, request):
+        CountingView.renders += 1
+        return HttpResponse(f"render {CountingView.renders}")
+
+
+class CsrfTokenView(CacheMixin, ContextMixin, View):
+    def get(self, request):
+        return HttpResponse(self.get_context_data().get("csrf_token", ""))
+
+
+urlpatterns = [
+    path("cached/", CountingView.as_view()),
+    path("token/", CsrfTokenView.as_view()),
+]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestPageCache(SimpleTestCase):
+    def test_store_and_expire(self):
+        request = RequestFactory().get("/project/1/")
+        page_cache.store_page(request, HttpResponse(b"report"), "v1", timeout=60, stale_timeout=60)
+        response, is_fresh = page_cache.get_cached_page(request, "v1")
+        self.assertEqual(response.content, b"report")
+        self.assertTrue(is_fresh)
+
+        with mock.patch("utils.page_cache.time.time", return_value=10**12):
+            response, is_fresh = page_cache.get_cached_page(request, "v1")
+        self.assertEqual(response.content, b"report")
+        self.assertFalse(is_fresh)
+
+        self.assertEqual(page_cache.get_cached_page(request, "v2"), (None, False))
+
+    def test_page_key_ignores_cookies(self):
+        request = RequestFactory().get("/project/1/")
+        other_request = RequestFactory().get("/project/1/", HTTP_COOKIE="csrftoken=abc")
+        self.assertEqual(page_cache.get_page_key(request, "v1"), page_cache.get_page_key(other_request, "v1"))
+
+    def test_page_key_per_user(self):
+        keys = set()
+        for user in [
+            AnonymousUser(),
+            SimpleNamespace(pk=1, is_authenticated=True),
+            SimpleNamespace(pk=2, is_authenticated=True),
+        ]:
+            request = RequestFactory().get("/project/1/")
+            request.user = user
+            keys.add(page_cache.get_page_key(request, "v1"))
+        self.assertEqual(len(keys), 3)
+
+    def test_insert_csrf_token(self):
+        request = RequestFactory().get("/")
+        response = page_cache.insert_csrf_token(request, HttpResponse(f"token={page_cache.CSRF_PLACEHOLDER}"))
+        self.assertNotIn(page_cache.CSRF_PLACEHOLDER.encode(), response.content)
+        self.assertTrue(request.META["CSRF_COOKIE_NEEDS_UPDATE"])
+
+    def test_should_store(self):
+        request = RequestFactory().get("/")
+        self.assertTrue(page_cache.should_store(request, HttpResponse()))
+        self.assertFalse(page_cache.should_store(request, HttpResponse(status=404)))
+        response = HttpResponse()
+        response["Cache-Control"] = "private"
+        self.assertFalse(page_cache.should_store(request, response))
+        response = HttpResponse()
+        response["Vary"] = "Cookie"
+        self.assertFalse(page_cache.should_store(request, response))
+
+    def test_lock(self):
+        self.assertTrue(page_cache.acquire_lock("pages/lock/test", 10))
+        self.assertFalse(page_cache.acquire_lock("pages/lock/test", 10))
+        page_cache.release_lock("pages/lock/test")
+        self.assertTrue(page_cache.acquire_lock("pages/lock/test", 10))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ROOT_URLCONF="utils.test_page_cache")
+class TestCachedView(TestCase):
+    """Requests go through the middlewares, each visitor has its own cookies."""
+
+    def setUp(self):
+        Parameter.objects.create(
+            name="Mise en maintenance du site",
+            slug="MAINTENANCE_MODE",
+            value_type="BOO",
+            value="0",
+        )
+        CountingView.renders = 0
+        cache.clear()
+
+    def get_page(self, visitor: str) -> bytes:
+        client = Client()
+        client.cookies["csrftoken"] = visitor * 32
+        return client.get("/cached/").content
+
+    def test_stale_while_revalidate(self):
+        self.assertEqual(self.get_page("a"), b"render 1")
+        self.assertEqual(self.get_page("b"), b"render 1")
+
+        expired = time.time() + CountingView.cache_timeout + 1
+        with mock.patch("utils.page_cache.time.time", return_value=expired), mock.patch(
+            "utils.views_mixins.refresh_cached_page.delay", side_effect=refresh_cached_page
+        ) as refresh:
+            # the expired copy is served, the page is rendered again for the next visitors
+            self.assertEqual(self.get_page("c"), b"render 1")
+            refresh.assert_called_once_with("/cached/", "testserver", "http")
+            self.assertEqual(self.get_page("d"), b"render 2")
+        self.assertEqual(CountingView.renders, 2)
+
+    def test_warmed_page_served_to_other_visitors(self):
+        user = get_user_model().objects.create_user(  # nosec
+            email="owner@user.com",
+            password="foo",
+            first_name="Jeanne",
+            last_name="Dupont",
+        )
+        self.assertEqual(page_cache.refresh_page("/cached/", "testserver", "http"), 200)
+        self.assertEqual(page_cache.refresh_page("/cached/", "testserver", "http", user=user), 200)
+        self.assertEqual(CountingView.renders, 2)
+
+        # the sessions used to render the pages are deleted, visitors have their own
+        self.assertEqual(self.get_page("a"), b"render 1")
+        client = Client()
+        client.force_login(user)
+        self.assertEqual(client.get("/cached/").content, b"render 2")
+        self.assertEqual(CountingView.renders, 2)
+
+        # the page warmed for the owner is not served to another user
+        other_user = get_user_model().objects.create_user(  # nosec
+            email="other@user.com",
+            password="foo",
+            first_name="Paul",
+            last_name="Martin",
+        )
+        client = Client()
+        client.force_login(other_user)
+        self.assertEqual(client.get("/cached/").content, b"render 3")
+
+    def test_csrf_token_of_each_visitor(self):
+        client = Client()
+        client.cookies["csrftoken"] = "a" * 32
+        other_client = Client()
+        other_client.cookies["csrftoken"] = "b" * 32
+        token = client.get("/token/").content
+        other_token = other_client.get("/token/").content
+        self.assertEqual(len(token), 64)
+        self.assertNotEqual(token, other_token)
+        self.assertNotIn(page_cache.CSRF_PLACEHOLDER.encode(), other_token)
+
+    def test_page_of_a_user_not_served_to_another(self):
+        users = [
+            get_user_model().objects.create_user(  # nosec
+                email=f"{name}@user.com",
+                password="foo",
+                first_name=name,
+                last_name="Dupont",
+            )
+            for name in ("jeanne", "paul")
+        ]
+        contents = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            contents.append(client.get("/cached/").content)
+        self.assertEqual(contents, [b"render 1", b"render 2"])
@@ -1,9 +1,22 @@
+import zlib
+from typing import Optional
+
 from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
 from django.shortcuts import resolve_url
 from django.urls import reverse_lazy
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_control
-from fancy_cache import cache_page
+from rest_framework.views import APIView
+
+from public_data.data_version import get_data_version
+from utils import page_cache
+from utils.tasks import refresh_cached_page
 
 
 class GetObjectMixin:
@@ -52,16 +65,73 @@ class RedirectURLMixin:
 
 
 class CacheMixin:
+    """Cache GET responses, see utils.page_cache.
+
+    Only one request renders an expired page, the others get the previous copy or
+    wait for the new one. With cache_stale_while_revalidate, expired pages are
+    served at once to anonymous users and rendered again by a celery task, stored
+    under the same key since keys don't depend on the cookies of the visitor.
+    Pages of logged-in users are cached per user, and a cached page is only served
+    once has_cache_access allows the visitor to see it.
+    """
+
     cache_timeout = 60 * 15  # cache pour 15 minutes
+    # expired pages are kept that long, to be served while they are rendered again
+    cache_stale_timeout = 60 * 60
+    cache_stale_while_revalidate = False
+    # seconds a request waits for a page rendered by another request
+    cache_lock_wait = 10
+    cache_lock_timeout = 60 * 2
+    # set while the page is rendered to be cached
+    cache_rendering = False
 
     def should_cache(self, *args, **kwargs):
         """Override to disable cache conditionnally"""
         return True
 
+    @classmethod
+    def has_cache_access(cls, request) -> bool:
+        """Override to check the visitor can see the page, a cached page is served
+        before the view checks anything."""
+        return True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.cache_rendering:
+            context["csrf_token"] = page_cache.CSRF_PLACEHOLDER
+        return context
+
+    def use_stale_while_revalidate(self, request) -> bool:
+        return self.cache_stale_while_revalidate and not request.user.is_authenticated
+
+    @classmethod
+    def get_cache_namespace(cls, request) -> str:
+        """Prefix of the cached pages, override to add the version of the object displayed.
+        A new namespace makes previous pages unreachable (they expire by themselves)."""
+        return f"v{get_data_version()}"
+
+    @staticmethod
     def prefixer(request):
         if request.method != "GET" or request.GET.get("no-cache"):
             return None
-        return request.get_full_path()
+        view_class = getattr(getattr(request.resolver_match, "func", None), "view_class", CacheMixin)
+        if not issubclass(view_class, CacheMixin):
+            view_class = CacheMixin
+        return f"{view_class.get_cache_namespace(request)}:{request.get_full_path()}"
+
+    def render_and_store(self, request, key_prefix, *args, **kwargs):
+        self.cache_rendering = True
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            response.render()
+        page_cache.store_page(request, response, key_prefix, self.cache_timeout, self.cache_stale_timeout)
+        return page_cache.insert_csrf_token(request, response)
+
+    def render_locked(self, request, key_prefix, lock_key, *args, **kwargs):
+        try:
+            return self.render_and_store(request, key_prefix, *args, **kwargs)
+        finally:
+            page_cache.release_lock(lock_key)
 
     @method_decorator(
         cache_control(
@@ -71,11 +141,126 @@ class CacheMixin:
             must_revalidate=True,
         )
     )
-    @method_decorator(cache_page(cache_timeout, key_prefix=prefixer))
     def cached_dispatch(self, request, *args, **kwargs):
-        return super().dispatch(request, *args, **kwargs)
+        key_prefix = self.prefixer(request)
+        if key_prefix is None or not self.has_cache_access(request):
+            return super().dispatch(request, *args, **kwargs)
+        lock_key = page_cache.get_lock_key(request, key_prefix)
+        if getattr(request, page_cache.REFRESH_ATTRIBUTE, False):
+            return self.render_locked(request, key_prefix, lock_key, *args, **kwargs)
+
+        response, is_fresh = page_cache.get_cached_page(request, key_prefix)
+        if response is not None and is_fresh:
+            return page_cache.insert_csrf_token(request, response)
+        if response is not None and self.use_stale_while_revalidate(request):
+            if page_cache.acquire_lock(lock_key, self.cache_lock_timeout):
+                refresh_cached_page.delay(request.get_full_path(), request.get_host(), request.scheme)
+            return page_cache.insert_csrf_token(request, response)
+        if page_cache.acquire_lock(lock_key, self.cache_lock_timeout):
+            return self.render_locked(request, key_prefix, lock_key, *args, **kwargs)
+        if response is not None:
+            # the page is being rendered by another request
+            return page_cache.insert_csrf_token(request, response)
+        response = page_cache.wait_for_page(request, key_prefix, lock_key, self.cache_lock_wait)
+        if response is not None:
+            return page_cache.insert_csrf_token(request, response)
+        return self.render_and_store(request, key_prefix, *args, **kwargs)
 
     def dispatch(self, request, *args, **kwargs):
         if self.should_cache():
             return self.cached_dispatch(request, *args, **kwargs)
         return super().dispatch(request, *args, **kwargs)
+
+
+class NotModified(Exception):
+    """Raised by DataVersionETagMixin.initial to stop a DRF view with a 304 response."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class DataVersionETagMixin:
+    """Add an ETag built from the data version to GET responses and answer 304 when it matches.
+
+    The token is the global data version followed by get_etag_extra() (the state of
+    the project for project scoped data). When the url contains ?v=<token>, the
+    response can't change anymore and is cached by browsers as immutable, otherwise
+    the client has to revalidate it with the ETag.
+
+    A 304 is only answered once the access is checked: after authentication and
+    permissions for DRF views (initial), after get_object for other views.
+    """
+
+    etag_immutable_max_age = 60 * 60 * 24 * 365
+    etag_version_param = "v"
+    etag_public = True
+
+    def should_use_etag(self, request) -> bool:
+        """Override to tag only some responses."""
+        return request.method in ("GET", "HEAD")
+
+    def get_etag_extra(self) -> str:
+        """Override to add the state of the data served (project version for instance)."""
+        return ""
+
+    def get_version_token(self) -> str:
+        extra = self.get_etag_extra()
+        token = str(get_data_version())
+        return f"{token}-{extra}" if extra else token
+
+    def get_etag(self, request, token: str) -> str:
+        """ETag of the response, the same url may have several representations (GeoJSON, FlatGeobuf...)."""
+        representation = f"{request.GET.get('format', '')}|{request.META.get('HTTP_ACCEPT', '')}"
+        return f'"{token}-{zlib.crc32(representation.encode()):x}"'
+
+    def get_not_modified_response(self, request) -> Optional[HttpResponse]:
+        """Compute the ETag of the response, return a 304 response if the client has it."""
+        self.etag_token = self.get_version_token()
+        self.etag = self.get_etag(request, self.etag_token)
+        not_modified = get_conditional_response(request, etag=self.etag)
+        if not_modified is not None:
+            not_modified["ETag"] = self.etag
+        return not_modified
+
+    def check_etag_access(self, request) -> None:
+        """Raise when the user can't access the data, before a 304 is answered (not DRF views)."""
+        if hasattr(self, "get_object"):
+            self.get_object()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.should_use_etag(request):
+            not_modified = self.get_not_modified_response(request)
+            if not_modified is not None:
+                raise NotModified(not_modified)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.etag = None
+        if not self.should_use_etag(request):
+            return super().dispatch(request, *args, **kwargs)
+        if not isinstance(self, APIView):
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            self.check_etag_access(request)
+            not_modified = self.get_not_modified_response(request)
+            if not_modified is not None:
+                return not_modified
+        response = super().dispatch(request, *args, **kwargs)
+        # partial content (range requests of FlatGeobuf) keeps the ETag of the full response
+        if response.status_code not in (200, 206) or self.etag is None:
+            return response
+        response["ETag"] = self.etag
+        patch_vary_headers(response, ["Accept"])
+        if request.GET.get(self.etag_version_param) == self.etag_token:
+            cache_control = {"public": True} if self.etag_public else {"private": True}
+            patch_cache_control(response, max_age=self.etag_immutable_max_age, immutable=True, **cache_control)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response